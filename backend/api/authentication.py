@@ -0,0 +1,87 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import SAFE_METHODS
+
+
+class TokenCache:
+    """
+    Ограниченный LRU-кеш токенов в памяти процесса: ключ токена ->
+    (пользователь, токен, время истечения). Записи живут не дольше ttl
+    секунд, поэтому изменения из других процессов подхватываются
+    не позже чем через ttl.
+    """
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        user, token, _ = entry
+        # Каждому запросу - своя копия, чтобы запросы не делили
+        # изменяемое состояние пользователя.
+        return copy.copy(user), token
+
+    def set(self, key, user, token):
+        with self._lock:
+            self._entries[key] = (user, token, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            keys = [
+                key for key, (user, _, _) in self._entries.items()
+                if user.pk == user_id
+            ]
+            for key in keys:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Аутентификация по токену с кешем токенов в памяти.
+    Чтение на прогретом кеше не делает запросов к базе. Запросы,
+    меняющие данные, читают пользователя из базы: сохранение
+    устаревшей копии перезаписало бы изменения других запросов.
+    """
+
+    def authenticate(self, request):
+        self.request = request
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        use_cache = self.request.method in SAFE_METHODS
+        if use_cache:
+            cached = token_cache.get(key)
+            if cached is not None:
+                return cached
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, copy.copy(user), token)
+        return user, token
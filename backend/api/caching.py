@@ -0,0 +1,149 @@
+from copy import deepcopy
+from functools import wraps
+from hashlib import md5
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from api.services import get_recipe_flags
+from recipes.models import DataVersion
+
+# Фильтры, результат которых зависит от пользователя.
+PERSONAL_FILTERS = ('is_favorited', 'is_in_shopping_cart')
+# Поля рецепта, зависящие от пользователя.
+PERSONAL_FIELDS = {'is_favorited', 'is_in_shopping_cart', 'author'}
+
+
+def get_data_version(request, name):
+    """
+    Версия набора данных и время её изменения.
+    Все версии читаются одним запросом к маленькой таблице
+    и кешируются на объекте запроса.
+    """
+    if not hasattr(request, '_data_versions'):
+        request._data_versions = {
+            version_name: (version, updated_at)
+            for version_name, version, updated_at in
+            DataVersion.objects.values_list('name', 'version', 'updated_at')
+        }
+    return request._data_versions.get(name, (0, None))
+
+
+def get_catalogue_version(request):
+    """Текущая версия каталога и время её изменения."""
+    return get_data_version(request, DataVersion.CATALOGUE)
+
+
+def get_tags_version(request):
+    """Версия индекса тегов: версии каталога и связей рецептов с тегами."""
+    return (
+        get_data_version(request, DataVersion.CATALOGUE)[0],
+        get_data_version(request, DataVersion.RECIPE_TAGS)[0],
+    )
+
+
+def get_recipe_ingredients_version(request):
+    """Версия связей рецептов с ингредиентами."""
+    return get_data_version(request, DataVersion.RECIPE_INGREDIENTS)[0]
+
+
+def get_users_me_cache_key(user_id):
+    return f'users-me:{user_id}'
+
+
+def catalogue_condition(view_method):
+    """
+    Условный GET для справочников: ETag и Last-Modified по версии
+    каталога, ответ 304 до выполнения запроса к данным.
+    """
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        version, updated_at = get_catalogue_version(request)
+        etag = quote_etag(f'{self.basename}-{version}')
+        last_modified = updated_at and int(updated_at.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = view_method(self, request, *args, **kwargs)
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(
+            response, public=True, max_age=settings.CATALOGUE_MAX_AGE
+        )
+        return response
+
+    return wrapper
+
+
+def get_recipes_cache_key(request):
+    """
+    Ключ общего кеша рецептов: адрес, упорядоченные параметры запроса
+    и версии рецептов и каталога.
+    """
+    params = urlencode(sorted(request.query_params.lists()), doseq=True)
+    versions = (
+        get_data_version(request, DataVersion.RECIPES)[0],
+        get_data_version(request, DataVersion.CATALOGUE)[0],
+    )
+    key = f'{request.build_absolute_uri(request.path)}?{params}|{versions}'
+    return 'recipes:' + md5(key.encode()).hexdigest()
+
+
+def get_recipes_from_data(data):
+    """Рецепты из ответа со списком или с одним рецептом."""
+    return data['results'] if 'results' in data else [data]
+
+
+def set_flags(recipe, is_favorited, is_in_shopping_cart, is_subscribed):
+    """Проставить флаги в рецепте, кроме убранных из ответа полей."""
+    if 'is_favorited' in recipe:
+        recipe['is_favorited'] = is_favorited
+    if 'is_in_shopping_cart' in recipe:
+        recipe['is_in_shopping_cart'] = is_in_shopping_cart
+    if 'author' in recipe:
+        recipe['author']['is_subscribed'] = is_subscribed
+
+
+def set_personal_flags(request, recipes):
+    """Проставить в рецептах флаги текущего пользователя."""
+    if request.user.is_anonymous or not recipes:
+        return
+    if not PERSONAL_FIELDS & recipes[0].keys():
+        return
+    flags = get_recipe_flags(request.user, [item['id'] for item in recipes])
+    for recipe in recipes:
+        set_flags(recipe, *flags.get(recipe['id'], (False, False, False)))
+
+
+def recipes_cache(view_method):
+    """
+    Общий кеш ответов с рецептами для всех пользователей.
+    В кеше хранится ответ без флагов пользователя, при чтении флаги
+    текущего пользователя подставляются одним запросом.
+    """
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if any(name in request.query_params for name in PERSONAL_FILTERS):
+            return view_method(self, request, *args, **kwargs)
+        key = get_recipes_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            set_personal_flags(request, get_recipes_from_data(data))
+            return Response(data)
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            data = deepcopy(response.data)
+            for recipe in get_recipes_from_data(data):
+                set_flags(recipe, False, False, False)
+            cache.set(key, data, settings.RECIPES_CACHE_TIMEOUT)
+        return response
+
+    return wrapper
@@ -0,0 +1,87 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Реплика, с которой читает текущий запрос; None - основная база.
+# Задается ReplicaMiddleware только для безопасных запросов.
+_read_alias = ContextVar('read_alias', default=None)
+
+# Модели, которые всегда читаются с основной базы: токен, созданный
+# при входе, может еще не дойти до реплики.
+PRIMARY_MODELS = {'authtoken.token', 'sessions.session'}
+
+
+@contextmanager
+def read_from_replica(alias=None):
+    """
+    Читать внутри блока с реплики alias или со случайной реплики
+    из REPLICA_DATABASES. Без реплик блок читает с основной базы.
+    """
+    if alias is None and settings.REPLICA_DATABASES:
+        alias = random.choice(settings.REPLICA_DATABASES)
+    token = _read_alias.set(alias)
+    try:
+        yield alias
+    finally:
+        _read_alias.reset(token)
+
+
+def get_pin_key(request):
+    """
+    Ключ закрепления клиента за основной базой: по токену или сессии.
+    Анонимный клиент без сессии закрепляется только cookie.
+    """
+    identity = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(
+        settings.SESSION_COOKIE_NAME
+    )
+    if not identity:
+        return None
+    return 'db-pin:' + md5(identity.encode()).hexdigest()
+
+
+def is_pinned(request):
+    """Писал ли клиент в последние REPLICA_PIN_SECONDS секунд."""
+    if settings.REPLICA_PIN_COOKIE in request.COOKIES:
+        return True
+    key = get_pin_key(request)
+    return key is not None and cache.get(key) is not None
+
+
+def pin(request, response):
+    """
+    Закрепить клиента за основной базой после записи: cookie
+    работает для браузеров в любом процессе, ключ в кеше - для
+    клиентов с токеном (между процессами - при общем кеше).
+    """
+    response.set_cookie(
+        settings.REPLICA_PIN_COOKIE, '1',
+        max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax'
+    )
+    key = get_pin_key(request)
+    if key is not None:
+        cache.set(key, True, settings.REPLICA_PIN_SECONDS)
+
+
+class ReplicaRouter:
+    """
+    Чтения безопасных запросов идут на реплику, выбранную
+    ReplicaMiddleware, остальное - на основную базу. После первой
+    записи запрос до конца читает с основной базы.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower in PRIMARY_MODELS:
+            return 'default'
+        return _read_alias.get() or 'default'
+
+    def db_for_write(self, model, **hints):
+        _read_alias.set(None)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии основной базы.
+        return True
@@ -1,27 +1,70 @@
-from django_filters.rest_framework import (AllValuesMultipleFilter,
-                                           BooleanFilter, FilterSet)
-from recipes.models import Recipe
+from django.db.models import Exists, OuterRef
+from django_filters.rest_framework import (BooleanFilter, CharFilter,
+                                           FilterSet, MultipleChoiceFilter)
+
+from api.caching import get_tags_version
+from api.indexes import tag_index
+from api.search import search_recipes
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+
+def get_tag_choices():
+    return tag_index.get_choices()
 
 
 class RecipeFilter(FilterSet):
 
     is_favorited = BooleanFilter(method='get_is_favorited')
     is_in_shopping_cart = BooleanFilter(method='get_is_in_shopping_cart')
-    tags = AllValuesMultipleFilter(field_name='tags__slug')
+    tags = MultipleChoiceFilter(
+        choices=get_tag_choices, method='get_tags'
+    )
+    search = CharFilter(method='get_search')
 
-    def filter_by_user(self, queryset, name, value, related_name_id):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if 'tags' in self.data:
+            # Варианты тегов берутся из индекса, поэтому обновим его
+            # до проверки параметров.
+            tag_index.get_data(get_tags_version(self.request))
+
+    def filter_by_user(self, queryset, name, value, model):
+        """
+        Полусоединение с таблицей model вместо JOIN через связь M2M.
+        Если представление уже добавило аннотацию name, фильтруем по ней.
+        """
         if not value:
             return queryset
-        if self.request.user.is_authenticated:
-            return queryset.filter(**{related_name_id: self.request.user.id})
-        return Recipe.objects.none()
+        if not self.request.user.is_authenticated:
+            return Recipe.objects.none()
+        if name in queryset.query.annotations:
+            return queryset.filter(**{name: True})
+        return queryset.filter(Exists(model.objects.filter(
+            recipe=OuterRef('pk'), user=self.request.user.id
+        )))
 
     def get_is_favorited(self, queryset, name, value):
-        return self.filter_by_user(queryset, name, value, 'who_likes__id')
+        return self.filter_by_user(queryset, name, value, Favorite)
 
     def get_is_in_shopping_cart(self, queryset, name, value):
-        return self.filter_by_user(queryset, name, value, 'who_buys__id')
+        return self.filter_by_user(queryset, name, value, ShoppingCart)
+
+    def get_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return tag_index.filter(
+            queryset, value, get_tags_version(self.request)
+        )
+
+    def get_search(self, queryset, name, value):
+        """Поиск по названию, описанию и ингредиентам с ранжированием."""
+        value = value.strip()
+        if not value:
+            return queryset
+        return search_recipes(queryset, value)
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'is_in_shopping_cart', 'author', 'tags')
+        fields = (
+            'is_favorited', 'is_in_shopping_cart', 'author', 'tags', 'search'
+        )
@@ -0,0 +1,175 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from PIL import Image, ImageOps
+
+from recipes.models import DataVersion, Recipe
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = 'derivatives'
+
+_executor = None
+
+
+def get_executor():
+    """Общий пул потоков для подготовки копий картинок."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.RECIPE_IMAGE_WORKERS,
+            thread_name_prefix='recipe-images'
+        )
+    return _executor
+
+
+def get_derivative_name(source, width, extension):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return f'{DERIVATIVES_DIR}/{stem}_{width}.{extension}'
+
+
+def get_derivative_names(derivatives):
+    return [
+        name
+        for formats in derivatives.get('images', {}).values()
+        for name in formats.values()
+    ]
+
+
+def delete_files(names):
+    for name in names:
+        default_storage.delete(name)
+
+
+def to_rgb(image):
+    """Убрать прозрачность: JPEG ее не поддерживает."""
+    if image.mode == 'RGB':
+        return image
+    image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def save_derivatives(source):
+    """
+    Сохранить уменьшенные копии картинки во всех ширинах и форматах.
+    Ширины больше исходной пропускаются, копия исходного размера
+    делается, только если исходник уже меньше всех ширин.
+    Возвращает {ширина: {формат: имя файла}}.
+    """
+    with default_storage.open(source) as file:
+        original = ImageOps.exif_transpose(Image.open(file))
+        original.load()
+    widths = [
+        width for width in settings.RECIPE_IMAGE_WIDTHS
+        if width < original.width
+    ] or [original.width]
+    images = {}
+    for width in widths:
+        image = original.copy()
+        image.thumbnail((width, original.height), Image.Resampling.LANCZOS)
+        images[str(width)] = {}
+        for extension, image_format in settings.RECIPE_IMAGE_FORMATS.items():
+            buffer = BytesIO()
+            (image if image_format == 'WEBP' else to_rgb(image)).save(
+                buffer, image_format,
+                quality=settings.RECIPE_IMAGE_QUALITY, optimize=True
+            )
+            name = get_derivative_name(source, width, extension)
+            default_storage.delete(name)
+            images[str(width)][extension] = default_storage.save(
+                name, ContentFile(buffer.getvalue())
+            )
+    return images
+
+
+def make_derivatives(recipe_id, force=False):
+    """
+    Подготовить уменьшенные копии картинки рецепта.
+    Копии пересоздаются, только если картинка сменилась
+    с прошлого запуска или передан force.
+    Возвращает True, если копии были созданы.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'image', 'image_derivatives'
+    ).first()
+    if recipe is None or not recipe.image:
+        return False
+    source = recipe.image.name
+    old = recipe.image_derivatives or {}
+    if old.get('source') == source and not force:
+        return False
+    derivatives = {'source': source, 'images': save_derivatives(source)}
+    # Картинку могли заменить, пока готовились копии.
+    updated = Recipe.objects.filter(pk=recipe_id, image=source).update(
+        image_derivatives=derivatives
+    )
+    new_names = get_derivative_names(derivatives)
+    if not updated:
+        delete_files(new_names)
+        return False
+    delete_files(set(get_derivative_names(old)) - set(new_names))
+    DataVersion.bump(DataVersion.RECIPES)
+    return True
+
+
+def try_make_derivatives(recipe_id):
+    """
+    make_derivatives без исключений: битая или пропавшая картинка
+    не должна ломать сохранение рецепта, ошибка пишется в лог.
+    """
+    try:
+        make_derivatives(recipe_id)
+    except Exception:
+        logger.exception(
+            'Не удалось подготовить копии картинки рецепта %s', recipe_id
+        )
+
+
+def run_derivatives(recipe_id):
+    """Задача пула потоков: соединения потока закрываются после нее."""
+    try:
+        try_make_derivatives(recipe_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_derivatives(recipe_id):
+    """
+    Поставить подготовку копий картинки в пул потоков.
+    При RECIPE_IMAGE_WORKERS = 0 копии готовятся сразу.
+    """
+    if not settings.RECIPE_IMAGE_WORKERS:
+        try_make_derivatives(recipe_id)
+        return
+    get_executor().submit(run_derivatives, recipe_id)
+
+
+def get_image_urls(recipe, request=None):
+    """Ссылки на копии картинки: {ширина: {формат: url}}."""
+    return build_image_urls(
+        recipe.image.name, recipe.image_derivatives, request
+    )
+
+
+def build_image_urls(source, derivatives, request=None):
+    """Ссылки на копии картинки по имени исходника и image_derivatives."""
+    derivatives = derivatives or {}
+    if derivatives.get('source') != source:
+        return {}
+    urls = {}
+    for width, formats in derivatives['images'].items():
+        urls[width] = {}
+        for extension, name in formats.items():
+            url = default_storage.url(name)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls[width][extension] = url
+    return urls
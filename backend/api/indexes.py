@@ -0,0 +1,228 @@
+import heapq
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Count, Exists, OuterRef
+
+from recipes.models import Ingredient, RecipeIngredient, RecipeTag, Tag
+
+# Символ, который больше любого символа в названии ингредиента.
+MAX_CHAR = '\U0010ffff'
+# Номера единичных битов для каждого значения байта.
+BYTE_BITS = tuple(
+    tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)
+)
+
+
+def ids_to_bitmap(ids):
+    """Упаковать множество id в битовую карту: бит с номером id равен 1."""
+    ids = list(ids)
+    if not ids:
+        return 0
+    bits = bytearray(max(ids) // 8 + 1)
+    for pk in ids:
+        bits[pk >> 3] |= 1 << (pk & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def bitmap_to_ids(bitmap):
+    """Список id из битовой карты по возрастанию."""
+    ids = []
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    for idx, byte in enumerate(data):
+        if byte:
+            base = idx << 3
+            ids.extend(base + bit for bit in BYTE_BITS[byte])
+    return ids
+
+
+def popcount(bitmap):
+    return bin(bitmap).count('1')
+
+
+class VersionedIndex:
+    """
+    Индекс в памяти процесса, который строится лениво при первом
+    обращении и перестраивается при смене версии данных.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+
+    def invalidate(self):
+        self._data = None
+
+    def build(self):
+        raise NotImplementedError
+
+    def is_stale(self, data, version):
+        # Версии только растут: индекс не перестраивается назад, если
+        # запрос прочитал старую версию с отстающей реплики. Индекс,
+        # построенный без версии, устаревает при первой известной.
+        if data is None:
+            return True
+        if version is None:
+            return False
+        return data[0] is None or data[0] < version
+
+    def get_data(self, version=None):
+        data = self._data
+        if self.is_stale(data, version):
+            with self._lock:
+                data = self._data
+                if self.is_stale(data, version):
+                    data = self._data = (version, self.build())
+        return data[1]
+
+
+class IngredientIndex(VersionedIndex):
+    """
+    Префиксный индекс названий ингредиентов.
+    Перестраивается, когда меняется версия каталога или ингредиенты
+    меняются в этом процессе.
+    """
+
+    def build(self):
+        rows = Ingredient.objects.annotate(
+            popularity=Count('recipeingredient')
+        ).values_list('id', 'name', 'measurement_unit__name', 'popularity')
+        entries = sorted(
+            (name.casefold(), -popularity, pk,
+             {'id': pk, 'name': name, 'measurement_unit': m_unit})
+            for pk, name, m_unit, popularity in rows
+        )
+        keys = [entry[0] for entry in entries]
+        return keys, entries
+
+    def all(self, version=None):
+        """Все ингредиенты в алфавитном порядке."""
+        _, entries = self.get_data(version)
+        return [entry[3] for entry in entries]
+
+    def search(self, prefix, limit, version=None):
+        """
+        Не более limit ингредиентов, название которых начинается с prefix.
+        Сначала точное совпадение, затем самые популярные в рецептах.
+        """
+        keys, entries = self.get_data(version)
+        prefix = prefix.casefold()
+        start = bisect_left(keys, prefix)
+        stop = bisect_left(keys, prefix + MAX_CHAR, start)
+        best = heapq.nsmallest(
+            limit,
+            entries[start:stop],
+            key=lambda entry: (entry[0] != prefix, entry[1], entry[0])
+        )
+        return [entry[3] for entry in best]
+
+
+class TagIndex(VersionedIndex):
+    """
+    Множества рецептов каждого тега в виде битовых карт.
+    Версия индекса - пара из версий каталога и связей рецептов с тегами.
+    """
+
+    @staticmethod
+    def build_bitmaps(slugs, rows):
+        """Битовые карты тегов по строкам (slug тега, id рецепта)."""
+        ids_by_tag = {slug: [] for slug in slugs}
+        for slug, recipe_id in rows:
+            ids_by_tag[slug].append(recipe_id)
+        return {
+            slug: ids_to_bitmap(ids) for slug, ids in ids_by_tag.items()
+        }
+
+    def build(self):
+        slugs = sorted(Tag.objects.values_list('slug', flat=True))
+        rows = RecipeTag.objects.values_list(
+            'tag__slug', 'recipe_id'
+        ).iterator()
+        return slugs, self.build_bitmaps(slugs, rows)
+
+    def get_choices(self):
+        """Варианты для фильтра по тегам."""
+        slugs, _ = self.get_data()
+        return [(slug, slug) for slug in slugs]
+
+    def get_bitmap(self, slugs, version=None):
+        """Рецепты, у которых есть хотя бы один из тегов."""
+        _, bitmaps = self.get_data(version)
+        bitmap = 0
+        for slug in slugs:
+            bitmap |= bitmaps.get(slug, 0)
+        return bitmap
+
+    def count(self, slugs, version=None):
+        return popcount(self.get_bitmap(slugs, version))
+
+    def filter(self, queryset, slugs, version=None):
+        """
+        Отфильтровать рецепты по тегам.
+        Небольшой набор рецептов передается в запрос списком id,
+        большой - полусоединением с таблицей тегов рецептов.
+        """
+        bitmap = self.get_bitmap(slugs, version)
+        if popcount(bitmap) > settings.TAG_FILTER_MAX_IDS:
+            return queryset.filter(Exists(RecipeTag.objects.filter(
+                recipe=OuterRef('pk'), tag__slug__in=slugs
+            )))
+        return queryset.filter(pk__in=bitmap_to_ids(bitmap))
+
+
+class RecipeIngredientIndex(VersionedIndex):
+    """
+    Обратный индекс: для каждого ингредиента - массив id рецептов,
+    где он используется, и число ингредиентов каждого рецепта.
+    Перестраивается при смене версии связей рецептов с ингредиентами.
+    """
+
+    def build(self):
+        postings = {}
+        sizes = Counter()
+        rows = RecipeIngredient.objects.values_list(
+            'ingredient_id', 'recipe_id'
+        ).iterator()
+        for ingredient_id, recipe_id in rows:
+            if ingredient_id not in postings:
+                postings[ingredient_id] = array('I')
+            postings[ingredient_id].append(recipe_id)
+            sizes[recipe_id] += 1
+        return postings, sizes
+
+    def search(self, ingredient_ids, limit, recipe_ids=None, version=None):
+        """
+        Рецепты, которые лучше всего покрываются ингредиентами.
+        Порядок: доля имеющихся ингредиентов рецепта, затем меньше
+        недостающих, затем более новые рецепты.
+        Параметры:
+            recipe_ids: множество допустимых рецептов или None
+        Возвращает [(id рецепта, есть ингредиентов, всего ингредиентов)].
+        """
+        postings, sizes = self.get_data(version)
+        matched = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matched.update(postings.get(ingredient_id, ()))
+        candidates = matched.items()
+        if recipe_ids is not None:
+            candidates = (
+                item for item in candidates if item[0] in recipe_ids
+            )
+        best = heapq.nlargest(
+            limit,
+            candidates,
+            key=lambda item: (
+                item[1] / sizes[item[0]], item[1] - sizes[item[0]], item[0]
+            )
+        )
+        return [
+            (recipe_id, count, sizes[recipe_id]) for recipe_id, count in best
+        ]
+
+
+ingredient_index = IngredientIndex()
+tag_index = TagIndex()
+recipe_ingredient_index = RecipeIngredientIndex()
@@ -0,0 +1,231 @@
+import json
+import re
+from urllib.parse import unquote, urlencode
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from api.query_budget import QUERY_BUDGETS, Route, get_route_path, get_user
+from recipes.models import Ingredient, Tag
+
+# Маршруты аудита сверх маршрутов с бюджетами запросов.
+EXTRA_ROUTES = (
+    Route('recipes-list', {'limit': 6, 'page': 20}, None, False),
+    Route('recipes-list', {'limit': 6, 'is_favorited': 1}, None, False),
+    Route('recipes-list', {'limit': 6, 'is_in_shopping_cart': 1}, None,
+          False),
+    Route('recipes-list', {'limit': 6, 'ordering': '-favorites_count'},
+          None, False),
+    Route('recipes-list', {'limit': 6, 'search': 'суп'}, None, False),
+    Route('recipes-feed', {'limit': 6}, None, False),
+    Route('users-me', {}, None, False),
+)
+ALIAS_RE = re.compile(r'"(\w+)" (U\d+)\b')
+
+
+class PlanCapture:
+    """Обертка execute: запоминает SELECT-запросы с параметрами."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def walk_postgresql(plan):
+    """Узлы плана PostgreSQL вместе с вложенными."""
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from walk_postgresql(child)
+
+
+class Command(BaseCommand):
+    help = (
+        'Аудит индексов: выполнить SQL-запросы основных маршрутов API '
+        'под EXPLAIN (ANALYZE, FORMAT JSON) на PostgreSQL или EXPLAIN '
+        'QUERY PLAN на SQLite и показать полные просмотры и сортировки '
+        'больших таблиц. Запускать на сгенерированных данных '
+        '(generate_data).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-rows', type=int, default=10000,
+            help='С какого числа строк таблица считается большой.'
+        )
+        parser.add_argument(
+            '--user',
+            help='Email пользователя, от имени которого идут запросы. '
+                 'По умолчанию - пользователь с наибольшим числом подписок.'
+        )
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Завершиться ошибкой, если найдены проблемы.'
+        )
+
+    def get_user(self, email):
+        user = get_user(email)
+        if user is None:
+            raise CommandError('Пользователь не найден!')
+        return user
+
+    def get_routes(self):
+        routes = list(QUERY_BUDGETS) + list(EXTRA_ROUTES)
+        tag = Tag.objects.values_list('slug', flat=True).first()
+        if tag:
+            routes.append(
+                Route('recipes-list', {'limit': 6, 'tags': tag}, None, False)
+            )
+        ingredients = list(
+            Ingredient.objects.values_list('pk', flat=True)[:5]
+        )
+        if ingredients:
+            routes.append(Route(
+                'recipes-what-to-cook', {'ingredients': ingredients},
+                None, False
+            ))
+        return routes
+
+    def get_table_sizes(self):
+        """Число строк таблиц: по статистике PostgreSQL или COUNT(*)."""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT relname, reltuples FROM pg_class '
+                    "WHERE relkind = 'r'"
+                )
+                return {name: int(rows) for name, rows in cursor.fetchall()}
+            sizes = {}
+            for table in connection.introspection.table_names():
+                cursor.execute(
+                    f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}'
+                )
+                sizes[table] = cursor.fetchone()[0]
+            return sizes
+
+    def explain_postgresql(self, cursor, sql, params, sizes, min_rows):
+        """Полные просмотры и сортировки больших таблиц в плане."""
+        cursor.execute(f'EXPLAIN (ANALYZE, FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        problems = []
+        for node in walk_postgresql(plan[0]['Plan']):
+            node_type = node['Node Type']
+            if node_type == 'Seq Scan':
+                table = node['Relation Name']
+                if sizes.get(table, 0) >= min_rows:
+                    problems.append((table, 'полный просмотр'))
+            elif node_type in ('Sort', 'Incremental Sort'):
+                rows = sum(
+                    child['Actual Rows'] * child['Actual Loops']
+                    for child in node.get('Plans', ())
+                )
+                if rows >= min_rows:
+                    problems.append((
+                        ', '.join(node['Sort Key']), f'сортировка {rows} строк'
+                    ))
+        return problems
+
+    def explain_sqlite(self, cursor, sql, params, sizes, min_rows):
+        """
+        План SQLite без выполнения: SCAN без индекса по большой
+        таблице и временное B-дерево для сортировки строк большой
+        таблицы.
+        """
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        details = [row[-1] for row in cursor.fetchall()]
+        # В подзапросах Django таблицы получают псевдонимы U0, U1...
+        aliases = {alias: table for table, alias in ALIAS_RE.findall(sql)}
+        scanned = set()
+        problems = []
+        for detail in details:
+            words = detail.replace(' TABLE ', ' ').split()
+            if words[0] != 'SCAN':
+                continue
+            table = aliases.get(words[1], words[1])
+            if sizes.get(table, 0) < min_rows:
+                continue
+            scanned.add(table)
+            if 'INDEX' not in detail:
+                problems.append((table, 'полный просмотр'))
+        # SQLite не сообщает число сортируемых строк: сортировка
+        # считается большой, если просматривается большая таблица.
+        if scanned:
+            problems.extend(
+                (', '.join(sorted(scanned)), detail.lower())
+                for detail in details
+                if detail.startswith('USE TEMP B-TREE')
+            )
+        return problems
+
+    def audit(self, client, route, sizes, min_rows):
+        """Проблемы в запросах маршрута: [(таблица, проблема, SQL)]."""
+        path = get_route_path(route)
+        if path is None:
+            return None, []
+        capture = PlanCapture()
+        with connection.execute_wrapper(capture):
+            response = client.get(path, route.params)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        explain = (
+            self.explain_postgresql if connection.vendor == 'postgresql'
+            else self.explain_sqlite
+        )
+        problems = []
+        with connection.cursor() as cursor:
+            # Одинаковые запросы разбираются один раз. Запросы без
+            # WHERE и LIMIT (построение индексов в памяти) читают
+            # таблицу целиком намеренно.
+            for sql, params in dict(capture.queries).items():
+                if ' WHERE ' not in sql and ' LIMIT ' not in sql:
+                    continue
+                problems.extend(
+                    (table, problem, sql)
+                    for table, problem in explain(
+                        cursor, sql, params, sizes, min_rows
+                    )
+                )
+        return path, problems
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError('Поддерживаются PostgreSQL и SQLite.')
+        client = APIClient()
+        client.force_authenticate(self.get_user(options['user']))
+        sizes = self.get_table_sizes()
+        found = 0
+        with override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache'
+            }}
+        ):
+            for route in self.get_routes():
+                path, problems = self.audit(
+                    client, route, sizes, options['min_rows']
+                )
+                if path is None:
+                    continue
+                query = unquote(urlencode(route.params, doseq=True))
+                name = f'{path}?{query}' if query else path
+                self.stdout.write(
+                    f'{name}: ' + ('проблем нет' if not problems
+                                   else f'проблем {len(problems)}')
+                )
+                for table, problem, sql in problems:
+                    self.stdout.write(self.style.WARNING(
+                        f'    {problem} {table}\n        {sql[:300]}'
+                    ))
+                found += len(problems)
+        if found and options['strict']:
+            raise CommandError(f'Найдено проблем: {found}')
+        self.stdout.write(
+            self.style.SUCCESS(f'Аудит завершен, проблем: {found}')
+        )
@@ -0,0 +1,73 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+
+from api.services import filter_feed
+from recipes.models import Recipe
+from users.models import Subscrption, User
+
+
+class Command(BaseCommand):
+    help = ('Замер ленты подписок для пользователей с наибольшим числом '
+            'подписок: первая и глубокая страницы, полусоединение '
+            'с подписками и список id авторов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument(
+            '--depth', type=int, default=50,
+            help='Номер страницы для замера глубокой страницы.'
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def by_ids(self, queryset, user):
+        """Вариант с заранее прочитанным списком авторов."""
+        return queryset.filter(author__in=list(
+            Subscrption.objects.filter(
+                user=user
+            ).values_list('following_id', flat=True)
+        ))
+
+    def page(self, feed, user, limit, cursor):
+        queryset = feed(Recipe.objects.all(), user)
+        if cursor:
+            pub_date, pk = cursor
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk),
+                pub_date__lte=pub_date
+            )
+        return list(
+            queryset.order_by('-pub_date', '-pk')
+            .values_list('pub_date', 'pk')[:limit]
+        )
+
+    def measure(self, feed, user, limit, cursor, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            self.page(feed, user, limit, cursor)
+        return (time.perf_counter() - start) / repeat * 1000
+
+    def handle(self, *args, **options):
+        limit, repeat = options['limit'], options['repeat']
+        users = User.objects.annotate(
+            subscriptions=Count('follower')
+        ).order_by('-subscriptions')[:options['users']]
+        self.stdout.write(
+            f'{"подписок":>9} {"semi 1":>8} {"semi N":>8} '
+            f'{"ids 1":>8} {"ids N":>8}  (мс)'
+        )
+        for user in users:
+            # Курсор глубокой страницы: последний рецепт depth страниц.
+            deep = self.page(filter_feed, user, limit * options['depth'], None)
+            cursor = deep[-1] if deep else None
+            times = [
+                self.measure(feed, user, limit, page_cursor, repeat)
+                for feed in (filter_feed, self.by_ids)
+                for page_cursor in (None, cursor)
+            ]
+            self.stdout.write(
+                f'{user.subscriptions:9} '
+                + ' '.join(f'{value:8.2f}' for value in times)
+            )
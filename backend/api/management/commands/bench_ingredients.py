@@ -0,0 +1,73 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rest_framework import filters
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.indexes import ingredient_index
+from api.serializers import IngredientSerializer
+from recipes.models import Ingredient
+
+
+class SearchView:
+    """Представление с прежними настройками поиска ингредиентов."""
+
+    search_fields = ('^name',)
+
+
+class Command(BaseCommand):
+    help = ('Сравнение поиска ингредиентов через индекс в памяти '
+            'и через SearchFilter.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--prefix-length', type=int, default=2)
+
+    def get_prefixes(self, length):
+        names = Ingredient.objects.values_list('name', flat=True)
+        return sorted({name[:length] for name in names if name})
+
+    def run_search_filter(self, prefix):
+        request = Request(
+            APIRequestFactory().get('/', {settings.REST_FRAMEWORK.get(
+                'SEARCH_PARAM', 'search'): prefix})
+        )
+        queryset = filters.SearchFilter().filter_queryset(
+            request, Ingredient.objects.all(), SearchView()
+        )
+        return IngredientSerializer(queryset, many=True).data
+
+    def run_index(self, prefix):
+        return ingredient_index.search(
+            prefix, settings.INGREDIENTS_SEARCH_LIMIT
+        )
+
+    def measure(self, func, prefixes, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for prefix in prefixes:
+                func(prefix)
+        return (time.perf_counter() - start) / (repeat * len(prefixes))
+
+    def handle(self, *args, **options):
+        prefixes = self.get_prefixes(options['prefix_length'])
+        if not prefixes:
+            self.stdout.write(self.style.ERROR('Ингредиенты не загружены!'))
+            return
+        start = time.perf_counter()
+        ingredient_index.invalidate()
+        ingredient_index.get_data()
+        build = time.perf_counter() - start
+
+        repeat = options['repeat']
+        old = self.measure(self.run_search_filter, prefixes, repeat)
+        new = self.measure(self.run_index, prefixes, repeat)
+        self.stdout.write(
+            f'Префиксов: {len(prefixes)}, повторов: {repeat}\n'
+            f'Построение индекса: {build * 1000:.1f} мс\n'
+            f'SearchFilter: {old * 1000:.3f} мс на запрос\n'
+            f'Индекс: {new * 1000:.3f} мс на запрос\n'
+            f'Ускорение: {old / new:.1f}x'
+        )
@@ -0,0 +1,81 @@
+import random
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from api.search import get_backend, search_basic, search_recipes
+from recipes.models import Ingredient, Recipe
+
+
+class Command(BaseCommand):
+    help = ('Сравнение полнотекстового поиска рецептов с поиском '
+            'подстроки на текущих данных. Данные масштаба 100k+ '
+            'рецептов готовит generate_data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--skip-basic', action='store_true',
+            help='Не замерять поиск подстроки: на больших данных он долгий.'
+        )
+        parser.add_argument(
+            '--skip-rebuild', action='store_true',
+            help='Не пересчитывать поисковый индекс перед замером.'
+        )
+
+    def get_terms(self, count, rng):
+        """Слова из названий ингредиентов, их начала и слова с опечаткой."""
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        words = [word for name in names for word in name.split()
+                 if len(word) > 4]
+        terms = []
+        for word in rng.sample(words, min(count, len(words))):
+            kind = rng.randrange(3)
+            if kind == 1:
+                word = word[:rng.randint(3, len(word) - 1)]
+            elif kind == 2:
+                pos = rng.randrange(1, len(word) - 1)
+                word = word[:pos] + word[pos + 1] + word[pos] + word[pos + 2:]
+            terms.append(word)
+        return terms
+
+    def measure(self, search, terms, limit):
+        """Среднее время страницы результатов с подсчетом, мс."""
+        start = time.perf_counter()
+        found = 0
+        for term in terms:
+            queryset = search(Recipe.objects.all(), term)
+            list(queryset.values_list('pk', flat=True)[:limit])
+            found += bool(queryset.count())
+        return (time.perf_counter() - start) / len(terms) * 1000, found
+
+    def handle(self, *args, **options):
+        terms = self.get_terms(
+            options['queries'], random.Random(options['seed'])
+        )
+        if not terms:
+            self.stdout.write(self.style.ERROR('Ингредиенты не загружены!'))
+            return
+        if not options['skip_rebuild']:
+            # Индекс должен покрывать все рецепты, иначе полнотекстовый
+            # поиск быстр только потому, что ничего не находит.
+            call_command('rebuild_search_index', stdout=self.stdout)
+        self.stdout.write(
+            f'Рецептов: {Recipe.objects.count()}, запросов: {len(terms)}, '
+            f'поиск: {get_backend()}'
+        )
+        new, found = self.measure(search_recipes, terms, options['limit'])
+        self.stdout.write(
+            f'Полнотекстовый: {new:.2f} мс на запрос, '
+            f'найдено по {found} запросам'
+        )
+        if not options['skip_basic']:
+            old, found = self.measure(search_basic, terms, options['limit'])
+            self.stdout.write(
+                f'Подстрока: {old:.2f} мс на запрос, '
+                f'найдено по {found} запросам\n'
+                f'Ускорение: {old / new:.1f}x'
+            )
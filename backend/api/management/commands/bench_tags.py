@@ -0,0 +1,84 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.indexes import TagIndex, bitmap_to_ids, popcount
+
+
+class Command(BaseCommand):
+    help = ('Замер фильтрации рецептов по тегам через битовые карты '
+            'на синтетических данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--tags', type=int, default=20)
+        parser.add_argument('--queries', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def generate_rows(self, recipes, slugs, rng):
+        """Связи рецептов с тегами: популярные теги встречаются чаще."""
+        weights = [1 / (rank + 1) for rank in range(len(slugs))]
+        for recipe_id in range(1, recipes + 1):
+            for slug in set(rng.choices(slugs, weights, k=rng.randint(1, 3))):
+                yield slug, recipe_id
+
+    def measure(self, func, queries):
+        start = time.perf_counter()
+        for query in queries:
+            func(query)
+        return (time.perf_counter() - start) / len(queries) * 1000
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        slugs = [f'tag{idx}' for idx in range(options['tags'])]
+        rows = list(self.generate_rows(options['recipes'], slugs, rng))
+
+        start = time.perf_counter()
+        bitmaps = TagIndex.build_bitmaps(slugs, rows)
+        build = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        sets = {slug: set() for slug in slugs}
+        for slug, recipe_id in rows:
+            sets[slug].add(recipe_id)
+        build_sets = (time.perf_counter() - start) * 1000
+
+        queries = [
+            rng.sample(slugs, rng.randint(1, 3))
+            for _ in range(options['queries'])
+        ]
+
+        def union_bitmaps(query):
+            bitmap = 0
+            for slug in query:
+                bitmap |= bitmaps[slug]
+            return bitmap
+
+        def union_sets(query):
+            return set().union(*(sets[slug] for slug in query))
+
+        size = sum(
+            (bitmap.bit_length() + 7) // 8 for bitmap in bitmaps.values()
+        )
+        timings = (
+            ('Объединение и подсчет, битовые карты',
+             lambda query: popcount(union_bitmaps(query))),
+            ('Объединение и подсчет, множества',
+             lambda query: len(union_sets(query))),
+            ('Список id, битовые карты',
+             lambda query: bitmap_to_ids(union_bitmaps(query))),
+            ('Список id, множества',
+             lambda query: sorted(union_sets(query))),
+        )
+        self.stdout.write(
+            f'Рецептов: {options["recipes"]}, тегов: {len(slugs)}, '
+            f'связей: {len(rows)}\n'
+            f'Построение битовых карт: {build:.1f} мс, '
+            f'размер {size / 1024:.0f} КБ\n'
+            f'Построение множеств: {build_sets:.1f} мс'
+        )
+        for title, func in timings:
+            self.stdout.write(
+                f'{title}: {self.measure(func, queries):.3f} мс на запрос'
+            )
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from api.query_budget import check_query_budgets, get_user
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверить число SQL-запросов основных маршрутов API '
+        'на текущих данных. Завершается ошибкой при превышении бюджета.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Email пользователя, от имени которого идут запросы. '
+                 'По умолчанию - пользователь с наибольшим числом подписок.'
+        )
+
+    def get_user(self, email):
+        user = get_user(email)
+        if user is None:
+            raise CommandError('Пользователь не найден!')
+        return user
+
+    def handle(self, *args, **options):
+        client = APIClient()
+        client.force_authenticate(self.get_user(options['user']))
+        # Общий кеш ответов скрыл бы запросы к базе.
+        with override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache'
+            }}
+        ):
+            results = check_query_budgets(client)
+        exceeded = 0
+        for route, path, queries, status_code in results:
+            line = (
+                f'{route.url_name:32} {queries:3} / {route.budget:<3} '
+                f'HTTP {status_code} {path}'
+            )
+            if queries > route.budget:
+                exceeded += 1
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+        if exceeded:
+            raise CommandError(f'Превышен бюджет запросов: {exceeded}')
+        self.stdout.write(self.style.SUCCESS('Бюджеты запросов соблюдены!'))
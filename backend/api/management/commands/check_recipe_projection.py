@@ -0,0 +1,80 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.projections import build_recipes, project_recipes
+from api.query_budget import get_user
+from api.renderers import FastJSONRenderer
+from api.serializers import RecipeGetSerializer
+from api.views import RecipeViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнить байт в байт ответы с рецептами: сериализаторы '
+        'и JSONRenderer против api.projections и FastJSONRenderer. '
+        'Проверка идет от имени пользователя и анонима.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Email пользователя. По умолчанию - пользователь '
+                 'с наибольшим числом подписок.'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=500,
+            help='Сколько последних рецептов сравнивать.'
+        )
+
+    def get_user(self, email):
+        user = get_user(email)
+        if user is None:
+            raise CommandError('Пользователь не найден!')
+        return user
+
+    def get_request(self, user):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        return request
+
+    def compare(self, user, limit):
+        """Id рецептов, ответы для которых различаются."""
+        request = self.get_request(user)
+        view = RecipeViewSet(request=request, format_kwarg=None)
+        queryset = view.get_queryset()[:limit]
+        expected = RecipeGetSerializer(
+            queryset, many=True, context={'request': request}
+        ).data
+        actual = build_recipes(project_recipes(queryset), request)
+        if len(expected) != len(actual):
+            raise CommandError(
+                f'Разное число рецептов: {len(expected)} и {len(actual)}'
+            )
+        old, new = JSONRenderer(), FastJSONRenderer()
+        if old.render(expected) == new.render(actual):
+            return []
+        return [
+            recipe['id']
+            for recipe, projected in zip(expected, actual)
+            if old.render(recipe) != new.render(projected)
+        ] or ['порядок']
+
+    def handle(self, *args, **options):
+        failed = 0
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for user in (self.get_user(options['user']), AnonymousUser()):
+                mismatches = self.compare(user, options['limit'])
+                line = f'{user}: различий {len(mismatches)}'
+                if mismatches:
+                    failed += 1
+                    line = self.style.ERROR(
+                        f'{line}, рецепты {mismatches[:20]}'
+                    )
+                self.stdout.write(line)
+        if failed:
+            raise CommandError('Ответы различаются!')
+        self.stdout.write(self.style.SUCCESS('Ответы совпадают!'))
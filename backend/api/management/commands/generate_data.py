@@ -0,0 +1,245 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from recipes.models import (DataVersion, Favorite, Ingredient, Recipe,
+                            RecipeIngredient, RecipeTag, ShoppingCart, Tag)
+from users.models import Subscrption, User
+
+PASSWORD = 'bench-password'
+IMAGE_NAME = 'bench/recipe.jpg'
+
+
+class Zipf:
+    """
+    Выбор элементов с распределением Ципфа: первые элементы
+    выпадают намного чаще последних. Порядок популярности задается
+    перемешиванием с фиксированным зерном.
+    """
+
+    def __init__(self, population, rng, exponent=1.0):
+        self.population = list(population)
+        rng.shuffle(self.population)
+        self.cum_weights = list(accumulate(
+            1 / (rank + 1) ** exponent
+            for rank in range(len(self.population))
+        ))
+        self.rng = rng
+
+    def sample(self, count, exclude=None):
+        """До count различных элементов (повторы отбрасываются)."""
+        chosen = set(self.rng.choices(
+            self.population, cum_weights=self.cum_weights, k=count
+        ))
+        chosen.discard(exclude)
+        return chosen
+
+
+@contextmanager
+def keep_pub_date():
+    """Не подменять дату публикации текущей при bulk_create."""
+    field = Recipe._meta.get_field('pub_date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        'Сгенерировать детерминированный набор данных: пользователей, '
+        'рецепты с тегами и ингредиентами, избранное, списки покупок '
+        'и подписки с неравномерным распределением популярности. '
+        'Ингредиенты должны быть загружены заранее (load_data).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--favorites', type=int, default=20,
+            help='Среднее число рецептов в избранном пользователя.'
+        )
+        parser.add_argument(
+            '--cart', type=int, default=5,
+            help='Среднее число рецептов в списке покупок пользователя.'
+        )
+        parser.add_argument(
+            '--subscriptions', type=int, default=10,
+            help='Среднее число подписок пользователя.'
+        )
+        parser.add_argument('--tags', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--prefix', default='bench')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def bulk_create(self, model, objects):
+        """Вставить объекты порциями, не держа их все в памяти."""
+        batch, total = [], 0
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                model.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        model.objects.bulk_create(batch)
+        total += len(batch)
+        self.stdout.write(f'{model._meta.verbose_name_plural}: {total}')
+
+    def count(self, mean):
+        """Число элементов у пользователя: экспоненциальное со средним."""
+        return int(self.rng.expovariate(1 / mean)) if mean else 0
+
+    def get_tags(self, count):
+        tags = list(Tag.objects.values_list('pk', flat=True))
+        for idx in range(len(tags), count):
+            tag = Tag.objects.create(
+                name=f'{self.prefix} tag {idx}',
+                slug=f'{self.prefix}-tag-{idx}',
+                color=f'#{self.rng.randrange(0x1000000):06x}'
+            )
+            tags.append(tag.pk)
+        return tags
+
+    def get_image(self):
+        if not default_storage.exists(IMAGE_NAME):
+            buffer = BytesIO()
+            Image.new('RGB', (1200, 800), '#e26c2d').save(buffer, 'JPEG')
+            default_storage.save(IMAGE_NAME, ContentFile(buffer.getvalue()))
+        return IMAGE_NAME
+
+    def generate_users(self, count):
+        password = make_password(PASSWORD)
+        self.bulk_create(User, (
+            User(
+                username=f'{self.prefix}{idx}',
+                email=f'{self.prefix}{idx}@example.com',
+                first_name='Имя',
+                last_name=f'Фамилия{idx}',
+                password=password
+            )
+            for idx in range(count)
+        ))
+        return list(
+            User.objects.filter(
+                username__startswith=self.prefix
+            ).order_by('pk').values_list('pk', flat=True)
+        )
+
+    def generate_recipes(self, count, authors):
+        image = self.get_image()
+        now = timezone.now()
+        with keep_pub_date():
+            self.bulk_create(Recipe, (
+                Recipe(
+                    author_id=author_id,
+                    name=f'{self.prefix} рецепт {idx}',
+                    text='Описание рецепта. ' * self.rng.randint(1, 20),
+                    image=image,
+                    cooking_time=self.rng.randint(5, 180),
+                    pub_date=now - timedelta(
+                        minutes=count - idx + self.rng.random()
+                    )
+                )
+                for idx, author_id in enumerate(
+                    self.rng.choices(
+                        authors.population,
+                        cum_weights=authors.cum_weights,
+                        k=count
+                    )
+                )
+            ))
+        return list(
+            Recipe.objects.filter(
+                name__startswith=f'{self.prefix} рецепт '
+            ).order_by('pk').values_list('pk', flat=True)
+        )
+
+    def generate_recipe_tags(self, recipe_ids, tags):
+        self.bulk_create(RecipeTag, (
+            RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in tags.sample(self.rng.randint(1, 3))
+        ))
+
+    def generate_recipe_ingredients(self, recipe_ids, ingredients):
+        self.bulk_create(RecipeIngredient, (
+            RecipeIngredient(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=self.rng.randint(1, 500)
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in ingredients.sample(self.rng.randint(3, 12))
+        ))
+
+    def generate_links(self, model, field, user_ids, targets, mean):
+        """Избранное, списки покупок или подписки пользователей."""
+        # На себя пользователь не подписывается.
+        exclude_self = model is Subscrption
+        self.bulk_create(model, (
+            model(user_id=user_id, **{f'{field}_id': target_id})
+            for user_id in user_ids
+            for target_id in targets.sample(
+                self.count(mean), exclude=user_id if exclude_self else None
+            )
+        ))
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.prefix = options['prefix']
+        self.batch_size = options['batch_size']
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {self.prefix} уже есть, '
+                'укажите другой --prefix.'
+            )
+        ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+        if not ingredient_ids:
+            raise CommandError('Сначала загрузите ингредиенты: load_data.')
+
+        with transaction.atomic():
+            ingredients = Zipf(ingredient_ids, self.rng)
+            tags = Zipf(self.get_tags(options['tags']), self.rng)
+            user_ids = self.generate_users(options['users'])
+            authors = Zipf(user_ids, self.rng, exponent=1.2)
+            recipe_ids = self.generate_recipes(options['recipes'], authors)
+            self.generate_recipe_tags(recipe_ids, tags)
+            self.generate_recipe_ingredients(recipe_ids, ingredients)
+            recipes = Zipf(recipe_ids, self.rng)
+            self.generate_links(
+                Favorite, 'recipe', user_ids, recipes, options['favorites']
+            )
+            self.generate_links(
+                ShoppingCart, 'recipe', user_ids, recipes, options['cart']
+            )
+            self.generate_links(
+                Subscrption, 'following', user_ids, authors,
+                options['subscriptions']
+            )
+        # Счетчики, списки покупок и поисковый индекс считаются
+        # по готовым данным: bulk_create не вызывает сигналы.
+        call_command('reconcile_counters', stdout=self.stdout)
+        call_command('reconcile_shopping_lists', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        for name in (
+            DataVersion.RECIPE_TAGS,
+            DataVersion.RECIPE_INGREDIENTS,
+            DataVersion.RECIPES
+        ):
+            DataVersion.bump(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные сгенерированы. Пароль пользователей: {PASSWORD}'
+        ))
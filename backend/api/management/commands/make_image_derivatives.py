@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.images import make_derivatives
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Подготовить уменьшенные копии картинок уже созданных рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать копии даже для обработанных картинок.'
+        )
+        parser.add_argument(
+            '--workers', type=int,
+            default=max(settings.RECIPE_IMAGE_WORKERS, 1)
+        )
+
+    def process(self, recipe_id, force):
+        try:
+            return make_derivatives(recipe_id, force)
+        except Exception as error:
+            self.stderr.write(f'Рецепт {recipe_id}: {error}')
+            return False
+        finally:
+            connections.close_all()
+
+    def handle(self, *args, **options):
+        recipe_ids = Recipe.objects.exclude(image='').order_by(
+            'pk'
+        ).values_list('pk', flat=True).iterator()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            done = sum(pool.map(
+                lambda pk: self.process(pk, options['force']), recipe_ids
+            ))
+        self.stdout.write(
+            self.style.SUCCESS(f'Подготовлены копии картинок: {done}')
+        )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from api.search import get_backend, update_search_index
+from recipes.models import DataVersion, Recipe
+
+
+class Command(BaseCommand):
+    help = 'Пересчитать поисковый индекс всех рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if backend == 'basic':
+            self.stdout.write('Полнотекстовый поиск в этой базе недоступен.')
+            return
+        total, last_pk = 0, 0
+        while True:
+            pks = list(
+                Recipe.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not pks:
+                break
+            update_search_index(pks)
+            total += len(pks)
+            last_pk = pks[-1]
+        DataVersion.bump(DataVersion.RECIPES)
+        self.stdout.write(self.style.SUCCESS(
+            f'Поисковый индекс ({backend}) пересчитан: {total} рецептов'
+        ))
@@ -0,0 +1,87 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from api.services import count_related
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscrption, User
+
+# Модель со счетчиками: {поле-счетчик: (связанная модель, поле связи)}.
+COUNTERS = (
+    (Recipe, {
+        'favorites_count': (Favorite, 'recipe'),
+        'shopping_cart_count': (ShoppingCart, 'recipe'),
+    }),
+    (User, {
+        'recipes_count': (Recipe, 'author'),
+        'followers_count': (Subscrption, 'following'),
+    }),
+)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитать счетчики рецептов и пользователей и исправить их.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только сообщить о расхождениях, ничего не исправляя.'
+        )
+
+    def fix_batch(self, model, pks, actual, drift, counters, dry_run):
+        """
+        Исправить счетчики порции записей. Записи блокируются
+        до подсчета: конкурентное F()-изменение счетчика дождется
+        коммита и применится к исправленному значению, а не
+        затрется им.
+        """
+        with transaction.atomic():
+            if not dry_run:
+                list(
+                    model.objects.select_for_update().filter(pk__in=pks)
+                    .order_by('pk').values_list('pk', flat=True)
+                )
+            rows = list(
+                model.objects.filter(pk__in=pks).annotate(**actual)
+                .filter(drift).only('pk', *counters)
+            )
+            for row in rows:
+                for field in counters:
+                    setattr(row, field, getattr(row, f'actual_{field}'))
+            if not dry_run:
+                model.objects.bulk_update(rows, counters)
+        return len(rows)
+
+    def reconcile(self, model, counters, batch_size, dry_run):
+        """Пересчитать счетчики модели порциями по первичному ключу."""
+        actual = {
+            f'actual_{field}': count_related(*related)
+            for field, related in counters.items()
+        }
+        drift = Q()
+        for field in counters:
+            drift |= ~Q(**{field: F(f'actual_{field}')})
+        fixed, last_pk = 0, 0
+        while True:
+            pks = list(
+                model.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                return fixed
+            last_pk = pks[-1]
+            fixed += self.fix_batch(
+                model, pks, actual, drift, counters, dry_run
+            )
+
+    def handle(self, *args, **options):
+        for model, counters in COUNTERS:
+            fixed = self.reconcile(
+                model, counters, options['batch_size'], options['dry_run']
+            )
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: '
+                f'записей с расхождениями: {fixed}'
+            )
+        self.stdout.write(self.style.SUCCESS('Счетчики проверены!'))
@@ -0,0 +1,94 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Sum
+
+from api.services import lock_users
+from recipes.models import ShoppingCart, ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = ('Пересчитать списки покупок пользователей по корзинам '
+            'и сообщить о расхождениях.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только сообщить о расхождениях, ничего не исправляя.'
+        )
+
+    def get_user_ids(self):
+        return sorted(
+            set(ShoppingCart.objects.values_list('user_id', flat=True))
+            | set(ShoppingListItem.objects.values_list('user_id', flat=True))
+        )
+
+    def get_expected(self, user_ids):
+        rows = ShoppingCart.objects.filter(
+            user_id__in=user_ids,
+            recipe__recipe_ingredients__isnull=False
+        ).values(
+            'user_id',
+            ingredient_id=F('recipe__recipe_ingredients__ingredient_id')
+        ).annotate(
+            total=Sum('recipe__recipe_ingredients__amount')
+        ).order_by()
+        return {
+            (row['user_id'], row['ingredient_id']): row['total']
+            for row in rows
+        }
+
+    def reconcile(self, user_ids, dry_run):
+        # Пока списки пересчитываются, корзины этих пользователей
+        # не меняются.
+        lock_users(user_ids)
+        expected = self.get_expected(user_ids)
+        actual = {
+            (item.user_id, item.ingredient_id): item
+            for item in ShoppingListItem.objects.select_for_update().filter(
+                user_id__in=user_ids
+            )
+        }
+        to_create = [
+            ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id,
+                             amount=amount)
+            for (user_id, ingredient_id), amount in expected.items()
+            if (user_id, ingredient_id) not in actual
+        ]
+        to_update, to_delete = [], []
+        for key, item in actual.items():
+            if key not in expected:
+                to_delete.append(item.pk)
+            elif item.amount != expected[key]:
+                item.amount = expected[key]
+                to_update.append(item)
+        if not dry_run:
+            ShoppingListItem.objects.bulk_create(to_create)
+            ShoppingListItem.objects.bulk_update(to_update, ('amount',))
+            ShoppingListItem.objects.filter(pk__in=to_delete).delete()
+        return len(to_create), len(to_update), len(to_delete)
+
+    def handle(self, *args, **options):
+        user_ids = self.get_user_ids()
+        batch_size = options['batch_size']
+        missing = wrong = extra = 0
+        for start in range(0, len(user_ids), batch_size):
+            with transaction.atomic():
+                created, updated, deleted = self.reconcile(
+                    user_ids[start:start + batch_size], options['dry_run']
+                )
+            missing += created
+            wrong += updated
+            extra += deleted
+        self.stdout.write(
+            f'Пользователей: {len(user_ids)}\n'
+            f'Недостающих позиций: {missing}\n'
+            f'Позиций с неверным количеством: {wrong}\n'
+            f'Лишних позиций: {extra}'
+        )
+        if missing or wrong or extra:
+            message = ('Найдены расхождения' if options['dry_run']
+                       else 'Расхождения исправлены')
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет!'))
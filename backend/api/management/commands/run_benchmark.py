@@ -0,0 +1,194 @@
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from api.query_budget import (QUERY_BUDGETS, Route, get_route_path,
+                              query_budget)
+from recipes.models import Recipe, Tag
+from users.models import User
+
+# Маршруты бенчмарка: маршруты с бюджетами запросов и типичные фильтры.
+EXTRA_ROUTES = (
+    Route('recipes-list', {'limit': 6, 'page': 3}, None, False),
+    Route('recipes-list', {'limit': 6, 'is_favorited': 1}, None, False),
+    Route('recipes-list', {'limit': 6, 'is_in_shopping_cart': 1}, None,
+          False),
+)
+
+
+def percentile(samples, percent):
+    if len(samples) < 2:
+        return samples[0] if samples else 0
+    return statistics.quantiles(samples, n=100)[percent - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный замер API в процессе: запросы к настоящим маршрутам '
+        'через тестовый клиент DRF в несколько потоков. Считает '
+        'задержки p50/p95/p99 и SQL-запросы на запрос, сохраняет JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Число запросов к каждому маршруту.'
+        )
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument(
+            '--users', type=int, default=20,
+            help='Сколько разных пользователей делают запросы.'
+        )
+        parser.add_argument(
+            '--no-cache', action='store_true',
+            help='Отключить кеш Django на время замера.'
+        )
+        parser.add_argument('--output', help='Файл для результатов в JSON.')
+        parser.add_argument(
+            '--compare', help='Файл с прошлыми результатами для сравнения.'
+        )
+
+    def get_routes(self):
+        routes = []
+        tag = Tag.objects.values_list('slug', flat=True).first()
+        if tag:
+            routes.append(
+                Route('recipes-list', {'limit': 6, 'tags': tag}, None, False)
+            )
+        routes = list(QUERY_BUDGETS) + list(EXTRA_ROUTES) + routes
+        named = []
+        for route in routes:
+            path = get_route_path(route)
+            if path is not None:
+                query = '&'.join(f'{k}={v}' for k, v in route.params.items())
+                named.append((f'{path}?{query}' if query else path, route))
+        return named
+
+    def request(self, client, path, params):
+        """Один запрос: (длительность в мс, SQL-запросов, статус)."""
+        with query_budget(float('inf')) as budget:
+            start = time.perf_counter()
+            response = client.get(path, params)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            duration = (time.perf_counter() - start) * 1000
+        return duration, len(budget.queries), response.status_code
+
+    def worker(self, user, jobs):
+        client = APIClient()
+        client.force_authenticate(user)
+        try:
+            return [
+                (name, *self.request(client, path, params))
+                for name, path, params in jobs
+            ]
+        finally:
+            connections.close_all()
+
+    def run(self, routes, users, options):
+        jobs = [
+            (name, get_route_path(route), route.params)
+            for name, route in routes
+            for _ in range(options['requests'])
+        ]
+        workers = options['concurrency']
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            parts = pool.map(
+                lambda idx: self.worker(
+                    users[idx % len(users)], jobs[idx::workers]
+                ),
+                range(workers)
+            )
+            samples = [sample for part in parts for sample in part]
+        return samples, time.perf_counter() - start
+
+    def summarize(self, routes, samples):
+        results = {}
+        for name, _ in routes:
+            rows = [sample[1:] for sample in samples if sample[0] == name]
+            durations = [duration for duration, _, _ in rows]
+            queries = [count for _, count, _ in rows]
+            results[name] = {
+                'requests': len(rows),
+                'errors': sum(status >= 400 for _, _, status in rows),
+                'mean_ms': round(statistics.mean(durations), 2),
+                'p50_ms': round(percentile(durations, 50), 2),
+                'p95_ms': round(percentile(durations, 95), 2),
+                'p99_ms': round(percentile(durations, 99), 2),
+                'queries_mean': round(statistics.mean(queries), 2),
+                'queries_max': max(queries),
+            }
+        return results
+
+    def report(self, results, previous):
+        self.stdout.write(
+            f'{"маршрут":60} {"p50":>8} {"p95":>8} {"p99":>8} '
+            f'{"SQL":>6} {"ошибки":>6}'
+        )
+        for name, row in results.items():
+            line = (
+                f'{name[:60]:60} {row["p50_ms"]:8.1f} {row["p95_ms"]:8.1f} '
+                f'{row["p99_ms"]:8.1f} {row["queries_mean"]:6.1f} '
+                f'{row["errors"]:6}'
+            )
+            old = previous.get(name)
+            if old:
+                line += (
+                    f'  p95 {row["p95_ms"] - old["p95_ms"]:+.1f} мс, '
+                    f'SQL {row["queries_mean"] - old["queries_mean"]:+.1f}'
+                )
+            self.stdout.write(line)
+
+    def handle(self, *args, **options):
+        users = list(
+            User.objects.filter(is_active=True)
+            .order_by('pk')[:options['users']]
+        )
+        if not users:
+            raise CommandError('Нет пользователей: запустите generate_data.')
+        previous = {}
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                previous = json.load(file)['results']
+        overrides = {'ALLOWED_HOSTS': ['testserver']}
+        if options['no_cache']:
+            overrides['CACHES'] = {'default': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache'
+            }}
+        with override_settings(**overrides):
+            routes = self.get_routes()
+            samples, elapsed = self.run(routes, users, options)
+        results = self.summarize(routes, samples)
+        self.report(results, previous)
+        self.stdout.write(
+            f'Всего запросов: {len(samples)} за {elapsed:.1f} с, '
+            f'{len(samples) / elapsed:.0f} запросов/с'
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump({
+                    'meta': {
+                        'date': datetime.now().isoformat(),
+                        'database': connection.vendor,
+                        'debug': settings.DEBUG,
+                        'requests': options['requests'],
+                        'concurrency': options['concurrency'],
+                        'users': len(users),
+                        'cache': not options['no_cache'],
+                        'recipes': Recipe.objects.count(),
+                        'elapsed_s': round(elapsed, 2),
+                    },
+                    'results': results,
+                }, file, ensure_ascii=False, indent=2)
+            self.stdout.write(
+                self.style.SUCCESS(f'Результаты: {options["output"]}')
+            )
@@ -0,0 +1,98 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+from api.db_router import is_pinned, pin, read_from_replica
+from api.timing import QueryTimer, collect_timings
+
+logger = logging.getLogger(__name__)
+
+
+class ServerTimingMiddleware:
+    """
+    Замеры запроса: число SQL-запросов и время в базе, время
+    сериализации, представления и отрисовки ответа.
+    Отдаются в заголовке Server-Timing; запросы, превысившие
+    SLOW_REQUEST_QUERIES или SLOW_REQUEST_MS, пишутся в лог.
+    Подключается настройкой SERVER_TIMING.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with collect_timings() as timings, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(QueryTimer())
+                )
+            response = self.get_response(request)
+        total = (time.perf_counter() - start) * 1000
+        view_end = getattr(request, '_timing_view_end', None)
+        if view_end is not None:
+            timings['view'] = [(view_end - start) * 1000, 1]
+            timings['render'] = [
+                (time.perf_counter() - view_end) * 1000, 1
+            ]
+        timings['total'] = [total, 1]
+        response['Server-Timing'] = self.get_header(timings)
+        self.log_slow(request, response, timings)
+        return response
+
+    def process_template_response(self, request, response):
+        # Вызывается после представления и до отрисовки ответа DRF.
+        request._timing_view_end = time.perf_counter()
+        return response
+
+    @staticmethod
+    def get_header(timings):
+        metrics = []
+        for name, (duration, count) in timings.items():
+            metric = f'{name};dur={duration:.1f}'
+            if name == 'db':
+                metric += f';desc="{count} queries"'
+            metrics.append(metric)
+        return ', '.join(metrics)
+
+    @staticmethod
+    def log_slow(request, response, timings):
+        queries = timings.get('db', (0, 0))[1]
+        total = timings['total'][0]
+        if (
+            queries > settings.SLOW_REQUEST_QUERIES
+            or total > settings.SLOW_REQUEST_MS
+        ):
+            logger.warning(
+                '%s %s %s: %d SQL-запросов, %.1f мс (%s)',
+                request.method, request.get_full_path(),
+                response.status_code, queries, total,
+                ServerTimingMiddleware.get_header(timings)
+            )
+
+
+class ReplicaMiddleware:
+    """
+    Чтение с реплик (REPLICA_DATABASES) для безопасных запросов.
+    После запроса на запись клиент на REPLICA_PIN_SECONDS секунд
+    закрепляется за основной базой, чтобы видеть свои изменения.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REPLICA_DATABASES:
+            return self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            pin(request, response)
+            return response
+        if is_pinned(request):
+            return self.get_response(request)
+        with read_from_replica():
+            return self.get_response(request)
@@ -1,7 +1,191 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from datetime import datetime
+from functools import partial
+
 from django.conf import settings
-from rest_framework.pagination import PageNumberPagination
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, PageNumberPagination,
+                                       replace_query_param)
+from rest_framework.response import Response
+
+from api.caching import get_data_version, get_tags_version
+from api.indexes import tag_index
+from recipes.models import DataVersion
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 6)
+    max_page_size = settings.MAX_PAGE_SIZE
+
+
+class CountedPaginator(Paginator):
+    """Пагинатор, общее число объектов для которого считает count_func."""
+
+    def __init__(self, object_list, per_page, count_func, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_func = count_func
+
+    @cached_property
+    def count(self):
+        return self.count_func(self.object_list)
+
+
+def estimate_count(model):
+    """Оценка числа строк таблицы по статистике планировщика PostgreSQL."""
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE relname = %s',
+            (model._meta.db_table,)
+        )
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] > 0 else None
+
+
+class RecipeCursorPagination(BasePagination):
+    """
+    Курсорная пагинация рецептов по ключу (pub_date, id).
+    Следующая страница выбирается условием по ключу, а не OFFSET,
+    поэтому глубокие страницы стоят столько же, сколько первая.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 6)
+    max_page_size = settings.MAX_PAGE_SIZE
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def get_page_size(self, request):
+        limit = request.query_params.get(self.page_size_query_param, '')
+        if limit.isdigit() and int(limit) > 0:
+            return min(int(limit), self.max_page_size)
+        return self.page_size
+
+    def encode_cursor(self, recipe, reverse):
+        # Страница может состоять из строк values() (api.projections).
+        if isinstance(recipe, dict):
+            pub_date, pk = recipe['pub_date'], recipe['id']
+        else:
+            pub_date, pk = recipe.pub_date, recipe.pk
+        position = f'{pub_date.isoformat()}|{pk}|{int(reverse)}'
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param,
+            urlsafe_b64encode(position.encode()).decode()
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            pub_date, pk, reverse = urlsafe_b64decode(
+                encoded.encode()
+            ).decode().split('|')
+            return datetime.fromisoformat(pub_date), int(pk), reverse == '1'
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor[2]
+        if cursor is None:
+            queryset = queryset.order_by('-pub_date', '-pk')
+        else:
+            pub_date, pk, _ = cursor
+            # Избыточная граница по pub_date дает базе диапазон индекса
+            # вместо проверки условия OR для каждой строки.
+            if reverse:
+                queryset = queryset.filter(
+                    Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk),
+                    pub_date__gte=pub_date
+                ).order_by('pub_date', 'pk')
+            else:
+                queryset = queryset.filter(
+                    Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk),
+                    pub_date__lte=pub_date
+                ).order_by('-pub_date', '-pk')
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        self.page = results[:page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+
+class RecipePagination(CustomPageNumberPagination):
+    """
+    Пагинация рецептов.
+    По умолчанию постраничная: для запросов только с тегами общее число
+    рецептов считается по индексу тегов, без фильтров - берется из кеша
+    или из статистики PostgreSQL. С параметром cursor включается
+    курсорный режим.
+    """
+
+    cursor_query_param = 'cursor'
+    counted_params = {'page', 'limit', 'tags', 'ordering', 'fields', 'omit'}
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.cursor_query_param in request.query_params:
+            self.cursor_paginator = RecipeCursorPagination()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        if set(request.query_params) <= self.counted_params:
+            self.django_paginator_class = partial(
+                CountedPaginator,
+                count_func=partial(self.get_count, request=request)
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_count(self, queryset, request):
+        tags = [tag for tag in request.query_params.getlist('tags') if tag]
+        if tags:
+            return tag_index.count(tags, get_tags_version(request))
+        estimate = estimate_count(queryset.model)
+        if estimate and estimate >= settings.RECIPES_COUNT_ESTIMATE_MIN:
+            return estimate
+        # Версия в ключе сбрасывает кеш при добавлении и удалении
+        # рецептов, таймаут ограничивает жизнь старых ключей.
+        version, _ = get_data_version(request, DataVersion.RECIPES)
+        key = f'recipes-count:{version}'
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, settings.RECIPES_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
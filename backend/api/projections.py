@@ -0,0 +1,163 @@
+from collections import defaultdict
+
+from rest_framework.exceptions import ValidationError
+
+from api.images import build_image_urls
+from api.services import get_subscribed_ids
+from api.timing import timed
+from recipes.models import Recipe, RecipeIngredient, RecipeTag
+
+# Быстрое чтение рецептов: вместо экземпляров моделей и вложенных
+# сериализаторов строки values() собираются в словари той же формы,
+# что и у RecipeGetSerializer. Число запросов не зависит от размера
+# страницы: рецепты с авторами, теги, ингредиенты и подписки.
+# Совпадение ответов проверяет команда check_recipe_projection.
+RECIPE_FIELDS = (
+    'id', 'tags', 'author', 'ingredients', 'is_favorited',
+    'is_in_shopping_cart', 'images', 'name', 'text', 'image',
+    'cooking_time',
+)
+FLAG_FIELDS = ('is_favorited', 'is_in_shopping_cart')
+# Столбцы рецепта для полей ответа. id и pub_date (ключ курсорной
+# пагинации) выбираются всегда, теги и ингредиенты - отдельными
+# запросами.
+FIELD_COLUMNS = {
+    'author': (
+        'author_id', 'author__email', 'author__username',
+        'author__first_name', 'author__last_name',
+    ),
+    'images': ('image', 'image_derivatives'),
+    'name': ('name',),
+    'text': ('text',),
+    'image': ('image',),
+    'cooking_time': ('cooking_time',),
+}
+
+
+def split_fields(values):
+    return {
+        name.strip()
+        for value in values
+        for name in value.split(',')
+        if name.strip()
+    }
+
+
+def get_recipe_fields(query_params):
+    """
+    Поля рецепта в ответе по параметрам fields (только эти поля)
+    и omit (все, кроме этих). Поле id выводится всегда.
+    """
+    requested = split_fields(query_params.getlist('fields'))
+    omitted = split_fields(query_params.getlist('omit'))
+    unknown = (requested | omitted) - set(RECIPE_FIELDS)
+    if unknown:
+        raise ValidationError({
+            'fields': f'Неизвестные поля: {", ".join(sorted(unknown))}'
+        })
+    fields = requested or set(RECIPE_FIELDS)
+    return frozenset(fields - omitted | {'id'})
+
+
+def project_recipes(queryset, fields=RECIPE_FIELDS):
+    """
+    Выборка рецептов в виде строк values() для пагинации: только
+    столбцы запрошенных полей. Флаги пользователя берутся
+    из аннотаций, если они есть.
+    """
+    columns = {'id': None, 'pub_date': None}
+    for name in RECIPE_FIELDS:
+        if name in fields:
+            columns.update(dict.fromkeys(FIELD_COLUMNS.get(name, ())))
+    annotations = queryset.query.annotations
+    columns.update(dict.fromkeys(
+        name for name in FLAG_FIELDS if name in fields and name in annotations
+    ))
+    return queryset.prefetch_related(None).values(*columns)
+
+
+def get_tags_by_recipe(recipe_ids):
+    """Теги рецептов одним запросом в порядке модели тегов."""
+    tags = defaultdict(list)
+    rows = RecipeTag.objects.filter(recipe_id__in=recipe_ids).order_by(
+        'tag__name'
+    ).values_list(
+        'recipe_id', 'tag_id', 'tag__name', 'tag__color', 'tag__slug'
+    )
+    for recipe_id, pk, name, color, slug in rows:
+        tags[recipe_id].append(
+            {'id': pk, 'name': name, 'color': color, 'slug': slug}
+        )
+    return tags
+
+
+def get_ingredients_by_recipe(recipe_ids):
+    """Ингредиенты рецептов с единицами измерения одним запросом."""
+    ingredients = defaultdict(list)
+    rows = RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('pk').values_list(
+        'recipe_id', 'ingredient_id', 'ingredient__name',
+        'ingredient__measurement_unit__name', 'amount'
+    )
+    for recipe_id, pk, name, unit, amount in rows:
+        ingredients[recipe_id].append({
+            'id': pk, 'name': name, 'measurement_unit': unit,
+            'amount': amount,
+        })
+    return ingredients
+
+
+def get_image_url(name, request):
+    if not name:
+        return None
+    url = Recipe._meta.get_field('image').storage.url(name)
+    if request is not None:
+        url = request.build_absolute_uri(url)
+    return url
+
+
+def build_recipes(rows, request, fields=RECIPE_FIELDS):
+    """
+    Словари рецептов из строк project_recipes. Теги, ингредиенты
+    и подписки читаются, только если их поля запрошены.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+    recipe_ids = [row['id'] for row in rows]
+    if 'tags' in fields:
+        tags = get_tags_by_recipe(recipe_ids)
+    if 'ingredients' in fields:
+        ingredients = get_ingredients_by_recipe(recipe_ids)
+    if 'author' in fields:
+        subscribed = get_subscribed_ids(request)
+    getters = {
+        'id': lambda row: row['id'],
+        'tags': lambda row: tags.get(row['id'], []),
+        'author': lambda row: {
+            'email': row['author__email'],
+            'id': row['author_id'],
+            'username': row['author__username'],
+            'first_name': row['author__first_name'],
+            'last_name': row['author__last_name'],
+            'is_subscribed': row['author_id'] in subscribed,
+        },
+        'ingredients': lambda row: ingredients.get(row['id'], []),
+        'is_favorited': lambda row: row.get('is_favorited', False),
+        'is_in_shopping_cart': (
+            lambda row: row.get('is_in_shopping_cart', False)
+        ),
+        'images': lambda row: build_image_urls(
+            row['image'] or '', row['image_derivatives'], request
+        ),
+        'name': lambda row: row['name'],
+        'text': lambda row: row['text'],
+        'image': lambda row: get_image_url(row['image'], request),
+        'cooking_time': lambda row: row['cooking_time'],
+    }
+    getters = [
+        (name, getters[name]) for name in RECIPE_FIELDS if name in fields
+    ]
+    with timed('serializer'):
+        return [{name: get(row) for name, get in getters} for row in rows]
@@ -0,0 +1,139 @@
+from collections import namedtuple
+from contextlib import ExitStack
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Count
+from django.urls import reverse
+
+from api.authentication import token_cache
+from recipes.models import Recipe
+from users.models import User
+
+# Маршрут с бюджетом SQL-запросов. Бюджет не зависит от объема
+# данных: рост числа запросов с размером выборки - это N+1.
+Route = namedtuple('Route', ('url_name', 'params', 'budget', 'detail'))
+
+QUERY_BUDGETS = (
+    Route('recipes-list', {'limit': 20}, 8, False),
+    Route('recipes-detail', {}, 6, True),
+    Route('users-subscriptions', {'limit': 20, 'recipes_limit': 3}, 6, False),
+    Route('users-list', {'limit': 20}, 5, False),
+    Route('ingredients-list', {'name': 'а'}, 3, False),
+    Route('tags-list', {}, 3, False),
+    Route('recipes-download-shopping-cart', {}, 3, False),
+)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class query_budget:
+    """
+    Проверить, что блок выполняет не больше budget SQL-запросов
+    по всем подключениям:
+
+        with query_budget(10):
+            client.get(url)
+
+    Выполненные запросы доступны в атрибуте queries.
+    """
+
+    def __init__(self, budget, label=''):
+        self.budget = budget
+        self.label = label
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self.stack = ExitStack()
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stack.close()
+        if exc_type is None and len(self.queries) > self.budget:
+            raise QueryBudgetExceeded(
+                f'{self.label}: {len(self.queries)} SQL-запросов при '
+                f'бюджете {self.budget}:\n' + '\n'.join(self.queries)
+            )
+
+
+def get_user(email=None):
+    """
+    Пользователь для проверок: по email или с наибольшим числом
+    подписок, чтобы в ответах были подписки. None, если не найден.
+    """
+    if email:
+        return User.objects.filter(email=email).first()
+    return User.objects.annotate(
+        subscriptions=Count('follower')
+    ).order_by('-subscriptions', 'pk').first()
+
+
+def get_route_path(route):
+    """Путь маршрута; для детальных - по первому рецепту или None."""
+    if not route.detail:
+        return reverse(route.url_name)
+    pk = Recipe.objects.values_list('pk', flat=True).first()
+    if pk is None:
+        return None
+    return reverse(route.url_name, kwargs={'pk': pk})
+
+
+def check_query_budgets(client, routes=QUERY_BUDGETS, repeat=2):
+    """
+    Запросить маршруты клиентом и сравнить число SQL-запросов
+    с бюджетом. Каждый маршрут запрашивается repeat раз: в бюджет
+    должны укладываться и первый запрос, и повторные.
+    Возвращает [(маршрут, путь, максимум запросов, статус ответа)].
+    """
+    results = []
+    for route in routes:
+        path = get_route_path(route)
+        if path is None:
+            continue
+        worst, status_code = 0, None
+        for _ in range(repeat):
+            with query_budget(float('inf')) as budget:
+                response = client.get(path, route.params)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            worst = max(worst, len(budget.queries))
+            status_code = response.status_code
+        results.append((route, path, worst, status_code))
+    return results
+
+
+class QueryBudgetTestMixin:
+    """
+    Проверка бюджетов для тестов: маршруты запрашиваются с пустыми
+    кешами, чтобы кеш не скрыл запросы к базе.
+
+        class BudgetTest(QueryBudgetTestMixin, TestCase):
+            def test_budgets(self):
+                self.assertQueryBudgets(client)
+    """
+
+    def assertQueryBudgets(self, client, routes=QUERY_BUDGETS):
+        exceeded = []
+        for route in routes:
+            cache.clear()
+            token_cache.clear()
+            for _, path, queries, status_code in check_query_budgets(
+                client, (route,), repeat=1
+            ):
+                self.assertEqual(status_code, 200, path)
+                if queries > route.budget:
+                    exceeded.append(
+                        f'{path}: {queries} при бюджете {route.budget}'
+                    )
+        if exceeded:
+            raise QueryBudgetExceeded(
+                'Превышен бюджет запросов:\n' + '\n'.join(exceeded)
+            )
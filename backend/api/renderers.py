@@ -0,0 +1,119 @@
+import csv
+import json
+
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON-рендерер на orjson. Компактный вывод совпадает с JSONRenderer
+    байт в байт: типы, которых orjson не знает (и даты, чтобы формат
+    был тем же), преобразует кодировщик DRF. Ответы с отступами
+    и то, что orjson закодировать не может, рендерит JSONRenderer.
+    """
+
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is None and self.compact and not self.ensure_ascii:
+            try:
+                ret = orjson.dumps(
+                    data, default=self.encoder_class().default,
+                    option=self.options
+                )
+            except orjson.JSONEncodeError:
+                pass
+            else:
+                return ret.replace(
+                    '\u2028'.encode(), b'\\u2028'
+                ).replace('\u2029'.encode(), b'\\u2029')
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """
+    Базовый рендерер списка покупок.
+    Сам список отдаётся потоком через stream(), render() нужен только
+    для ответов с ошибками.
+    """
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+    def stream(self, ingredients):
+        """Построчно отдать список покупок."""
+        raise NotImplementedError
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, ingredients):
+        yield 'Список покупок:\n'
+        for ingredient in ingredients:
+            yield (f'\n{ingredient["name"]} ({ingredient["m_unit"]}) - '
+                   f'{ingredient["amount"]}')
+
+
+class Echo:
+    """Буфер, который возвращает записанное вместо хранения."""
+
+    def write(self, value):
+        return value
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ('Ингредиент', 'Единица измерения', 'Количество')
+        )
+        for ingredient in ingredients:
+            yield writer.writerow((ingredient['name'], ingredient['m_unit'],
+                                   ingredient['amount']))
+
+
+class JSONShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, ingredients):
+        yield '['
+        for idx, ingredient in enumerate(ingredients):
+            yield (',' if idx else '') + json.dumps({
+                'name': ingredient['name'],
+                'measurement_unit': ingredient['m_unit'],
+                'amount': ingredient['amount'],
+            }, ensure_ascii=False)
+        yield ']'
+
+
+class MarkdownShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/markdown'
+    format = 'markdown'
+
+    def stream(self, ingredients):
+        yield '# Список покупок\n\n'
+        for ingredient in ingredients:
+            yield (f'- [ ] {ingredient["name"]} ({ingredient["m_unit"]}) '
+                   f'— {ingredient["amount"]}\n')
+
+
+SHOPPING_LIST_RENDERERS = (
+    TextShoppingListRenderer,
+    CSVShoppingListRenderer,
+    JSONShoppingListRenderer,
+    MarkdownShoppingListRenderer,
+)
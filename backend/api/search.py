@@ -0,0 +1,193 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from recipes.models import DataVersion, Recipe
+
+# Таблица FTS5 для SQLite; в PostgreSQL вектор поиска хранится
+# в столбце search_vector таблицы рецептов. Оба создаются миграцией
+# recipes.0020_recipe_search и в модели не описаны, чтобы не
+# выбираться в каждом запросе рецептов.
+FTS_TABLE = 'recipes_recipe_search'
+WORD_RE = re.compile(r'\w+')
+
+# Текст рецепта для индекса: название, ингредиенты и описание.
+DOCUMENTS_SQL = (
+    'SELECT r.id, r.name, r.text, ('
+    'SELECT group_concat(i.name, \' \') FROM recipes_recipeingredient ri '
+    'JOIN recipes_ingredient i ON i.id = ri.ingredient_id '
+    'WHERE ri.recipe_id = r.id'
+    ') FROM recipes_recipe r WHERE r.id IN ({})'
+)
+POSTGRES_UPDATE_SQL = (
+    'UPDATE recipes_recipe r SET search_vector = '
+    'setweight(to_tsvector(%(config)s::regconfig, r.name), \'A\') || '
+    'setweight(to_tsvector(%(config)s::regconfig, coalesce(('
+    'SELECT string_agg(i.name, \' \') FROM recipes_recipeingredient ri '
+    'JOIN recipes_ingredient i ON i.id = ri.ingredient_id '
+    'WHERE ri.recipe_id = r.id'
+    '), \'\')), \'B\') || '
+    'setweight(to_tsvector(%(config)s::regconfig, r.text), \'C\') '
+    'WHERE r.id = ANY(%(ids)s)'
+)
+
+
+@lru_cache(maxsize=None)
+def has_fts_table(alias):
+    """
+    Есть ли таблица FTS5: SQLite может быть собран без FTS5.
+    Проверяется один раз на процесс.
+    """
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def get_backend():
+    """Способ поиска по текущей базе: postgresql, fts5 или basic."""
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor == 'sqlite' and has_fts_table(connection.alias):
+        return 'fts5'
+    return 'basic'
+
+
+def get_fts5_query(value):
+    """
+    Запрос FTS5 из пользовательской строки: каждое слово в кавычках,
+    последнее - как префикс, чтобы искать по мере набора.
+    """
+    words = WORD_RE.findall(value.lower())
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' AND '.join(terms)
+
+
+def empty_result(queryset):
+    """Пустая выборка с рангом, по которому сортирует search_recipes."""
+    return queryset.annotate(
+        search_rank=Value(0.0, output_field=FloatField())
+    ).none()
+
+
+def search_postgresql(queryset, value):
+    """
+    Полнотекстовый поиск с русской конфигурацией плюс поиск
+    по триграммам названия, находящий рецепты с опечатками.
+    """
+    config = settings.SEARCH_CONFIG
+    query = 'websearch_to_tsquery(%s::regconfig, %s)'
+    ids = RawSQL(
+        f'SELECT id FROM recipes_recipe WHERE search_vector @@ {query} '
+        'OR name %% %s',
+        (config, value, value)
+    )
+    rank = RawSQL(
+        f'coalesce(ts_rank_cd(recipes_recipe.search_vector, {query}), 0) '
+        '+ similarity(recipes_recipe.name, %s)',
+        (config, value, value),
+        output_field=FloatField()
+    )
+    return queryset.filter(pk__in=ids).annotate(search_rank=rank)
+
+
+def search_fts5(queryset, value):
+    """Поиск по таблице FTS5 с ранжированием bm25."""
+    match = get_fts5_query(value)
+    if match is None:
+        return empty_result(queryset)
+    ids = RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (match,)
+    )
+    # bm25 тем меньше, чем лучше совпадение; веса - название,
+    # описание, ингредиенты.
+    rank = RawSQL(
+        f'(SELECT -bm25({FTS_TABLE}, 10.0, 1.0, 4.0) FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s '
+        f'AND {FTS_TABLE}.rowid = recipes_recipe.id)',
+        (match,),
+        output_field=FloatField()
+    )
+    return queryset.filter(pk__in=ids).annotate(search_rank=rank)
+
+
+def search_basic(queryset, value):
+    """Поиск подстроки для баз без полнотекстового поиска."""
+    words = WORD_RE.findall(value)
+    if not words:
+        return empty_result(queryset)
+    condition = Q()
+    for word in words:
+        condition &= (
+            Q(name__icontains=word)
+            | Q(text__icontains=word)
+            | Q(ingredients__name__icontains=word)
+        )
+    ids = Recipe.objects.filter(condition).values('pk')
+    return queryset.filter(pk__in=ids).annotate(
+        search_rank=Value(0.0, output_field=FloatField())
+    )
+
+
+BACKENDS = {
+    'postgresql': search_postgresql,
+    'fts5': search_fts5,
+    'basic': search_basic,
+}
+
+
+def search_recipes(queryset, value):
+    """
+    Отфильтровать рецепты по строке поиска и упорядочить
+    по релевантности, затем по дате публикации.
+    """
+    queryset = BACKENDS[get_backend()](queryset, value)
+    return queryset.order_by('-search_rank', '-pub_date', '-id')
+
+
+def update_search_index(recipe_ids):
+    """Пересчитать поисковый индекс рецептов."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    backend = get_backend()
+    with connection.cursor() as cursor:
+        if backend == 'postgresql':
+            cursor.execute(POSTGRES_UPDATE_SQL, {
+                'config': settings.SEARCH_CONFIG, 'ids': recipe_ids
+            })
+        elif backend == 'fts5':
+            placeholders = ', '.join(['%s'] * len(recipe_ids))
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+                recipe_ids
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, text, ingredients) '
+                + DOCUMENTS_SQL.format(placeholders),
+                recipe_ids
+            )
+
+
+def delete_from_search_index(recipe_ids):
+    """Убрать удаленные рецепты из таблицы FTS5."""
+    if get_backend() != 'fts5':
+        return
+    recipe_ids = list(recipe_ids)
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+            recipe_ids
+        )
+
+
+def reindex_recipe(recipe_id):
+    """Обновить индекс одного рецепта и сбросить кеш ответов."""
+    update_search_index([recipe_id])
+    DataVersion.bump(DataVersion.RECIPES)
@@ -1,15 +1,32 @@
+from django.conf import settings
 from django.db import transaction
+from django.db.models import prefetch_related_objects
 from djoser.serializers import (
     UserCreateSerializer as DjoserUserCreateSerialiser,
     UserSerializer as DjoserUserSerialiser)
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
-from recipes.models import Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag
+from api.images import get_image_urls
+from api.services import (change_recipe_in_shopping_lists,
+                          get_recipes_limit, get_subscribed_ids,
+                          prefetch_latest_recipes)
+from api.timing import timed
+from recipes.models import (DataVersion, Ingredient, Recipe, RecipeIngredient,
+                            RecipeTag, Tag)
 from users.models import User
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class TimedSerializerMixin:
+    """Учитывает время сериализации в замерах запроса (Server-Timing)."""
+
+    def to_representation(self, instance):
+        with timed('serializer'):
+            return super().to_representation(instance)
+
+
+class IngredientSerializer(TimedSerializerMixin,
+                           serializers.ModelSerializer):
     """Сериализатор отображения ингредиента."""
 
     measurement_unit = serializers.SlugRelatedField(
@@ -20,7 +37,7 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit',)
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор отображения тега."""
 
     class Meta:
@@ -28,14 +45,13 @@ class TagSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class UserSerializer(DjoserUserSerialiser):
+class UserSerializer(TimedSerializerMixin, DjoserUserSerialiser):
     """Сериализатор пользователя при отображении пользователя."""
 
     is_subscribed = serializers.SerializerMethodField()
 
     def get_is_subscribed(self, obj):
-        return obj.following.filter(
-            user=self.context['request'].user.id).exists()
+        return obj.id in get_subscribed_ids(self.context.get('request'))
 
     class Meta(DjoserUserSerialiser.Meta):
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
@@ -75,7 +91,7 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount',)
 
 
-class RecipeGetSerializer(serializers.ModelSerializer):
+class RecipeGetSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для отображения рецепта."""
 
     tags = TagSerializer(many=True)
@@ -85,10 +101,15 @@ class RecipeGetSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.BooleanField(default=False)
     is_in_shopping_cart = serializers.BooleanField(default=False)
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        exclude = ('pub_date', 'who_likes', 'who_buys',)
+        exclude = ('pub_date', 'who_likes', 'who_buys', 'favorites_count',
+                   'shopping_cart_count', 'image_derivatives',)
+
+    def get_images(self, obj):
+        return get_image_urls(obj, self.context.get('request'))
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
@@ -101,33 +122,89 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     )
     image = Base64ImageField()
 
-    def create_tags(self, tags, recipe):
-        data = []
-        for tag in tags:
-            data.append(RecipeTag(recipe=recipe, tag=tag))
-        RecipeTag.objects.bulk_create(data)
-
-    def find_idx(self, lst, key, value):
-        for i, dic in enumerate(lst):
-            if dic[key] == value:
-                return i
-        return -1
-
-    def create_ingredients(self, ingredients, recipe):
-        data = []
-        obj_ingredients = Ingredient.objects.filter(
-            pk__in=[ingredient['ingredient'] for ingredient in ingredients]
+    def validate_ingredients(self, value):
+        ids = [ingredient['ingredient'] for ingredient in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError(
+                'Ингредиенты в рецепте не должны повторяться!'
+            )
+        missing = set(ids) - set(
+            Ingredient.objects.filter(pk__in=ids).values_list('pk', flat=True)
+        )
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты с id {sorted(missing)} не найдены!'
+            )
+        return value
+
+    def create_tags(self, tag_ids, recipe):
+        if not tag_ids:
+            return
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag_id=tag_id) for tag_id in tag_ids
         )
-        for obj_ingredient in obj_ingredients:
-            idx = self.find_idx(ingredients, 'ingredient', obj_ingredient.pk)
-            data.append(
-                RecipeIngredient(
-                    recipe=recipe,
-                    ingredient=obj_ingredient,
-                    amount=ingredients[idx].get('amount')
-                )
+        DataVersion.bump_on_commit(DataVersion.RECIPE_TAGS)
+
+    def create_ingredients(self, amounts, recipe):
+        if not amounts:
+            return
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
             )
-        RecipeIngredient.objects.bulk_create(data)
+            for ingredient_id, amount in amounts.items()
+        )
+        DataVersion.bump_on_commit(DataVersion.RECIPE_INGREDIENTS)
+
+    def get_amounts(self, ingredients):
+        """Количества ингредиентов: {id ингредиента: количество}."""
+        return {
+            ingredient['ingredient']: ingredient.get('amount')
+            for ingredient in ingredients
+        }
+
+    def update_tags(self, tags, recipe):
+        """Добавить новые и удалить убранные теги рецепта."""
+        current = set(
+            RecipeTag.objects.filter(
+                recipe=recipe
+            ).values_list('tag_id', flat=True)
+        )
+        new = {tag.id for tag in tags}
+        if current - new:
+            RecipeTag.objects.filter(
+                recipe=recipe, tag_id__in=current - new
+            ).delete()
+        self.create_tags(new - current, recipe)
+
+    def update_ingredients(self, ingredients, recipe):
+        """
+        Изменить ингредиенты рецепта: добавить новые, обновить
+        изменившиеся количества и удалить убранные.
+        """
+        amounts = self.get_amounts(ingredients)
+        current = {
+            item.ingredient_id: item
+            for item in RecipeIngredient.objects.filter(recipe=recipe)
+        }
+        old_amounts = {pk: item.amount for pk, item in current.items()}
+        changed = []
+        for ingredient_id, item in current.items():
+            amount = amounts.get(ingredient_id, item.amount)
+            if item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        removed = current.keys() - amounts.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        self.create_ingredients({
+            ingredient_id: amount for ingredient_id, amount in amounts.items()
+            if ingredient_id not in current
+        }, recipe)
+        change_recipe_in_shopping_lists(recipe.id, old_amounts, amounts)
 
     @transaction.atomic
     def create(self, validated_data):
@@ -135,31 +212,30 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         ingredients = validated_data.pop('ingredients')
 
         recipe = Recipe.objects.create(**validated_data)
-        self.create_tags(tags, recipe)
-        self.create_ingredients(ingredients, recipe)
+        self.create_tags({tag.id for tag in tags}, recipe)
+        self.create_ingredients(self.get_amounts(ingredients), recipe)
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        instance.name = validated_data.get('name', instance.name)
-        instance.text = validated_data.get('text', instance.text)
-        instance.image = validated_data.get('image', instance.image)
-        instance.cooking_time = validated_data.get(
-            'cooking_time', instance.cooking_time
-        )
+        tags = validated_data.pop('tags', None)
+        if tags is not None:
+            self.update_tags(tags, instance)
 
-        tags = validated_data.pop('tags')
-        RecipeTag.objects.filter(recipe=instance).delete()
-        self.create_tags(tags, instance)
+        ingredients = validated_data.pop('ingredients', None)
+        if ingredients is not None:
+            self.update_ingredients(ingredients, instance)
 
-        ingredients = validated_data.pop('ingredients')
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        self.create_ingredients(ingredients, instance)
-
-        instance.save()
-        return instance
+        return super().update(instance, validated_data)
 
     def to_representation(self, instance):
+        # После сохранения UpdateModelMixin сбрасывает подгруженные
+        # связи: без повторной подгрузки ингредиенты читались бы
+        # по одному.
+        prefetch_related_objects(
+            [instance], 'tags',
+            'recipe_ingredients__ingredient__measurement_unit'
+        )
         return RecipeGetSerializer(
             instance,
             context={'request': self.context.get('request')}
@@ -171,33 +247,77 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         model = Recipe
 
 
-class FavoriteGetSerializer(serializers.ModelSerializer):
+class FavoriteGetSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для отображения избранного."""
 
+    images = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
+
+    def get_images(self, obj):
+        return get_image_urls(obj, self.context.get('request'))
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Сериализатор списка id рецептов для пакетных операций."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPES_BATCH_MAX
+    )
+
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
+
+
+class WhatToCookSerializer(serializers.Serializer):
+    """Параметры подбора рецептов по имеющимся ингредиентам."""
+
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.WHAT_TO_COOK_MAX_INGREDIENTS
+    )
+    tags = serializers.ListField(
+        child=serializers.SlugField(), required=False, default=list
+    )
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.WHAT_TO_COOK_MAX_LIMIT,
+        default=settings.WHAT_TO_COOK_LIMIT
+    )
+
+
+class CookableRecipeSerializer(FavoriteGetSerializer):
+    """Рецепт с покрытием его ингредиентов имеющимися."""
+
+    coverage = serializers.FloatField()
+    matched = serializers.IntegerField()
+    missing = serializers.IntegerField()
+
+    class Meta(FavoriteGetSerializer.Meta):
+        fields = FavoriteGetSerializer.Meta.fields + (
+            'coverage', 'matched', 'missing'
+        )
 
 
 class SubscriptionsSerializer(UserSerializer):
     """Сериализатор для отображения подписок пользователя."""
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
 
     def get_recipes(self, obj):
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
-        recipes = Recipe.objects.filter(author=obj)
-        limit = request.query_params.get('recipes_limit')
-        if limit:
-            recipes = recipes[:int(limit)]
+        if not hasattr(obj, 'latest_recipes'):
+            prefetch_latest_recipes([obj], get_recipes_limit(request))
         return FavoriteGetSerializer(
-            recipes, many=True, context={'request': request}).data
-
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
+            obj.latest_recipes, many=True, context={'request': request}).data
 
     class Meta(UserSerializer.Meta):
         fields = UserSerializer.Meta.fields + ('recipes', 'recipes_count')
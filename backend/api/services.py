@@ -1,26 +1,319 @@
-from django.db.models import F, Sum
+from django.db.models import (Count, Exists, F, OuterRef, Subquery, Sum,
+                              Window)
+from django.db.models.functions import Coalesce, RowNumber
 
-from recipes.models import RecipeIngredient
+from recipes.models import (Favorite, Recipe, RecipeIngredient, ShoppingCart,
+                            ShoppingListItem)
+from users.models import Subscrption, User
 
+SHOPPING_LIST_CHUNK_SIZE = 500
 
-def generate_shopping_list(user):
-    """Формирование списка покупок в текстовом виде."""
+ADDED = 'added'
+REMOVED = 'removed'
+ALREADY_EXISTS = 'already_exists'
+NOT_FOUND = 'not_found'
+NOT_PRESENT = 'not_present'
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно изменить поле-счетчик записи модели на delta."""
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def count_related(model, field):
+    """Подзапрос: число записей model, ссылающихся полем field на строку."""
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+def get_subscribed_ids(request):
+    """
+    Множество id авторов, на которых подписан текущий пользователь.
+    Загружается одним запросом и кешируется на объекте запроса,
+    поэтому все сериализаторы пользователя в ответе читают его повторно.
+    """
+    if not request or request.user.is_anonymous:
+        return frozenset()
+    if not hasattr(request, '_subscribed_ids'):
+        request._subscribed_ids = set(
+            request.user.follower.values_list('following_id', flat=True)
+        )
+    return request._subscribed_ids
+
+
+def get_recipe_flags(user, recipe_ids):
+    """
+    Флаги пользователя для рецептов одним запросом:
+    {id рецепта: (в избранном, в списке покупок, подписан на автора)}.
+    """
+    rows = Recipe.objects.filter(pk__in=recipe_ids).annotate(
+        is_favorited=Exists(Favorite.objects.filter(
+            recipe=OuterRef('pk'), user=user.id
+        )),
+        is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+            recipe=OuterRef('pk'), user=user.id
+        )),
+        is_subscribed=Exists(Subscrption.objects.filter(
+            following=OuterRef('author'), user=user.id
+        ))
+    ).values_list(
+        'pk', 'is_favorited', 'is_in_shopping_cart', 'is_subscribed'
+    )
+    return {pk: flags for pk, *flags in rows}
+
+
+def filter_feed(queryset, user):
+    """
+    Лента подписок: рецепты авторов, на которых подписан пользователь.
+    Полусоединение с подписками позволяет базе выбрать план: обход
+    индекса (pub_date, id) с проверкой автора или диапазоны индекса
+    (author, pub_date, id) по каждому автору.
+    """
+    return queryset.filter(
+        author__in=Subscrption.objects.filter(user=user).values('following')
+    )
+
+
+def get_recipes_limit(request):
+    """Значение параметра recipes_limit или None, если он не задан."""
+    limit = request.query_params.get('recipes_limit') if request else None
+    if limit is None or not limit.isdigit():
+        return None
+    return int(limit)
+
+
+def prefetch_latest_recipes(authors, limit=None):
+    """
+    Подгрузить последние рецепты для списка авторов одним запросом.
+    Рецепты каждого автора ранжируются оконной функцией по дате
+    публикации, в атрибут latest_recipes автора попадают первые limit.
+    """
+    authors = list(authors)
+    if not authors:
+        return authors
+    ranked = (
+        Recipe.objects
+        .filter(author__in=authors)
+        .only(
+            'id', 'name', 'image', 'image_derivatives', 'cooking_time',
+            'author_id'
+        )
+        .annotate(recipe_rank=Window(
+            expression=RowNumber(),
+            partition_by=F('author_id'),
+            order_by=(F('pub_date').desc(), F('id').desc())
+        ))
+        .order_by()
+    )
+    sql, params = ranked.query.sql_with_params()
+    query = f'SELECT * FROM ({sql}) ranked'
+    if limit is not None:
+        query += ' WHERE ranked.recipe_rank <= %s'
+        params += (limit,)
+    query += ' ORDER BY ranked.author_id, ranked.recipe_rank'
+
+    by_author = {author.id: [] for author in authors}
+    for recipe in Recipe.objects.raw(query, params):
+        by_author[recipe.author_id].append(recipe)
+    for author in authors:
+        author.latest_recipes = by_author[author.id]
+    return authors
+
+
+def get_recipe_amounts(recipe_id):
+    """Количества ингредиентов рецепта: {id ингредиента: количество}."""
+    return dict(
+        RecipeIngredient.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', 'amount')
+    )
 
-    # Берем список рецептов пользователя из корзины
-    recipes = user.in_shopping_cart.values('recipe')
-    ingredients = RecipeIngredient.objects.filter(
-        recipe__in=recipes
-    ).values(
+
+def get_recipes_amounts(recipe_ids):
+    """
+    Суммарные количества ингредиентов нескольких рецептов:
+    {id ингредиента: количество}.
+    """
+    return dict(
+        RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by().values('ingredient_id').annotate(
+            total=Sum('amount')
+        ).values_list('ingredient_id', 'total')
+    )
+
+
+def lock_users(user_ids):
+    """
+    Заблокировать строки пользователей до конца транзакции: изменения
+    избранного, списка покупок и его позиций у одного пользователя
+    выполняются по очереди. Строки блокируются по возрастанию id,
+    чтобы параллельные транзакции не ждали друг друга по кругу.
+    """
+    list(
+        User.objects.select_for_update().filter(
+            pk__in=user_ids
+        ).order_by('pk').values_list('pk', flat=True)
+    )
+
+
+def update_shopping_lists(user_ids, deltas):
+    """
+    Изменить суммарные количества ингредиентов в списках покупок.
+    Параметры:
+        user_ids: id пользователей, чьи списки меняются
+        deltas: {id ингредиента: изменение количества}
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    user_ids = list(user_ids)
+    if not deltas or not user_ids:
+        return
+    # select_for_update блокирует только существующие позиции: без
+    # блокировки пользователей две транзакции создали бы одну и ту же
+    # новую позицию, и вторая нарушила бы уникальность.
+    lock_users(user_ids)
+    existing = {
+        (item.user_id, item.ingredient_id): item
+        for item in ShoppingListItem.objects.select_for_update().filter(
+            user_id__in=user_ids, ingredient_id__in=deltas
+        )
+    }
+    to_create, to_update, to_delete = [], [], []
+    for user_id in user_ids:
+        for ingredient_id, delta in deltas.items():
+            item = existing.get((user_id, ingredient_id))
+            if item is None:
+                if delta > 0:
+                    to_create.append(ShoppingListItem(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        amount=delta
+                    ))
+            elif item.amount + delta > 0:
+                item.amount += delta
+                to_update.append(item)
+            else:
+                to_delete.append(item.pk)
+    ShoppingListItem.objects.bulk_create(to_create)
+    ShoppingListItem.objects.bulk_update(to_update, ('amount',))
+    ShoppingListItem.objects.filter(pk__in=to_delete).delete()
+
+
+def change_shopping_list(user_id, recipe_id, sign):
+    """Добавить (sign=1) или убрать (sign=-1) рецепт из списка покупок."""
+    update_shopping_lists([user_id], {
+        pk: sign * amount
+        for pk, amount in get_recipe_amounts(recipe_id).items()
+    })
+
+
+def change_recipe_in_shopping_lists(recipe_id, old_amounts, new_amounts):
+    """Учесть изменение ингредиентов рецепта в списках покупок."""
+    update_shopping_lists(
+        ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True),
+        {
+            pk: new_amounts.get(pk, 0) - old_amounts.get(pk, 0)
+            for pk in old_amounts.keys() | new_amounts.keys()
+        }
+    )
+
+
+def generate_shopping_list(user):
+    """
+    Список покупок: ингредиенты из корзины пользователя с суммарным
+    количеством. Читается из заранее посчитанных позиций списка
+    порциями по мере обхода.
+    """
+    return user.shopping_list.values(
+        'amount',
         name=F('ingredient__name'),
         m_unit=F('ingredient__measurement_unit__name')
-    ).annotate(
-        amount=Sum('amount')
-    ).order_by('name')
-
-    shopping_list = ('Список покупок:\n\n')
-    shopping_list += '\n'.join([
-        f'{ingredient["name"]} ({ingredient["m_unit"]}) - '
-        f'{ingredient["amount"]}'
-        for ingredient in ingredients
-    ])
-    return shopping_list
+    ).order_by('name').iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
+
+
+def change_counters(recipe_ids, field, delta):
+    """Изменить поле-счетчик сразу у нескольких рецептов на delta."""
+    queryset = Recipe.objects.filter(pk__in=recipe_ids)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def add_recipes_to(model, user, counter, recipe_ids):
+    """
+    Добавить несколько рецептов в избранное или в список покупок.
+    Должна вызываться внутри транзакции.
+    Параметры:
+        model: Favorite или ShoppingCart
+        counter: имя поля-счетчика добавлений в модели рецепта
+        recipe_ids: id добавляемых рецептов
+    Возвращает {id рецепта: результат}.
+    """
+    # Под блокировкой пользователя уже добавленные рецепты не могут
+    # появиться до вставки, поэтому счетчики растут только
+    # для действительно добавленных.
+    lock_users([user.id])
+    found = set(
+        Recipe.objects.filter(pk__in=recipe_ids).values_list('pk', flat=True)
+    )
+    present = set(
+        model.objects.filter(
+            user=user, recipe_id__in=found
+        ).values_list('recipe_id', flat=True)
+    )
+    added = found - present
+    if added:
+        model.objects.bulk_create(
+            (model(user=user, recipe_id=pk) for pk in added),
+            ignore_conflicts=True
+        )
+        change_counters(added, counter, 1)
+        if model is ShoppingCart:
+            update_shopping_lists([user.id], get_recipes_amounts(added))
+    return {
+        pk: ADDED if pk in added else
+        ALREADY_EXISTS if pk in present else NOT_FOUND
+        for pk in recipe_ids
+    }
+
+
+def remove_recipes_from(model, user, counter, recipe_ids=None):
+    """
+    Удалить рецепты из избранного или из списка покупок.
+    Без recipe_ids удаляются все рецепты пользователя.
+    Должна вызываться внутри транзакции.
+    Возвращает {id рецепта: результат}.
+    """
+    lock_users([user.id])
+    queryset = model.objects.filter(user=user)
+    if recipe_ids is not None:
+        queryset = queryset.filter(recipe_id__in=recipe_ids)
+    removed = set(
+        queryset.select_for_update().values_list('recipe_id', flat=True)
+    )
+    if removed:
+        model.objects.filter(user=user, recipe_id__in=removed).delete()
+        change_counters(removed, counter, -1)
+        if model is ShoppingCart:
+            if recipe_ids is None:
+                user.shopping_list.all().delete()
+            else:
+                update_shopping_lists([user.id], {
+                    pk: -amount
+                    for pk, amount in get_recipes_amounts(removed).items()
+                })
+    if recipe_ids is None:
+        recipe_ids = removed
+    return {
+        pk: REMOVED if pk in removed else NOT_PRESENT for pk in recipe_ids
+    }
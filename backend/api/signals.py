@@ -0,0 +1,130 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import token_cache
+from api.caching import get_users_me_cache_key
+from api.images import schedule_derivatives
+from api.indexes import ingredient_index
+from api.search import delete_from_search_index, reindex_recipe
+from api.services import (change_counter, change_recipe_in_shopping_lists,
+                          get_recipe_amounts)
+from recipes.models import (DataVersion, Ingredient, Measurement, Recipe,
+                            RecipeIngredient, RecipeTag, Tag)
+from users.models import User
+
+# Поля пользователя, которые попадают в ответы с рецептами.
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Measurement)
+def bump_catalogue_version(sender, **kwargs):
+    """Обновить версию каталога и сбросить индекс ингредиентов."""
+    DataVersion.bump(DataVersion.CATALOGUE)
+    if sender is not Tag:
+        ingredient_index.invalidate()
+
+
+@receiver((post_save, post_delete), sender=RecipeTag)
+def bump_recipe_tags_version(**kwargs):
+    """Обновить версию связей рецептов с тегами."""
+    DataVersion.bump_on_commit(DataVersion.RECIPE_TAGS)
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def bump_recipe_ingredients_version(**kwargs):
+    """Обновить версию связей рецептов с ингредиентами."""
+    DataVersion.bump_on_commit(DataVersion.RECIPE_INGREDIENTS)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+@receiver((post_save, post_delete), sender=RecipeTag)
+def bump_recipes_version(**kwargs):
+    """
+    Сбросить общий кеш рецептов после коммита: один раз на запись
+    рецепта со всеми тегами и ингредиентами.
+    """
+    DataVersion.bump_on_commit(DataVersion.RECIPES)
+
+
+@receiver(post_save, sender=User)
+def bump_recipes_version_on_author_change(created, update_fields=None,
+                                          **kwargs):
+    """
+    Сбросить общий кеш рецептов при изменении данных автора.
+    У нового пользователя рецептов в кеше нет.
+    """
+    if created:
+        return
+    if update_fields is None or set(update_fields) & AUTHOR_FIELDS:
+        DataVersion.bump_on_commit(DataVersion.RECIPES)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_shopping_lists(instance, **kwargs):
+    """Убрать ингредиенты удаляемого рецепта из списков покупок."""
+    change_recipe_in_shopping_lists(
+        instance.id, get_recipe_amounts(instance.id), {}
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def increase_recipes_count(instance, created, raw=False, **kwargs):
+    """
+    Увеличить счетчик рецептов автора нового рецепта, откуда бы
+    рецепт ни был создан: API, админка или консоль. В фикстурах
+    (raw) счетчики уже посчитаны.
+    """
+    if created and not raw:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_recipes_count(instance, **kwargs):
+    """Уменьшить счетчик рецептов автора удаленного рецепта."""
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def make_image_derivatives(instance, **kwargs):
+    """Подготовить копии новой картинки рецепта после коммита."""
+    if not instance.image:
+        return
+    if instance.image_derivatives.get('source') != instance.image.name:
+        transaction.on_commit(lambda: schedule_derivatives(instance.pk))
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search(instance, **kwargs):
+    """
+    Обновить поисковый индекс после коммита, когда ингредиенты
+    рецепта уже сохранены.
+    """
+    transaction.on_commit(lambda: reindex_recipe(instance.pk))
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_search(instance, **kwargs):
+    """Убрать удаленный рецепт из поискового индекса."""
+    delete_from_search_index([instance.pk])
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(instance, **kwargs):
+    """Выход из системы удаляет токен: убрать его из кеша."""
+    token_cache.invalidate(instance.key)
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_user_cache(instance, **kwargs):
+    """
+    Сбросить кешированные токены и ответ /users/me/ пользователя
+    после смены пароля, деактивации или других изменений.
+    """
+    token_cache.invalidate_user(instance.pk)
+    cache.delete(get_users_me_cache_key(instance.pk))
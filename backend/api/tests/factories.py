@@ -0,0 +1,105 @@
+from itertools import count
+
+from django.core.cache import cache
+from django.db import connections
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import token_cache
+from api.indexes import ingredient_index, recipe_ingredient_index, tag_index
+from recipes.models import (Ingredient, Measurement, Recipe,
+                            RecipeIngredient, RecipeTag, Tag)
+from users.models import User
+
+_numbers = count()
+TEST_IMAGE = 'recipes/images/test.png'
+
+
+def create_user(**kwargs):
+    number = next(_numbers)
+    fields = {
+        'email': f'user{number}@foodgram.ru',
+        'username': f'user{number}',
+        'first_name': 'Имя',
+        'last_name': 'Фамилия',
+    }
+    fields.update(kwargs)
+    return User.objects.create_user(password='Pa$$w0rd!', **fields)
+
+
+def get_token_client(user):
+    """Клиент с заголовком Authorization, как у фронтенда."""
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def create_catalogue(tags=3, ingredients=20):
+    """Теги и ингредиенты с одной единицей измерения."""
+    measurement = Measurement.objects.create(name=f'г{next(_numbers)}')
+    tags = Tag.objects.bulk_create(
+        Tag(name=f'Тег {idx}', slug=f'tag{idx}', color=f'#0000{idx:02}')
+        for idx in range(tags)
+    )
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(name=f'Ингредиент {idx}', measurement_unit=measurement)
+        for idx in range(ingredients)
+    )
+    # bulk_create на SQLite не возвращает первичные ключи.
+    return (
+        list(Tag.objects.order_by('pk')),
+        list(Ingredient.objects.order_by('pk')),
+    )
+
+
+def create_recipes(author, number, tags, ingredients, per_recipe=2):
+    """
+    number рецептов автора: у каждого один тег и per_recipe
+    ингредиентов по кругу.
+    """
+    recipes = []
+    for _ in range(number):
+        idx = next(_numbers)
+        # Копии картинки считаются готовыми: иначе после коммита
+        # (captureOnCommitCallbacks) их начнет готовить пул потоков.
+        recipe = Recipe.objects.create(
+            author=author, name=f'Рецепт {idx}', text='Описание',
+            image=TEST_IMAGE, cooking_time=idx % 60 + 1,
+            image_derivatives={'source': TEST_IMAGE, 'images': {}}
+        )
+        RecipeTag.objects.create(recipe=recipe, tag=tags[idx % len(tags)])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=ingredients[(idx + shift) % len(ingredients)],
+                amount=shift + 1
+            )
+            for shift in range(per_recipe)
+        )
+        recipes.append(recipe)
+    return recipes
+
+
+class CleanCacheTestCase(TestCase):
+    """
+    Тест с пустыми кешами: общим кешем, кешем токенов и индексами
+    в памяти процесса. Иначе число запросов зависит от порядка тестов.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Транзакция класса не коммитится: отложенные действия
+        # setUpTestData (увеличение версий данных) не выполнятся
+        # и не должны подменять такие же действия тестов.
+        for alias in cls._databases_names():
+            connections[alias].run_on_commit.clear()
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        token_cache.clear()
+        for index in (ingredient_index, recipe_ingredient_index, tag_index):
+            index.invalidate()
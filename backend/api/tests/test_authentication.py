@@ -0,0 +1,124 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from api.authentication import TokenCache, token_cache
+from api.tests.factories import (CleanCacheTestCase, create_user,
+                                 get_token_client)
+
+ME = '/api/users/me/'
+
+
+def count_token_queries(queries):
+    return sum(
+        1 for query in queries if '"authtoken_token"' in query['sql']
+    )
+
+
+class CachedTokenAuthenticationTest(CleanCacheTestCase):
+    """
+    Кеш токенов: чтения на прогретом кеше не ходят в базу, выход,
+    удаление и деактивация пользователя сразу закрывают доступ.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_user()
+        self.client = get_token_client(self.user)
+        self.key = Token.objects.get(user=self.user).key
+
+    def get(self, path=ME):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        return response, count_token_queries(queries)
+
+    def test_warm_cache_skips_database(self):
+        response, queries = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, 1)
+        response, queries = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], self.user.pk)
+        self.assertEqual(queries, 0)
+
+    def test_deleted_token(self):
+        self.get()
+        Token.objects.filter(key=self.key).delete()
+        response, _ = self.get()
+        self.assertEqual(response.status_code, 401)
+
+    def test_logout(self):
+        self.get()
+        response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        response, _ = self.get()
+        self.assertEqual(response.status_code, 401)
+
+    def test_deactivated_user(self):
+        self.get()
+        self.user.is_active = False
+        self.user.save()
+        response, _ = self.get()
+        self.assertEqual(response.status_code, 401)
+
+    def test_deleted_user(self):
+        self.get()
+        self.user.delete()
+        response, _ = self.get()
+        self.assertEqual(response.status_code, 401)
+
+    def test_unsafe_methods_skip_cache(self):
+        self.get()
+        # Удаление в обход сигналов: запись остается в кеше.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM authtoken_token WHERE key = %s', [self.key]
+            )
+        response, _ = self.get()
+        self.assertEqual(response.status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(count_token_queries(queries), 1)
+
+    def test_user_is_copied(self):
+        self.get()
+        first, _ = token_cache.get(self.key)
+        first.first_name = 'Изменено'
+        second, _ = token_cache.get(self.key)
+        self.assertEqual(second.first_name, self.user.first_name)
+
+
+class TokenCacheTest(SimpleTestCase):
+
+    def test_ttl(self):
+        cache = TokenCache(size=10, ttl=60)
+        with mock.patch('api.authentication.time.monotonic') as monotonic:
+            monotonic.return_value = 1000
+            cache.set('key', mock.Mock(pk=1), 'token')
+            monotonic.return_value = 1059
+            self.assertIsNotNone(cache.get('key'))
+            monotonic.return_value = 1061
+            self.assertIsNone(cache.get('key'))
+            self.assertEqual(len(cache._entries), 0)
+
+    def test_size(self):
+        cache = TokenCache(size=2, ttl=60)
+        for key in ('first', 'second'):
+            cache.set(key, mock.Mock(pk=1), key)
+        cache.get('first')
+        cache.set('third', mock.Mock(pk=2), 'third')
+        self.assertIsNone(cache.get('second'))
+        self.assertIsNotNone(cache.get('first'))
+        self.assertIsNotNone(cache.get('third'))
+
+    def test_invalidate_user(self):
+        cache = TokenCache(size=10, ttl=60)
+        cache.set('first', mock.Mock(pk=1), 'first')
+        cache.set('second', mock.Mock(pk=1), 'second')
+        cache.set('other', mock.Mock(pk=2), 'other')
+        cache.invalidate_user(1)
+        self.assertEqual(list(cache._entries), ['other'])
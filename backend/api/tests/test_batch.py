@@ -0,0 +1,81 @@
+from django.test import TestCase
+
+from api.services import (ADDED, ALREADY_EXISTS, NOT_FOUND, NOT_PRESENT,
+                          REMOVED)
+from api.tests.factories import (create_catalogue, create_recipes,
+                                 create_user, get_token_client)
+from recipes.models import Recipe, ShoppingListItem
+
+
+class BatchCartTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        tags, ingredients = create_catalogue()
+        cls.recipes = create_recipes(create_user(), 10, tags, ingredients)
+        cls.ids = [recipe.pk for recipe in cls.recipes]
+
+    def setUp(self):
+        self.client = get_token_client(self.user)
+
+    def change(self, method, ids, path='/api/recipes/shopping_cart/'):
+        response = getattr(self.client, method)(
+            path, {'recipes': ids}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return {
+            result['id']: result['status']
+            for result in response.json()['recipes']
+        }
+
+    def get_amounts(self):
+        return dict(ShoppingListItem.objects.filter(
+            user=self.user
+        ).values_list('ingredient_id', 'amount'))
+
+    def test_add_twice(self):
+        missing = max(self.ids) + 1
+        self.assertEqual(
+            self.change('post', self.ids[:3] + [missing]),
+            {**dict.fromkeys(self.ids[:3], ADDED), missing: NOT_FOUND}
+        )
+        amounts = self.get_amounts()
+        self.assertEqual(
+            self.change('post', self.ids[:4]),
+            {**dict.fromkeys(self.ids[:3], ALREADY_EXISTS),
+             self.ids[3]: ADDED}
+        )
+        self.assertEqual(
+            dict(Recipe.objects.filter(pk__in=self.ids[:5]).values_list(
+                'pk', 'shopping_cart_count'
+            )),
+            {**dict.fromkeys(self.ids[:4], 1), self.ids[4]: 0}
+        )
+        added = self.recipes[3].recipe_ingredients.values_list(
+            'ingredient_id', 'amount'
+        )
+        for pk, amount in added:
+            amounts[pk] = amounts.get(pk, 0) + amount
+        self.assertEqual(self.get_amounts(), amounts)
+
+    def test_remove_and_clear(self):
+        self.change('post', self.ids)
+        self.assertEqual(
+            self.change('delete', self.ids[:2] + [max(self.ids) + 1]),
+            {**dict.fromkeys(self.ids[:2], REMOVED),
+             max(self.ids) + 1: NOT_PRESENT}
+        )
+        response = self.client.delete('/api/recipes/shopping_cart/clear/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['recipes']), 8)
+        self.assertEqual(self.get_amounts(), {})
+        self.assertFalse(
+            Recipe.objects.filter(shopping_cart_count__gt=0).exists()
+        )
+
+    def test_queries_do_not_grow(self):
+        with self.assertNumQueries(8):
+            self.change('post', self.ids[:2], '/api/recipes/favorite/')
+        with self.assertNumQueries(8):
+            self.change('post', self.ids[2:], '/api/recipes/favorite/')
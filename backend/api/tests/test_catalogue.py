@@ -0,0 +1,97 @@
+from django.conf import settings
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from api.tests.factories import CleanCacheTestCase, create_catalogue
+from recipes.models import DataVersion
+
+
+class CatalogueConditionTest(CleanCacheTestCase):
+    """Условный GET справочников по версии каталога."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags, cls.ingredients = create_catalogue()
+        DataVersion.bump(DataVersion.CATALOGUE)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def get_paths(self):
+        return (
+            '/api/tags/', f'/api/tags/{self.tags[0].pk}/',
+            '/api/ingredients/', '/api/ingredients/?name=Ингр',
+            f'/api/ingredients/{self.ingredients[0].pk}/',
+        )
+
+    def test_validators(self):
+        version = DataVersion.objects.get(name=DataVersion.CATALOGUE)
+        for path in self.get_paths():
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                basename = path.split('/')[2]
+                self.assertEqual(
+                    response['ETag'], f'"{basename}-{version.version}"'
+                )
+                self.assertEqual(
+                    response['Last-Modified'],
+                    http_date(int(version.updated_at.timestamp()))
+                )
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn(
+                    f'max-age={settings.CATALOGUE_MAX_AGE}',
+                    response['Cache-Control']
+                )
+
+    def test_not_modified(self):
+        for path in self.get_paths():
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                with self.assertNumQueries(1):
+                    # Только версия каталога, без чтения справочника.
+                    cached = self.client.get(
+                        path, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(cached.status_code, 304)
+                self.assertEqual(cached.content, b'')
+                self.assertEqual(cached['ETag'], response['ETag'])
+                cached = self.client.get(
+                    path, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+                self.assertEqual(cached.status_code, 304)
+
+    def test_stale_etag(self):
+        response = self.client.get(
+            '/api/tags/', HTTP_IF_NONE_MATCH='"tags-0"'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_tag_change(self):
+        etag = self.client.get('/api/tags/')['ETag']
+        tag = self.tags[0]
+        tag.name = 'Новое название'
+        tag.save()
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn(
+            'Новое название', [item['name'] for item in response.json()]
+        )
+
+    def test_ingredient_change(self):
+        path = f'/api/ingredients/{self.ingredients[0].pk}/'
+        etag = self.client.get(path)['ETag']
+        ingredient = self.ingredients[0]
+        ingredient.name = 'Новый ингредиент'
+        ingredient.save()
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['name'], 'Новый ингредиент')
+        # Поиск читает обновленный индекс ингредиентов.
+        response = self.client.get('/api/ingredients/', {'name': 'Новый'})
+        self.assertEqual(
+            [item['name'] for item in response.json()], ['Новый ингредиент']
+        )
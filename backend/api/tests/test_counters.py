@@ -0,0 +1,148 @@
+import shutil
+import tempfile
+from base64 import b64encode
+from io import BytesIO, StringIO
+
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from api.tests.factories import (create_catalogue, create_recipes,
+                                 create_user, get_token_client)
+from recipes.models import Favorite, Recipe
+from users.models import User
+
+
+def get_image_data():
+    buffer = BytesIO()
+    Image.new('RGB', (2, 2), 'white').save(buffer, 'PNG')
+    return 'data:image/png;base64,' + b64encode(buffer.getvalue()).decode()
+
+
+class CountersTest(TestCase):
+    """Полное сохранение записи не затирает счетчики."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user()
+        cls.tags, cls.ingredients = create_catalogue()
+        cls.recipe, = create_recipes(
+            cls.author, 1, cls.tags, cls.ingredients
+        )
+
+    def test_recipe_save(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        Recipe.objects.filter(pk=recipe.pk).update(
+            favorites_count=F('favorites_count') + 3,
+            shopping_cart_count=F('shopping_cart_count') + 2
+        )
+        recipe.name = 'Новое название'
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Новое название')
+        self.assertEqual(
+            (recipe.favorites_count, recipe.shopping_cart_count), (3, 2)
+        )
+
+    def test_user_save(self):
+        user = User.objects.get(pk=self.author.pk)
+        User.objects.filter(pk=user.pk).update(followers_count=4)
+        user.first_name = 'Другое'
+        user.save()
+        user.refresh_from_db()
+        self.assertEqual(user.followers_count, 4)
+
+    def test_counters_follow_actions(self):
+        user = create_user()
+        client = get_token_client(user)
+        client.post(f'/api/recipes/{self.recipe.pk}/favorite/')
+        client.post(f'/api/recipes/{self.recipe.pk}/shopping_cart/')
+        client.post(f'/api/users/{self.author.pk}/subscribe/')
+        response = get_token_client(self.author).patch(
+            f'/api/recipes/{self.recipe.pk}/', {'name': 'Правка'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.recipe.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(
+            (self.recipe.favorites_count, self.recipe.shopping_cart_count),
+            (1, 1)
+        )
+        self.assertEqual(self.author.followers_count, 1)
+        client.delete(f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
+
+
+class RecipesCountTest(TestCase):
+    """Счетчик рецептов автора не зависит от способа создания рецепта."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user()
+        cls.tags, cls.ingredients = create_catalogue()
+
+    def get_recipes_count(self):
+        self.author.refresh_from_db()
+        return self.author.recipes_count
+
+    def test_orm_create_and_delete(self):
+        recipes = create_recipes(self.author, 2, self.tags, self.ingredients)
+        self.assertEqual(self.get_recipes_count(), 2)
+        recipes[0].delete()
+        self.assertEqual(self.get_recipes_count(), 1)
+
+    def test_api_create_counts_once(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media_root):
+            response = get_token_client(self.author).post(
+                '/api/recipes/', {
+                    'name': 'Рецепт', 'text': 'Описание',
+                    'cooking_time': 5, 'image': get_image_data(),
+                    'tags': [self.tags[0].pk],
+                    'ingredients': [
+                        {'id': self.ingredients[0].pk, 'amount': 10}
+                    ],
+                }, format='json'
+            )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.get_recipes_count(), 1)
+
+
+class ReconcileCountersTest(TestCase):
+    """Команда reconcile_counters исправляет только расхождения."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user()
+        cls.tags, cls.ingredients = create_catalogue()
+        cls.recipes = create_recipes(
+            cls.author, 3, cls.tags, cls.ingredients
+        )
+        Favorite.objects.create(user=create_user(), recipe=cls.recipes[0])
+        Recipe.objects.filter(pk=cls.recipes[0].pk).update(favorites_count=1)
+
+    def reconcile(self, *args):
+        call_command('reconcile_counters', *args, stdout=StringIO())
+
+    def get_counters(self):
+        self.author.refresh_from_db()
+        return self.author.recipes_count, dict(
+            Recipe.objects.values_list('pk', 'favorites_count')
+        )
+
+    def test_fixes_drift(self):
+        expected = self.get_counters()
+        User.objects.filter(pk=self.author.pk).update(recipes_count=10)
+        Recipe.objects.filter(pk=self.recipes[1].pk).update(
+            favorites_count=5
+        )
+        self.reconcile('--dry-run')
+        self.assertEqual(self.get_counters()[0], 10)
+        self.reconcile('--batch-size', '2')
+        self.assertEqual(self.get_counters(), expected)
+        self.assertEqual(expected[0], 3)
+        self.assertEqual(expected[1][self.recipes[0].pk], 1)
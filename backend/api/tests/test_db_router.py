@@ -0,0 +1,91 @@
+from django.core.cache import cache
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.db_router import ReplicaRouter, read_from_replica
+from api.indexes import tag_index
+from api.tests.factories import (create_catalogue, create_recipes,
+                                 create_user, get_token_client)
+from recipes.models import Recipe
+
+
+@override_settings(REPLICA_DATABASES=['replica0'], REPLICA_PIN_SECONDS=60)
+class ReplicaRoutingTest(TestCase):
+    """
+    Две базы SQLite: данные создаются только в основной, реплика
+    пуста. Поэтому по ответу видно, с какой базы он прочитан.
+    """
+
+    databases = {'default', 'replica0'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        tags, ingredients = create_catalogue()
+        cls.recipe, = create_recipes(cls.user, 1, tags, ingredients)
+
+    def setUp(self):
+        cache.clear()
+        tag_index.invalidate()
+        self.client = get_token_client(self.user)
+
+    def get_count(self, client, path='/api/recipes/'):
+        response = client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['count']
+
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Recipe), 'default')
+        with read_from_replica() as alias:
+            self.assertEqual(alias, 'replica0')
+            self.assertEqual(router.db_for_read(Recipe), 'replica0')
+            self.assertEqual(router.db_for_read(Token), 'default')
+            self.assertEqual(router.db_for_write(Recipe), 'default')
+            # После записи запрос читает свои изменения с основной базы.
+            self.assertEqual(router.db_for_read(Recipe), 'default')
+        self.assertEqual(router.db_for_read(Recipe), 'default')
+
+    def test_safe_requests_read_from_replica(self):
+        with CaptureQueriesContext(connections['replica0']) as replica:
+            self.assertEqual(self.get_count(APIClient()), 0)
+            self.assertEqual(self.get_count(self.client), 0)
+        self.assertTrue(replica.captured_queries)
+
+    def test_token_is_read_from_primary(self):
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], self.user.pk)
+
+    def test_write_pins_client_to_primary(self):
+        response = self.client.post(
+            f'/api/recipes/{self.recipe.pk}/favorite/'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('db_pin', response.cookies)
+        path = '/api/recipes/?is_favorited=1'
+        self.assertEqual(self.get_count(self.client, path), 1)
+        # Клиент с токеном закреплен и без cookie.
+        self.client.cookies.clear()
+        with CaptureQueriesContext(connections['replica0']) as replica:
+            self.assertEqual(self.get_count(self.client, path), 1)
+        self.assertFalse(replica.captured_queries)
+        # Другие клиенты по-прежнему читают с реплики.
+        self.assertEqual(self.get_count(APIClient()), 0)
+
+    def test_pin_expires(self):
+        self.client.post(f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.client.cookies.clear()
+        cache.clear()
+        self.assertEqual(
+            self.get_count(self.client, '/api/recipes/?is_favorited=1'), 0
+        )
+
+    def test_without_replicas(self):
+        with override_settings(REPLICA_DATABASES=[]):
+            with CaptureQueriesContext(connections['replica0']) as replica:
+                self.assertEqual(self.get_count(APIClient()), 1)
+        self.assertFalse(replica.captured_queries)
@@ -0,0 +1,113 @@
+import csv
+import json
+import tracemalloc
+
+from rest_framework.test import APIClient
+
+from api.tests.factories import CleanCacheTestCase, create_user
+from recipes.models import (Ingredient, Measurement, Recipe, ShoppingCart,
+                            ShoppingListItem)
+
+RECIPES = 3000
+INGREDIENTS = 20000
+
+
+class DownloadShoppingCartTest(CleanCacheTestCase):
+    """Список покупок большой корзины отдается потоком."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        measurement = Measurement.objects.create(name='г')
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {idx:05}',
+                       measurement_unit=measurement)
+            for idx in range(INGREDIENTS)
+        )
+        Recipe.objects.bulk_create(
+            Recipe(author=cls.user, name=f'Рецепт {idx}', text='Описание',
+                   image='recipes/images/test.png')
+            for idx in range(RECIPES)
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=cls.user, recipe=recipe)
+            for recipe in Recipe.objects.all()
+        )
+        ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(user=cls.user, ingredient_id=pk, amount=pk)
+            for pk in Ingredient.objects.values_list('pk', flat=True)
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, file_format):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', {'format': file_format}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response['Content-Disposition'],
+            f'attachment; filename="shopping_list.{file_format}"'
+        )
+        return response
+
+    def get_peak(self, limit=None):
+        """
+        Пик памяти при чтении ответа по частям и размер ответа.
+        limit оставляет в списке только первые позиции.
+        """
+        if limit is not None:
+            ShoppingListItem.objects.filter(
+                ingredient__name__gte=f'Ингредиент {limit:05}'
+            ).delete()
+        tracemalloc.start()
+        try:
+            size = 0
+            for chunk in self.download('txt').streaming_content:
+                size += len(chunk)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak, size
+
+    def test_memory_is_bounded(self):
+        peak, size = self.get_peak()
+        half_peak, half_size = self.get_peak(limit=INGREDIENTS // 2)
+        self.assertGreater(size, half_size * 1.9)
+        # Вдвое больший список не требует заметно больше памяти,
+        # и ответ целиком в памяти не собирается.
+        self.assertLess(peak, half_peak * 1.3)
+        self.assertLess(peak, size / 2)
+
+    def test_formats(self):
+        response = self.download('txt')
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'Список покупок:')
+        self.assertEqual(lines[2], 'Ингредиент 00000 (г) - 1')
+
+        response = self.download('csv')
+        rows = list(csv.reader(
+            b''.join(response.streaming_content).decode().splitlines()
+        ))
+        self.assertEqual(len(rows), INGREDIENTS + 1)
+
+        response = self.download('json')
+        items = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(items), INGREDIENTS)
+        self.assertEqual(items[0], {
+            'name': 'Ингредиент 00000', 'measurement_unit': 'г', 'amount': 1
+        })
+
+        response = self.download('markdown')
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('- [ ] Ингредиент 19999 (г)', content)
+
+    def test_empty_cart(self):
+        ShoppingCart.objects.all().delete()
+        response = self.client.get('/api/recipes/download_shopping_cart/')
+        self.assertEqual(response.status_code, 400)
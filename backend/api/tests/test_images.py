@@ -0,0 +1,23 @@
+from django.test import override_settings
+
+from api.tests.factories import CleanCacheTestCase, create_user
+from recipes.models import Recipe
+
+
+@override_settings(RECIPE_IMAGE_WORKERS=0)
+class InlineDerivativesTest(CleanCacheTestCase):
+    """
+    Без пула потоков копии картинки готовятся сразу после коммита:
+    ошибка картинки пишется в лог и не доходит до вызывающего кода.
+    """
+
+    def test_missing_image_is_logged(self):
+        with self.assertLogs('api.images', 'ERROR') as logs:
+            with self.captureOnCommitCallbacks(execute=True):
+                recipe = Recipe.objects.create(
+                    author=create_user(), name='Рецепт', text='Описание',
+                    image='recipes/images/missing.png', cooking_time=5
+                )
+        self.assertIn(str(recipe.pk), logs.output[0])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_derivatives, {})
@@ -0,0 +1,39 @@
+from django.test import TestCase
+
+from api.indexes import tag_index
+from api.tests.factories import create_catalogue, create_recipes, create_user
+
+
+class TagIndexTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags, ingredients = create_catalogue()
+        cls.recipes = create_recipes(
+            create_user(), 6, cls.tags, ingredients
+        )
+
+    def setUp(self):
+        tag_index.invalidate()
+
+    def test_choices_then_filter(self):
+        # Форма фильтров браузерного API строит индекс без версии.
+        response = self.client.get('/api/recipes/', HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, 200)
+        slug = self.tags[0].slug
+        response = self.client.get('/api/recipes/', {'tags': slug})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {recipe['id'] for recipe in response.json()['results']},
+            {
+                recipe.pk for recipe in self.recipes
+                if recipe.tags.filter(slug=slug).exists()
+            }
+        )
+
+    def test_unversioned_build_is_stale(self):
+        tag_index.get_choices()
+        self.assertTrue(tag_index.is_stale(tag_index._data, (1, 1)))
+        tag_index.get_data((1, 1))
+        self.assertFalse(tag_index.is_stale(tag_index._data, None))
+        self.assertFalse(tag_index.is_stale(tag_index._data, (0, 1)))
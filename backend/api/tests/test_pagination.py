@@ -0,0 +1,62 @@
+from django.conf import settings
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.pagination import RecipePagination
+from api.tests.factories import (CleanCacheTestCase, create_catalogue,
+                                 create_recipes, create_user)
+from recipes.models import Recipe
+
+
+class RecipePaginationTest(CleanCacheTestCase):
+    """Кеш числа рецептов и предел размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags, cls.ingredients = create_catalogue()
+        cls.author = create_user()
+        create_recipes(cls.author, 3, cls.tags, cls.ingredients)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def get_count(self):
+        """
+        Число рецептов от RecipePagination.get_count: ответ API
+        целиком кешируется recipes_cache и не доходит до пагинации.
+        """
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        return RecipePagination().get_count(Recipe.objects.all(), request)
+
+    def test_count_changes_with_recipes(self):
+        self.assertEqual(self.get_count(), 3)
+        # Версия рецептов увеличивается после коммита.
+        with self.captureOnCommitCallbacks(execute=True):
+            recipes = create_recipes(
+                self.author, 2, self.tags, self.ingredients
+            )
+        self.assertEqual(self.get_count(), 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipes[0].delete()
+        self.assertEqual(self.get_count(), 4)
+
+    def test_count_is_cached(self):
+        with self.assertNumQueries(2):
+            # Версии данных и COUNT(*).
+            self.assertEqual(self.get_count(), 3)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_count(), 3)
+
+    def test_page_size_is_capped(self):
+        create_recipes(
+            self.author, settings.MAX_PAGE_SIZE, self.tags, self.ingredients
+        )
+        for params in ({'limit': 1000000},
+                       {'limit': 1000000, 'cursor': ''}):
+            with self.subTest(params=params):
+                response = self.client.get('/api/recipes/', params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    len(response.json()['results']), settings.MAX_PAGE_SIZE
+                )
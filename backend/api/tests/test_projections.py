@@ -0,0 +1,152 @@
+import datetime
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.projections import RECIPE_FIELDS
+from api.renderers import FastJSONRenderer
+from api.serializers import RecipeGetSerializer
+from api.tests.factories import (CleanCacheTestCase, create_catalogue,
+                                 create_recipes, create_user)
+from api.views import RecipeViewSet
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscrption
+
+
+class RecipeProjectionTest(CleanCacheTestCase):
+    """
+    Ответы быстрого пути чтения рецептов (api.projections
+    и FastJSONRenderer) совпадают с сериализаторами байт в байт.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        tags, ingredients = create_catalogue()
+        authors = [create_user(), create_user(first_name='Анна "Ю"')]
+        cls.recipes = []
+        for author in authors:
+            cls.recipes += create_recipes(
+                author, 4, tags, ingredients, per_recipe=3
+            )
+        Subscrption.objects.create(user=cls.user, following=authors[0])
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[1])
+        Recipe.objects.filter(pk=cls.recipes[2].pk).update(
+            text='Строка\u2028разделитель </script> «кавычки»',
+            image_derivatives={
+                'source': 'recipes/images/test.png',
+                'images': {'300': {
+                    'webp': 'derivatives/test_300.webp',
+                    'jpeg': 'derivatives/test_300.jpeg',
+                }},
+            }
+        )
+        # Копии устаревшей картинки в ответ не попадают.
+        Recipe.objects.filter(pk=cls.recipes[3].pk).update(
+            image_derivatives={'source': 'recipes/images/old.png',
+                               'images': {}}
+        )
+
+    def get_client(self, user):
+        client = APIClient()
+        if user.is_authenticated:
+            client.force_authenticate(user)
+        return client
+
+    def serialize(self, user, recipes):
+        """Рецепты через RecipeGetSerializer, как до быстрого пути."""
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        queryset = RecipeViewSet(
+            request=request, format_kwarg=None
+        ).get_queryset()
+        if not isinstance(recipes, list):
+            return RecipeGetSerializer(
+                queryset.get(pk=recipes), context={'request': request}
+            ).data
+        return RecipeGetSerializer(
+            queryset.filter(pk__in=recipes), many=True,
+            context={'request': request}
+        ).data
+
+    def test_list(self):
+        for user in (self.user, AnonymousUser()):
+            with self.subTest(user=str(user)):
+                response = self.get_client(user).get(
+                    '/api/recipes/', {'limit': 50}
+                )
+                body = response.json()
+                self.assertEqual(
+                    [recipe['id'] for recipe in body['results']],
+                    list(Recipe.objects.values_list('pk', flat=True))
+                )
+                body['results'] = self.serialize(
+                    user, [recipe['id'] for recipe in body['results']]
+                )
+                self.assertEqual(
+                    response.content, JSONRenderer().render(body)
+                )
+
+    def test_detail(self):
+        for recipe in self.recipes[:4]:
+            for user in (self.user, AnonymousUser()):
+                with self.subTest(recipe=recipe.pk, user=str(user)):
+                    response = self.get_client(user).get(
+                        f'/api/recipes/{recipe.pk}/'
+                    )
+                    self.assertEqual(
+                        response.content,
+                        JSONRenderer().render(
+                            self.serialize(user, recipe.pk)
+                        )
+                    )
+
+    def test_fields(self):
+        recipe = self.recipes[2]
+        expected = self.serialize(self.user, recipe.pk)
+        client = self.get_client(self.user)
+        for params, fields in (
+            ({'fields': 'image,name'}, ('id', 'name', 'image')),
+            ({'fields': 'tags', 'omit': 'tags'}, ('id',)),
+            ({'omit': 'ingredients,author'}, tuple(
+                name for name in RECIPE_FIELDS
+                if name not in ('ingredients', 'author')
+            )),
+        ):
+            with self.subTest(params=params):
+                response = client.get(f'/api/recipes/{recipe.pk}/', params)
+                self.assertEqual(
+                    response.content,
+                    JSONRenderer().render(
+                        {name: expected[name] for name in fields}
+                    )
+                )
+        response = client.get('/api/recipes/', {'fields': 'calories'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_renderer(self):
+        data = {
+            'text': 'Строка\u2028и\u2029 "кавычки" \\',
+            'date': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456),
+            'day': datetime.date(2024, 5, 1),
+            'amount': Decimal('1.50'),
+            'numbers': (1, 2.5, None, True),
+            1: 'ключ-число',
+        }
+        self.assertEqual(
+            FastJSONRenderer().render(data), JSONRenderer().render(data)
+        )
+
+    def test_check_command(self):
+        stdout = StringIO()
+        call_command(
+            'check_recipe_projection', '--user', self.user.email,
+            stdout=stdout
+        )
+        self.assertIn('Ответы совпадают!', stdout.getvalue())
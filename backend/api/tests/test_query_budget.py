@@ -0,0 +1,53 @@
+from rest_framework.test import APIClient
+
+from api.query_budget import (QueryBudgetExceeded, QueryBudgetTestMixin,
+                              Route, get_user)
+from api.tests.factories import (CleanCacheTestCase, create_catalogue,
+                                 create_recipes, create_user)
+from recipes.models import Recipe, ShoppingCart
+from users.models import Subscrption
+
+
+class QueryBudgetTest(QueryBudgetTestMixin, CleanCacheTestCase):
+    """Бюджеты маршрутов соблюдаются и после роста данных."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags, cls.ingredients = create_catalogue()
+        cls.user = create_user()
+
+    def grow(self, authors):
+        for _ in range(authors):
+            author = create_user()
+            create_recipes(author, 3, self.tags, self.ingredients)
+            Subscrption.objects.create(user=self.user, following=author)
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=self.user, recipe=recipe)
+            for recipe in Recipe.objects.exclude(
+                in_shopping_cart__user=self.user
+            )
+        )
+
+    def test_budgets(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.grow(2)
+        self.assertQueryBudgets(client)
+        self.grow(10)
+        self.assertQueryBudgets(client)
+
+    def test_exceeded(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.assertRaises(QueryBudgetExceeded):
+            self.assertQueryBudgets(client, [Route('tags-list', {}, 0, False)])
+
+    def test_get_user(self):
+        busy = create_user()
+        for author in (create_user(), create_user()):
+            Subscrption.objects.create(user=busy, following=author)
+        # Последняя подписка - у другого пользователя.
+        Subscrption.objects.create(user=self.user, following=busy)
+        self.assertEqual(get_user(), busy)
+        self.assertEqual(get_user(self.user.email), self.user)
+        self.assertIsNone(get_user('missing@foodgram.ru'))
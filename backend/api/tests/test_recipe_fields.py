@@ -0,0 +1,107 @@
+from django.core.cache import cache
+from django.db import connection
+from django.http import QueryDict
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from api.projections import RECIPE_FIELDS, get_recipe_fields
+from api.tests.factories import (CleanCacheTestCase, create_catalogue,
+                                 create_recipes, create_user)
+from users.models import Subscrption
+
+
+class GetRecipeFieldsTest(SimpleTestCase):
+
+    def get_fields(self, query):
+        return get_recipe_fields(QueryDict(query))
+
+    def test_fields_and_omit(self):
+        self.assertEqual(self.get_fields(''), frozenset(RECIPE_FIELDS))
+        self.assertEqual(
+            self.get_fields('fields=name, image&fields=tags'),
+            {'id', 'name', 'image', 'tags'}
+        )
+        self.assertEqual(
+            self.get_fields('omit=text,ingredients'),
+            set(RECIPE_FIELDS) - {'text', 'ingredients'}
+        )
+        # Поле id выводится всегда.
+        self.assertEqual(self.get_fields('fields=name&omit=id'),
+                         {'id', 'name'})
+
+    def test_unknown_fields(self):
+        for query in ('fields=name,calories', 'omit=calories,author'):
+            with self.subTest(query=query):
+                with self.assertRaises(ValidationError) as context:
+                    self.get_fields(query)
+                self.assertIn('calories', str(context.exception.detail))
+
+
+class RecipeFieldsTest(CleanCacheTestCase):
+    """Параметры fields и omit в ответах и числе запросов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = create_catalogue()
+        cls.user = create_user()
+        author = create_user()
+        cls.recipes = create_recipes(author, 4, tags, ingredients)
+        Subscrption.objects.create(user=cls.user, following=author)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_paths(self):
+        return (
+            '/api/recipes/', f'/api/recipes/{self.recipes[0].pk}/',
+            '/api/recipes/feed/',
+        )
+
+    def get_recipes(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        return body['results'] if 'results' in body else [body]
+
+    def test_unknown_fields(self):
+        for path in self.get_paths():
+            for params in ({'fields': 'calories'}, {'omit': 'calories'}):
+                with self.subTest(path=path, params=params):
+                    response = self.client.get(path, params)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('calories', response.json()['fields'])
+
+    def test_output_keys(self):
+        for path in self.get_paths():
+            for params, keys in (
+                ({'fields': 'name,cooking_time'},
+                 {'id', 'name', 'cooking_time'}),
+                ({'omit': 'author,tags,ingredients'},
+                 set(RECIPE_FIELDS) - {'author', 'tags', 'ingredients'}),
+            ):
+                with self.subTest(path=path, params=params):
+                    recipes = self.get_recipes(self.client.get(path, params))
+                    self.assertTrue(recipes)
+                    for recipe in recipes:
+                        self.assertEqual(set(recipe), keys)
+
+    def capture(self, path, params):
+        # Ответ не должен прийти из общего кеша рецептов.
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.get_recipes(self.client.get(path, params))
+        return [query['sql'] for query in queries]
+
+    def test_fewer_queries(self):
+        for path in self.get_paths():
+            with self.subTest(path=path):
+                full = self.capture(path, {})
+                short = self.capture(path, {'fields': 'name'})
+                # Без тегов, ингредиентов и подписок на авторов.
+                self.assertEqual(len(short), len(full) - 3)
+                column = '"recipes_recipe"."text"'
+                self.assertTrue(any(column in sql for sql in full))
+                self.assertFalse(any(column in sql for sql in short))
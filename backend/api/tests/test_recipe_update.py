@@ -0,0 +1,106 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.tests.factories import (CleanCacheTestCase, create_catalogue,
+                                 create_recipes, create_user)
+from recipes.models import RecipeIngredient
+
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class RecipeUpdateTest(CleanCacheTestCase):
+    """Правка рецепта пишет только изменившиеся связи."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user()
+        cls.tags, cls.ingredients = create_catalogue(ingredients=60)
+        cls.small, = create_recipes(
+            cls.author, 1, cls.tags, cls.ingredients, per_recipe=10
+        )
+        cls.large, = create_recipes(
+            cls.author, 1, cls.tags, cls.ingredients, per_recipe=50
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def get_amounts(self, recipe):
+        return dict(RecipeIngredient.objects.filter(
+            recipe=recipe
+        ).values_list('ingredient_id', 'amount'))
+
+    def patch(self, recipe, data, status=200):
+        """Отправить правку; вернуть число запросов и запросы на запись."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f'/api/recipes/{recipe.pk}/', data, format='json'
+            )
+        self.assertEqual(response.status_code, status, response.content)
+        writes = [
+            query['sql'] for query in queries
+            if query['sql'].startswith(WRITES)
+            and ('"recipes_recipeingredient"' in query['sql']
+                 or '"recipes_recipetag"' in query['sql'])
+        ]
+        return len(queries), writes
+
+    def ingredients_payload(self, amounts):
+        return [
+            {'id': pk, 'amount': amount} for pk, amount in amounts.items()
+        ]
+
+    def test_name_only(self):
+        amounts = self.get_amounts(self.large)
+        tags = set(self.large.tags.values_list('pk', flat=True))
+        _, writes = self.patch(self.large, {'name': 'Только название'})
+        self.assertEqual(writes, [])
+        self.assertEqual(self.get_amounts(self.large), amounts)
+        self.assertEqual(
+            set(self.large.tags.values_list('pk', flat=True)), tags
+        )
+
+    def test_small_edits_write_one_row(self):
+        amounts = self.get_amounts(self.large)
+        changed, removed = list(amounts)[:2]
+        amounts[changed] += 10
+        del amounts[removed]
+        added = next(
+            ingredient.pk for ingredient in self.ingredients
+            if ingredient.pk not in amounts
+        )
+        amounts[added] = 3
+        _, writes = self.patch(
+            self.large, {'ingredients': self.ingredients_payload(amounts)}
+        )
+        self.assertEqual(self.get_amounts(self.large), amounts)
+        self.assertEqual(len(writes), 3, writes)
+        update, = [sql for sql in writes if sql.startswith('UPDATE')]
+        self.assertEqual(update.count('WHEN'), 1)
+        insert, = [sql for sql in writes if sql.startswith('INSERT')]
+        self.assertEqual(insert.count('SELECT'), 1)
+        self.assertTrue(any(sql.startswith('DELETE') for sql in writes))
+
+    def test_queries_do_not_grow(self):
+        counts = []
+        for recipe in (self.small, self.large):
+            amounts = self.get_amounts(recipe)
+            first = next(iter(amounts))
+            amounts[first] += 1
+            queries, writes = self.patch(recipe, {
+                'ingredients': self.ingredients_payload(amounts),
+                'tags': list(recipe.tags.values_list('pk', flat=True)),
+            })
+            counts.append(queries)
+            self.assertEqual(self.get_amounts(recipe), amounts)
+        self.assertEqual(counts[0], counts[1])
+
+    def test_unknown_ingredient(self):
+        amounts = self.get_amounts(self.small)
+        payload = self.ingredients_payload(amounts)
+        payload.append({'id': max(amounts) + 1000, 'amount': 1})
+        self.patch(self.small, {'ingredients': payload}, status=400)
+        self.assertEqual(self.get_amounts(self.small), amounts)
@@ -0,0 +1,178 @@
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.tests.factories import (CleanCacheTestCase, create_catalogue,
+                                 create_recipes, create_user)
+from recipes.models import DataVersion, Favorite, ShoppingCart
+from users.models import Subscrption
+
+
+def get_versions():
+    return dict(DataVersion.objects.values_list('name', 'version'))
+
+
+def count_version_writes(queries):
+    """Число увеличений версий: каждое начинается с UPDATE."""
+    return sum(
+        1 for query in queries
+        if query['sql'].startswith('UPDATE "recipes_dataversion"')
+    )
+
+
+class DataVersionBumpTest(CleanCacheTestCase):
+    """Версии данных увеличиваются один раз на транзакцию."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags, cls.ingredients = create_catalogue()
+        cls.author = create_user()
+
+    def test_recipe_delete_bumps_each_version_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe, = create_recipes(
+                self.author, 1, self.tags, self.ingredients, per_recipe=5
+            )
+        before = get_versions()
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                recipe.delete()
+        self.assertEqual(count_version_writes(queries), 3)
+        after = get_versions()
+        for name in (DataVersion.RECIPES, DataVersion.RECIPE_TAGS,
+                     DataVersion.RECIPE_INGREDIENTS):
+            self.assertEqual(after[name], before.get(name, 0) + 1, name)
+
+    def test_bump_waits_for_commit(self):
+        before = get_versions()
+        with self.captureOnCommitCallbacks() as callbacks:
+            DataVersion.bump_on_commit(DataVersion.RECIPES)
+            self.assertEqual(get_versions(), before)
+        self.assertEqual(len(callbacks), 1)
+
+    def test_rolled_back_bump_is_not_lost(self):
+        before = get_versions().get(DataVersion.RECIPES, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    DataVersion.bump_on_commit(DataVersion.RECIPES)
+                    raise ValueError
+            except ValueError:
+                pass
+            DataVersion.bump_on_commit(DataVersion.RECIPES)
+        self.assertEqual(get_versions()[DataVersion.RECIPES], before + 1)
+
+    def test_signup_keeps_recipes_cache(self):
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                create_user()
+        self.assertEqual(count_version_writes(queries), 0)
+
+    def test_author_change_bumps_recipes_version(self):
+        before = get_versions().get(DataVersion.RECIPES, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.first_name = 'Новое имя'
+            self.author.save(update_fields=['first_name'])
+        self.assertEqual(get_versions()[DataVersion.RECIPES], before + 1)
+
+
+class RecipesCacheTest(CleanCacheTestCase):
+    """
+    Общий кеш ответов с рецептами: ключ, флаги текущего пользователя
+    поверх общего ответа и сброс по версии рецептов.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags, cls.ingredients = create_catalogue()
+        cls.author = create_user()
+        cls.user = create_user()
+        cls.recipes = create_recipes(
+            cls.author, 3, cls.tags, cls.ingredients
+        )
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[1])
+        Subscrption.objects.create(user=cls.user, following=cls.author)
+
+    def setUp(self):
+        super().setUp()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_flags(self, response):
+        self.assertEqual(response.status_code, 200)
+        return {
+            recipe['id']: (
+                recipe['is_favorited'], recipe['is_in_shopping_cart'],
+                recipe['author']['is_subscribed'],
+            )
+            for recipe in response.json()['results']
+        }
+
+    def test_flags_overlay_shared_response(self):
+        first, second, third = (recipe.pk for recipe in self.recipes)
+        self.anonymous.get('/api/recipes/')
+        with self.assertNumQueries(2):
+            # Версии данных и флаги пользователя.
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(self.get_flags(response), {
+            first: (True, False, True),
+            second: (False, True, True),
+            third: (False, False, True),
+        })
+        # Флаги пользователя не попадают в общий кеш.
+        other = APIClient()
+        other.force_authenticate(create_user())
+        for client in (self.anonymous, other):
+            response = client.get('/api/recipes/')
+            self.assertEqual(
+                set(self.get_flags(response).values()),
+                {(False, False, False)}
+            )
+
+    def test_key_ignores_parameter_order(self):
+        self.anonymous.get('/api/recipes/?limit=2&page=2')
+        with self.assertNumQueries(1):
+            response = self.anonymous.get('/api/recipes/?page=2&limit=2')
+        self.assertEqual(len(response.json()['results']), 1)
+
+    def test_omitted_flags_stay_omitted(self):
+        self.anonymous.get('/api/recipes/', {'fields': 'id,name'})
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/recipes/', {'fields': 'id,name'})
+        for recipe in response.json()['results']:
+            self.assertEqual(set(recipe), {'id', 'name'})
+
+    def test_personal_filters_are_not_cached(self):
+        for _ in range(2):
+            response = self.client.get('/api/recipes/', {'is_favorited': 1})
+            self.assertEqual(
+                [recipe['id'] for recipe in response.json()['results']],
+                [self.recipes[0].pk]
+            )
+        other = APIClient()
+        other.force_authenticate(create_user())
+        response = other.get('/api/recipes/', {'is_favorited': 1})
+        self.assertEqual(response.json()['results'], [])
+
+    def test_recipe_change_resets_cache(self):
+        recipe = self.recipes[0]
+        path = f'/api/recipes/{recipe.pk}/'
+        self.assertEqual(self.anonymous.get(path).json()['name'], recipe.name)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.name = 'Новое название'
+            recipe.save()
+        self.assertEqual(
+            self.anonymous.get(path).json()['name'], 'Новое название'
+        )
+
+    def test_author_change_resets_cache(self):
+        path = f'/api/recipes/{self.recipes[0].pk}/'
+        self.anonymous.get(path)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.username = 'renamed'
+            self.author.save(update_fields=['username'])
+        self.assertEqual(
+            self.anonymous.get(path).json()['author']['username'], 'renamed'
+        )
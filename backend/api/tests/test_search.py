@@ -0,0 +1,28 @@
+from django.test import TestCase
+
+from api.search import update_search_index
+from api.tests.factories import create_catalogue, create_recipes, create_user
+from recipes.models import Recipe
+
+
+class RecipeSearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tags, ingredients = create_catalogue()
+        cls.recipes = create_recipes(create_user(), 5, tags, ingredients)
+        Recipe.objects.filter(pk=cls.recipes[2].pk).update(name='Борщ')
+        update_search_index(recipe.pk for recipe in cls.recipes)
+
+    def search(self, value):
+        response = self.client.get('/api/recipes/', {'search': value})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_search(self):
+        self.assertEqual(self.search('борщ'), [self.recipes[2].pk])
+        self.assertEqual(self.search('бор'), [self.recipes[2].pk])
+        self.assertEqual(self.search('компот'), [])
+
+    def test_query_without_words(self):
+        self.assertEqual(self.search('!!!'), [])
@@ -0,0 +1,101 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+
+from api.authentication import token_cache
+from api.tests.factories import (CleanCacheTestCase, create_catalogue,
+                                 create_recipes, create_user,
+                                 get_token_client)
+from recipes.models import Ingredient, RecipeIngredient, ShoppingListItem
+
+
+class ShoppingListAggregateTest(CleanCacheTestCase):
+    """Позиции списка покупок совпадают с суммой по корзине."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user()
+        cls.buyers = [create_user(), create_user()]
+        tags, cls.ingredients = create_catalogue()
+        cls.recipes = create_recipes(
+            cls.author, 4, tags, cls.ingredients, per_recipe=3
+        )
+
+    def get_expected(self, user):
+        expected = {}
+        for item in RecipeIngredient.objects.filter(
+            recipe__in_shopping_cart__user=user
+        ):
+            expected[item.ingredient_id] = (
+                expected.get(item.ingredient_id, 0) + item.amount
+            )
+        return expected
+
+    def get_actual(self, user):
+        return dict(ShoppingListItem.objects.filter(
+            user=user
+        ).values_list('ingredient_id', 'amount'))
+
+    def assert_consistent(self):
+        for user in self.buyers:
+            self.assertEqual(self.get_actual(user), self.get_expected(user))
+        stdout = StringIO()
+        call_command('reconcile_shopping_lists', '--dry-run', stdout=stdout)
+        self.assertIn('Расхождений нет', stdout.getvalue())
+
+    def test_cart_and_recipe_edits(self):
+        for user in self.buyers:
+            client = get_token_client(user)
+            for recipe in self.recipes[:3]:
+                response = client.post(
+                    f'/api/recipes/{recipe.pk}/shopping_cart/'
+                )
+                self.assertEqual(response.status_code, 201)
+        self.assert_consistent()
+
+        recipe = self.recipes[0]
+        ingredients = [
+            {'id': item.ingredient_id, 'amount': item.amount * 2}
+            for item in recipe.recipe_ingredients.all()[1:]
+        ]
+        used = {item['id'] for item in ingredients}
+        ingredients.append({'id': next(
+            ingredient.pk for ingredient in self.ingredients
+            if ingredient.pk not in used
+            and not recipe.recipe_ingredients.filter(
+                ingredient=ingredient
+            ).exists()
+        ), 'amount': 7})
+        response = get_token_client(self.author).patch(
+            f'/api/recipes/{recipe.pk}/', {'ingredients': ingredients},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assert_consistent()
+
+        response = get_token_client(self.buyers[0]).delete(
+            f'/api/recipes/{recipe.pk}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assert_consistent()
+
+    def test_download_reads_aggregate(self):
+        client = get_token_client(self.buyers[0])
+        client.post('/api/recipes/shopping_cart/', {
+            'recipes': [recipe.pk for recipe in self.recipes]
+        }, format='json')
+        # Токен, проверка корзины и позиции списка без GROUP BY.
+        token_cache.clear()
+        with self.assertNumQueries(3):
+            response = client.get(
+                '/api/recipes/download_shopping_cart/', {'format': 'json'}
+            )
+            items = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(
+            {item['name']: item['amount'] for item in items},
+            {
+                Ingredient.objects.get(pk=pk).name: amount
+                for pk, amount in self.get_expected(self.buyers[0]).items()
+            }
+        )
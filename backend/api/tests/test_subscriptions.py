@@ -0,0 +1,63 @@
+from rest_framework.test import APIClient
+
+from api.tests.factories import (CleanCacheTestCase, create_catalogue,
+                                 create_recipes, create_user)
+from users.models import Subscrption
+
+
+class IsSubscribedQueriesTest(CleanCacheTestCase):
+    """
+    Подписки текущего пользователя читаются одним запросом
+    на ответ, сколько бы пользователей в нем ни было.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags, cls.ingredients = create_catalogue()
+        cls.user = create_user()
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_authors(self, number, subscribe=True):
+        authors = []
+        for _ in range(number):
+            author = create_user()
+            create_recipes(author, 2, self.tags, self.ingredients)
+            if subscribe:
+                Subscrption.objects.create(user=self.user, following=author)
+            authors.append(author)
+        return authors
+
+    def get(self, path, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(path, {'limit': 50})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def check_pages(self, subscribed):
+        recipes = self.get('/api/recipes/', 6)
+        self.assertEqual(
+            {recipe['author']['id'] for recipe in recipes
+             if recipe['author']['is_subscribed']},
+            subscribed
+        )
+        users = self.get('/api/users/', 3)
+        self.assertEqual(
+            {user['id'] for user in users if user['is_subscribed']},
+            subscribed
+        )
+        authors = self.get('/api/users/subscriptions/', 4)
+        self.assertEqual({author['id'] for author in authors}, subscribed)
+        self.assertTrue(all(author['is_subscribed'] for author in authors))
+
+    def test_queries_do_not_grow(self):
+        subscribed = {author.pk for author in self.add_authors(2)}
+        self.add_authors(1, subscribe=False)
+        self.check_pages(subscribed)
+        self.setUp()
+        subscribed |= {author.pk for author in self.add_authors(10)}
+        self.add_authors(5, subscribe=False)
+        self.check_pages(subscribed)
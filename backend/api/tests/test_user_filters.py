@@ -0,0 +1,120 @@
+import json
+from unittest import skipUnless
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.management.commands.audit_indexes import walk_postgresql
+from api.tests.factories import (CleanCacheTestCase, create_catalogue,
+                                 create_recipes, create_user)
+from recipes.models import Favorite, ShoppingCart
+
+# Индексы ограничений (user, recipe) избранного и списка покупок.
+INDEXES = {
+    'is_favorited': ('recipes_favorite', 'unique_vaforites'),
+    'is_in_shopping_cart': (
+        'recipes_shoppingcart', 'unique_shopping_items'
+    ),
+}
+
+
+class UserFiltersTest(CleanCacheTestCase):
+    """
+    Фильтры is_favorited и is_in_shopping_cart - полусоединения
+    по индексу (user, recipe), без JOIN таблиц связей.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        tags, ingredients = create_catalogue()
+        recipes = create_recipes(create_user(), 12, tags, ingredients)
+        cls.favorites = {recipe.pk for recipe in recipes[::2]}
+        cls.cart = {recipe.pk for recipe in recipes[::3]}
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.user, recipe_id=pk) for pk in cls.favorites
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=cls.user, recipe_id=pk) for pk in cls.cart
+        )
+        other = create_user()
+        Favorite.objects.bulk_create(
+            Favorite(user=other, recipe=recipe) for recipe in recipes
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_recipes_query(self, name):
+        """Ответ со всеми рецептами по фильтру и SQL выборки рецептов."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                '/api/recipes/', {name: 1, 'limit': 50}
+            )
+        self.assertEqual(response.status_code, 200)
+        sql, = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT "recipes_recipe"."id"')
+        ]
+        return response.json()['results'], sql
+
+    def test_filters(self):
+        for name, expected in (
+            ('is_favorited', self.favorites),
+            ('is_in_shopping_cart', self.cart),
+        ):
+            with self.subTest(name):
+                recipes, sql = self.get_recipes_query(name)
+                self.assertEqual(
+                    {recipe['id'] for recipe in recipes}, expected
+                )
+                self.assertTrue(all(recipe[name] for recipe in recipes))
+                table, _ = INDEXES[name]
+                self.assertNotIn(f'JOIN "{table}"', sql)
+                self.assertIn('EXISTS', sql)
+
+    @skipUnless(connection.vendor == 'sqlite', 'план запроса SQLite')
+    def test_sqlite_plan(self):
+        for name, (table, index) in INDEXES.items():
+            with self.subTest(name):
+                _, sql = self.get_recipes_query(name)
+                with connection.cursor() as cursor:
+                    cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                    plan = [row[-1] for row in cursor.fetchall()]
+                # SQLite хранит ограничение уникальности в индексе
+                # sqlite_autoindex_<таблица>_N.
+                used = [
+                    line for line in plan
+                    if (f'INDEX {index} ' in line
+                        or f'INDEX sqlite_autoindex_{table}_' in line)
+                    and '(user_id=? AND recipe_id=?)' in line
+                ]
+                self.assertTrue(used, plan)
+                self.assertFalse(
+                    [line for line in plan if line.startswith('SCAN U')],
+                    plan
+                )
+
+    @skipUnless(connection.vendor == 'postgresql', 'план запроса PostgreSQL')
+    def test_postgresql_plan(self):
+        for name, (table, index) in INDEXES.items():
+            with self.subTest(name):
+                _, sql = self.get_recipes_query(name)
+                with connection.cursor() as cursor:
+                    # На тестовых данных полный просмотр дешевле индекса.
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+                    cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+                    plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                scans = [
+                    node for node in walk_postgresql(plan[0]['Plan'])
+                    if node.get('Relation Name') == table
+                ]
+                self.assertTrue(scans)
+                self.assertTrue(all(
+                    node.get('Index Name') == index for node in scans
+                ), scans)
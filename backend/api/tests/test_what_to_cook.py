@@ -0,0 +1,112 @@
+from django.conf import settings
+from rest_framework.test import APIClient
+
+from api.tests.factories import (TEST_IMAGE, CleanCacheTestCase,
+                                 create_catalogue, create_user)
+from recipes.models import Recipe, RecipeIngredient, RecipeTag
+
+PATH = '/api/recipes/what_to_cook/'
+
+
+class WhatToCookTest(CleanCacheTestCase):
+    """Подбор рецептов по имеющимся ингредиентам."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags, cls.ingredients = create_catalogue(ingredients=6)
+        cls.author = create_user()
+        a, b, c, d, e, f = cls.ingredients
+        cls.have = [a, b, c]
+        cls.full = cls.create_recipe([a, b])
+        cls.most = cls.create_recipe([a, b, c, d])
+        cls.half = cls.create_recipe([a, d], tagged=True)
+        cls.many_missing = cls.create_recipe([a, b, c, d, e, f])
+        cls.unrelated = cls.create_recipe([d, e])
+        cls.newer_half = cls.create_recipe([c, d], tagged=True)
+
+    @classmethod
+    def create_recipe(cls, ingredients, tagged=False):
+        recipe = Recipe.objects.create(
+            author=cls.author, name=f'Рецепт {Recipe.objects.count()}',
+            text='Описание', image=TEST_IMAGE, cooking_time=10,
+            image_derivatives={'source': TEST_IMAGE, 'images': {}}
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in ingredients
+        )
+        if tagged:
+            RecipeTag.objects.create(recipe=recipe, tag=cls.tags[0])
+        return recipe
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def search(self, ingredients=None, status=200, **params):
+        ingredients = self.have if ingredients is None else ingredients
+        response = self.client.get(PATH, {
+            'ingredients': [ingredient.pk for ingredient in ingredients],
+            **params
+        })
+        self.assertEqual(response.status_code, status, response.content)
+        return response.json()
+
+    def test_ranking(self):
+        results = self.search()
+        self.assertEqual(
+            [(item['id'], item['coverage'], item['matched'], item['missing'])
+             for item in results],
+            [
+                (self.full.pk, 1.0, 2, 0),
+                (self.most.pk, 0.75, 3, 1),
+                # При равном покрытии и недостающих - более новый.
+                (self.newer_half.pk, 0.5, 1, 1),
+                (self.half.pk, 0.5, 1, 1),
+                (self.many_missing.pk, 0.5, 3, 3),
+            ]
+        )
+
+    def test_limit_and_tags(self):
+        results = self.search(limit=2)
+        self.assertEqual(
+            [item['id'] for item in results], [self.full.pk, self.most.pk]
+        )
+        results = self.search(tags=self.tags[0].slug)
+        self.assertEqual(
+            [item['id'] for item in results],
+            [self.newer_half.pk, self.half.pk]
+        )
+
+    def test_validation(self):
+        self.search(ingredients=[], status=400)
+        self.search(limit=0, status=400)
+        self.search(limit=settings.WHAT_TO_COOK_MAX_LIMIT + 1, status=400)
+        response = self.client.get(PATH, {
+            'ingredients': range(
+                1, settings.WHAT_TO_COOK_MAX_INGREDIENTS + 2
+            )
+        })
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(PATH, {'ingredients': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_queries(self):
+        self.search()
+        with self.assertNumQueries(2):
+            # Версии данных и найденные рецепты, индекс - в памяти.
+            self.search()
+
+    def test_index_follows_recipe_ingredients(self):
+        self.assertNotIn(
+            self.unrelated.pk, [item['id'] for item in self.search()]
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.create(
+                recipe=self.unrelated, ingredient=self.have[0], amount=1
+            )
+        found = {item['id']: item for item in self.search()}
+        self.assertEqual(found[self.unrelated.pk]['coverage'], 0.333)
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.filter(recipe=self.full).delete()
+        self.assertNotIn(self.full.pk, [item['id'] for item in self.search()])
@@ -0,0 +1,60 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Замеры текущего запроса: {имя: [длительность в мс, число вызовов]}.
+# Заполняются, только пока запрос обрабатывает ServerTimingMiddleware.
+_timings = ContextVar('timings', default=None)
+_depth = ContextVar('timing_depth', default=0)
+
+
+@contextmanager
+def collect_timings():
+    """Собирать замеры внутри блока; отдает словарь замеров."""
+    timings = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def add_timing(name, duration, count=1):
+    """Добавить длительность в мс к замеру name текущего запроса."""
+    timings = _timings.get()
+    if timings is None:
+        return
+    total = timings.setdefault(name, [0.0, 0])
+    total[0] += duration
+    total[1] += count
+
+
+@contextmanager
+def timed(name):
+    """
+    Замерить блок. Вложенные блоки с тем же механизмом не учитываются
+    повторно: считается только внешний.
+    """
+    if _timings.get() is None:
+        yield
+        return
+    depth = _depth.get()
+    token = _depth.set(depth + 1)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _depth.reset(token)
+        if not depth:
+            add_timing(name, (time.perf_counter() - start) * 1000)
+
+
+class QueryTimer:
+    """Обертка выполнения SQL: считает запросы и время в базе."""
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            add_timing('db', (time.perf_counter() - start) * 1000)
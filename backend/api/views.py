@@ -1,19 +1,38 @@
-import io
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.db.models import Exists, OuterRef
-from django.http import FileResponse
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
+from api.caching import (catalogue_condition, get_catalogue_version,
+                         get_recipe_ingredients_version, get_tags_version,
+                         get_users_me_cache_key, recipes_cache)
 from api.filters import RecipeFilter
+from api.indexes import (bitmap_to_ids, ingredient_index,
+                         recipe_ingredient_index, tag_index)
+from api.pagination import RecipeCursorPagination, RecipePagination
 from api.permissions import IsAuthorOrReadOnly
-from api.serializers import (FavoriteGetSerializer, IngredientSerializer,
-                             RecipeCreateSerializer, RecipeGetSerializer,
-                             SubscriptionsSerializer, TagSerializer)
-from api.services import generate_shopping_list
+from api.projections import (build_recipes, get_recipe_fields,
+                             project_recipes)
+from api.renderers import SHOPPING_LIST_RENDERERS
+from api.serializers import (CookableRecipeSerializer, FavoriteGetSerializer,
+                             IngredientSerializer, RecipeCreateSerializer,
+                             RecipeGetSerializer, RecipeIdsSerializer,
+                             SubscriptionsSerializer, TagSerializer,
+                             WhatToCookSerializer)
+from api.services import (add_recipes_to, change_counter,
+                          change_shopping_list, filter_feed,
+                          generate_shopping_list, get_recipes_limit,
+                          lock_users, prefetch_latest_recipes,
+                          remove_recipes_from)
 from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
 from users.models import Subscrption, User
 
@@ -21,6 +40,21 @@ from users.models import Subscrption, User
 class CustomUserViewSet(UserViewSet):
     """Пользователи."""
 
+    @action(['get', 'put', 'patch', 'delete'], detail=False)
+    def me(self, request, *args, **kwargs):
+        """
+        Текущий пользователь. При USERS_ME_CACHE_TTL > 0 ответ на GET
+        кешируется; кеш сбрасывается при сохранении пользователя.
+        """
+        if request.method != 'GET' or not settings.USERS_ME_CACHE_TTL:
+            return super().me(request, *args, **kwargs)
+        key = get_users_me_cache_key(request.user.id)
+        data = cache.get(key)
+        if data is None:
+            data = super().me(request, *args, **kwargs).data
+            cache.set(key, data, settings.USERS_ME_CACHE_TTL)
+        return Response(data)
+
     @action(
         detail=False,
         permission_classes=(IsAuthenticated,)
@@ -30,15 +64,21 @@ class CustomUserViewSet(UserViewSet):
         Возвращает пользователей, на которых подписан текущий пользователь.
         """
         queryset = User.objects.filter(following__user=request.user)
+        limit = get_recipes_limit(request)
         page = self.paginate_queryset(queryset)
         if page is not None:
+            prefetch_latest_recipes(page, limit)
             serializer = SubscriptionsSerializer(
                 page, many=True, context={'request': request}
             )
             return self.get_paginated_response(serializer.data)
-        serializer = SubscriptionsSerializer(queryset, many=True)
+        serializer = SubscriptionsSerializer(
+            prefetch_latest_recipes(queryset, limit),
+            many=True, context={'request': request}
+        )
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @transaction.atomic
     def create_subscribe(self, request, author):
         """Подписаться на пользователя (автора)."""
         if request.user == author:
@@ -55,12 +95,14 @@ class CustomUserViewSet(UserViewSet):
                 {'errors': 'Подписка на данного автора уже оформлена!'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        change_counter(User, author.id, 'followers_count', 1)
         serializer = SubscriptionsSerializer(
             instance=author,
             context={'request': request}
         )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def delete_subscribe(self, request, author):
         """Отписаться от пользователя (автора)."""
         cnt_deleted, _ = Subscrption.objects.filter(
@@ -73,6 +115,7 @@ class CustomUserViewSet(UserViewSet):
                 {'errors': 'Подписка на данного автора не оформлена!'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        change_counter(User, author.id, 'followers_count', -1)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -88,22 +131,49 @@ class CustomUserViewSet(UserViewSet):
 
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Ingredient.objects.all()
+    queryset = Ingredient.objects.select_related('measurement_unit')
     serializer_class = IngredientSerializer
-    filter_backends = (filters.SearchFilter,)
-    search_fields = ('^name',)
     pagination_class = None
 
+    @catalogue_condition
+    def list(self, request, *args, **kwargs):
+        """
+        Поиск ингредиентов по началу названия через индекс в памяти,
+        без обращения к базе данных.
+        """
+        version, _ = get_catalogue_version(request)
+        name = request.query_params.get(api_settings.SEARCH_PARAM)
+        if not name:
+            return Response(ingredient_index.all(version))
+        return Response(ingredient_index.search(
+            name, settings.INGREDIENTS_SEARCH_LIMIT, version
+        ))
+
+    @catalogue_condition
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
 
+    @catalogue_condition
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @catalogue_condition
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     permission_classes = (IsAuthorOrReadOnly,)
+    filter_backends = (DjangoFilterBackend, filters.OrderingFilter)
     filterset_class = RecipeFilter
+    pagination_class = RecipePagination
+    ordering_fields = ('pub_date', 'favorites_count', 'shopping_cart_count')
 
     def get_queryset(self):
         if self.request.user.is_authenticated:
@@ -118,7 +188,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return (
                 Recipe.objects
                 .select_related('author')
-                .prefetch_related('tags', 'ingredients')
+                .prefetch_related(
+                    'tags',
+                    'recipe_ingredients__ingredient__measurement_unit'
+                )
                 .annotate(
                     is_favorited=Exists(from_user_favorite),
                     is_in_shopping_cart=Exists(from_shopping_cart)
@@ -127,10 +200,40 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return (
             Recipe.objects
             .select_related('author')
-            .prefetch_related('tags', 'ingredients')
+            .prefetch_related(
+                'tags',
+                'recipe_ingredients__ingredient__measurement_unit'
+            )
             .all()
         )
 
+    @recipes_cache
+    def list(self, request, *args, **kwargs):
+        """
+        Список рецептов. Рецепты читаются строками values()
+        и собираются в ответ без сериализаторов (api.projections).
+        Параметры fields и omit задают поля рецептов в ответе.
+        """
+        fields = get_recipe_fields(request.query_params)
+        queryset = project_recipes(
+            self.filter_queryset(self.get_queryset()), fields
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                build_recipes(page, request, fields)
+            )
+        return Response(build_recipes(queryset, request, fields))
+
+    @recipes_cache
+    def retrieve(self, request, *args, **kwargs):
+        fields = get_recipe_fields(request.query_params)
+        row = get_object_or_404(
+            project_recipes(self.filter_queryset(self.get_queryset()), fields),
+            pk=kwargs[self.lookup_field]
+        )
+        return Response(build_recipes([row], request, fields)[0])
+
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return RecipeGetSerializer
@@ -141,28 +244,93 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(
         detail=False,
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=SHOPPING_LIST_RENDERERS
     )
     def download_shopping_cart(self, request):
-        """ Скачать список покупок. """
+        """
+        Скачать список покупок.
+        Формат задается параметром format: txt, csv, json или markdown.
+        """
         if not request.user.in_shopping_cart.exists():
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        shopping_list = generate_shopping_list(request.user)
-        response = FileResponse(
-            io.BytesIO(shopping_list.encode("utf-8")),
-            content_type="text/x-python",
-            as_attachment=True,
-            filename='shopping_list.txt'
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(generate_shopping_list(request.user)),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{renderer.format}"'
         )
         return response
 
-    def add_to(self, model, request, recipe, errors):
+    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def feed(self, request):
+        """
+        Лента: рецепты всех авторов из подписок, сначала новые.
+        Пагинация курсорная по ключу (pub_date, id).
+        Параметры fields и omit задают поля рецептов в ответе.
+        """
+        fields = get_recipe_fields(request.query_params)
+        paginator = RecipeCursorPagination()
+        page = paginator.paginate_queryset(
+            project_recipes(
+                filter_feed(self.get_queryset(), request.user), fields
+            ),
+            request, self
+        )
+        return paginator.get_paginated_response(
+            build_recipes(page, request, fields)
+        )
+
+    @action(detail=False)
+    def what_to_cook(self, request):
+        """
+        Рецепты, которые можно приготовить из имеющихся ингредиентов.
+        Параметры: ingredients - id ингредиентов, tags - слаги тегов,
+        limit - число рецептов. Рецепты подбираются по обратному
+        индексу ингредиентов в памяти, из базы читаются только
+        найденные рецепты.
+        """
+        params = WhatToCookSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        params = params.validated_data
+        recipe_ids = None
+        if params['tags']:
+            recipe_ids = set(bitmap_to_ids(tag_index.get_bitmap(
+                params['tags'], get_tags_version(request)
+            )))
+        found = recipe_ingredient_index.search(
+            params['ingredients'], params['limit'], recipe_ids,
+            get_recipe_ingredients_version(request)
+        )
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'image_derivatives', 'cooking_time'
+        ).in_bulk([recipe_id for recipe_id, _, _ in found])
+        results = []
+        for recipe_id, matched, total in found:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.coverage = round(matched / total, 3)
+            recipe.matched = matched
+            recipe.missing = total - matched
+            results.append(recipe)
+        return Response(CookableRecipeSerializer(
+            results, many=True, context={'request': request}
+        ).data)
+
+    @transaction.atomic
+    def add_to(self, model, request, recipe, errors, counter):
         """
         Добавить рецепт в список покупок или в избранное.
         Параметры:
             model: имя модели из models
             errors: текстовое сообщение об ошибке при добавлении в базу
+            counter: имя поля-счетчика добавлений в модели рецепта
         """
+        # Та же очередь, что и у пакетного добавления (add_recipes_to).
+        lock_users([request.user.id])
         _, created = model.objects.get_or_create(
             user=request.user,
             recipe=recipe
@@ -172,17 +340,22 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 {'errors': errors},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        change_counter(Recipe, recipe.id, counter, 1)
+        if model is ShoppingCart:
+            change_shopping_list(request.user.id, recipe.id, 1)
         serializer = FavoriteGetSerializer(
             instance=recipe, context={'request': request}
         )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    def delete_from(self, model, request, recipe, errors):
+    @transaction.atomic
+    def delete_from(self, model, request, recipe, errors, counter):
         """
         Удалить рецепт из списка покупок или из избранного.
         Параметры:
             model: имя модели из models
             errors: текстовое сообщение об ошибке при удалении из базы
+            counter: имя поля-счетчика добавлений в модели рецепта
         """
         cnt_deleted, _ = model.objects.filter(
             user=request.user,
@@ -194,8 +367,85 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 {'errors': errors},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        change_counter(Recipe, recipe.id, counter, -1)
+        if model is ShoppingCart:
+            change_shopping_list(request.user.id, recipe.id, -1)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @transaction.atomic
+    def change_batch(self, model, request, counter):
+        """
+        Добавить (POST) или удалить (DELETE) несколько рецептов
+        из списка покупок или избранного.
+        Тело запроса: {"recipes": [id, ...]}.
+        В ответе для каждого id указан результат операции.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        if request.method == 'POST':
+            results = add_recipes_to(
+                model, request.user, counter, recipe_ids
+            )
+        else:
+            results = remove_recipes_from(
+                model, request.user, counter, recipe_ids
+            )
+        return self.batch_response(results)
+
+    @transaction.atomic
+    def clear(self, model, request, counter):
+        """Удалить все рецепты из списка покупок или избранного."""
+        return self.batch_response(
+            remove_recipes_from(model, request.user, counter)
+        )
+
+    @staticmethod
+    def batch_response(results):
+        return Response({'recipes': [
+            {'id': pk, 'status': result} for pk, result in results.items()
+        ]})
+
+    @action(
+        ['POST', 'DELETE'],
+        detail=False,
+        url_path='shopping_cart',
+        permission_classes=(IsAuthenticated,)
+    )
+    def shopping_cart_batch(self, request):
+        """ Пакетное изменение списка покупок. """
+        return self.change_batch(ShoppingCart, request, 'shopping_cart_count')
+
+    @action(
+        ['DELETE'],
+        detail=False,
+        url_path='shopping_cart/clear',
+        permission_classes=(IsAuthenticated,)
+    )
+    def clear_shopping_cart(self, request):
+        """ Очистить список покупок. """
+        return self.clear(ShoppingCart, request, 'shopping_cart_count')
+
+    @action(
+        ['POST', 'DELETE'],
+        detail=False,
+        url_path='favorite',
+        permission_classes=(IsAuthenticated,)
+    )
+    def favorite_batch(self, request):
+        """ Пакетное изменение избранного. """
+        return self.change_batch(Favorite, request, 'favorites_count')
+
+    @action(
+        ['DELETE'],
+        detail=False,
+        url_path='favorite/clear',
+        permission_classes=(IsAuthenticated,)
+    )
+    def clear_favorite(self, request):
+        """ Очистить избранное. """
+        return self.clear(Favorite, request, 'favorites_count')
+
     @action(
         ['POST', 'DELETE'],
         detail=True,
@@ -207,11 +457,13 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if request.method == 'POST':
             return self.add_to(
                 ShoppingCart, request, recipe,
-                'Данный рецепт уже есть в списке покупок!'
+                'Данный рецепт уже есть в списке покупок!',
+                'shopping_cart_count'
             )
         return self.delete_from(
             ShoppingCart, request, recipe,
-            'Данного рецепта нет в списке покупок!'
+            'Данного рецепта нет в списке покупок!',
+            'shopping_cart_count'
         )
 
     @action(
@@ -225,9 +477,11 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if request.method == 'POST':
             return self.add_to(
                 Favorite, request, recipe,
-                'Данный рецепт уже есть в избранном!'
+                'Данный рецепт уже есть в избранном!',
+                'favorites_count'
             )
         return self.delete_from(
             Favorite, request, recipe,
-            'Данного рецепта нет в избранном!'
+            'Данного рецепта нет в избранном!',
+            'favorites_count'
         )
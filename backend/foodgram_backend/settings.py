@@ -33,6 +33,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -41,6 +42,10 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'FALSE').upper() == 'TRUE'
+if SERVER_TIMING:
+    MIDDLEWARE.insert(0, 'api.middleware.ServerTimingMiddleware')
+
 ROOT_URLCONF = 'foodgram_backend.urls'
 
 TEMPLATES = [
@@ -79,6 +84,41 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения: DB_REPLICAS=host1:5432,host2. Имя базы,
+# пользователь и пароль - как у основной базы.
+REPLICA_DATABASES = []
+for idx, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(','))
+):
+    host, _, port = replica.strip().partition(':')
+    DATABASES[f'replica{idx}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(f'replica{idx}')
+
+# Локальный запуск и тесты без PostgreSQL: USE_SQLITE=TRUE.
+# Вторая база нужна тестам маршрутизатора реплик, сама по себе
+# она не используется: REPLICA_DATABASES остается пустым.
+if os.getenv('USE_SQLITE', 'FALSE').upper() == 'TRUE':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        },
+        'replica0': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db_replica0.sqlite3',
+        },
+    }
+    REPLICA_DATABASES = []
+
+DATABASE_ROUTERS = ['api.db_router.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 10))
+REPLICA_PIN_COOKIE = 'db_pin'
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -119,7 +159,12 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ],
+
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
 
     'DEFAULT_FILTER_BACKENDS': [
@@ -152,3 +197,25 @@ MAX_LENGTH_SLUG = 50
 MAX_LENGTH_USERNAME = 150
 MAX_LENGTH_PASSWORD = 150
 MAX_LENGTH_EMAIL = 254
+INGREDIENTS_SEARCH_LIMIT = 50
+CATALOGUE_MAX_AGE = 60
+MAX_PAGE_SIZE = 100
+RECIPES_COUNT_CACHE_TIMEOUT = 60
+RECIPES_COUNT_ESTIMATE_MIN = 100000
+TAG_FILTER_MAX_IDS = 1000
+RECIPES_CACHE_TIMEOUT = 300
+RECIPES_BATCH_MAX = 100
+RECIPE_IMAGE_WIDTHS = (300, 600, 1200)
+RECIPE_IMAGE_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_IMAGE_WORKERS = 2
+SLOW_REQUEST_QUERIES = 30
+SLOW_REQUEST_MS = 500
+SEARCH_CONFIG = 'russian'
+WHAT_TO_COOK_LIMIT = 10
+WHAT_TO_COOK_MAX_LIMIT = 50
+WHAT_TO_COOK_MAX_INGREDIENTS = 50
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 60
+# Время кеширования ответа /users/me/ в секундах, 0 - без кеша.
+USERS_ME_CACHE_TTL = int(os.getenv('USERS_ME_CACHE_TTL', 0))
@@ -46,7 +46,7 @@ class RecipeAdmin(admin.ModelAdmin):
         description='Общее число добавлений в избранное'
     )
     def count_in_favorites(self, obj):
-        return obj.in_favorites.count()
+        return obj.favorites_count
 
 
 @admin.register(Tag)
@@ -1,31 +1,259 @@
 import csv
+import json
+import re
+import time
+from io import StringIO
+from itertools import chain, islice
+from pathlib import Path
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
-from recipes.models import Ingredient, Measurement
+from recipes.models import DataVersion, Ingredient, Measurement
 
+DEFAULT_FILE = Path(settings.BASE_DIR) / 'data' / 'ingredients.csv'
+FORMATS = ('csv', 'json')
+STAGING_TABLE = 'load_data_ingredients'
+JSON_CHUNK_SIZE = 64 * 1024
+SPACES = re.compile(r'\s*')
 
-TABLES = {
-    Ingredient: 'ingredients.csv',
-}
+
+def read_csv(file):
+    """Строки CSV: название, единица измерения."""
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def read_json_array(file, chunk_size=JSON_CHUNK_SIZE):
+    """
+    Элементы JSON-массива по одному: файл читается порциями
+    по chunk_size символов, в памяти - только текущая порция.
+    Открывающая скобка массива уже прочитана.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+    # start - сразу после '[', value - после запятой, sep - после элемента.
+    state = 'start'
+    while True:
+        pos = SPACES.match(buffer, pos).end()
+        if pos < len(buffer):
+            char = buffer[pos]
+            if state != 'value' and char == ']':
+                return
+            if state == 'sep':
+                if char != ',':
+                    raise CommandError(
+                        'Ошибка в JSON-массиве: ожидалась запятая'
+                    )
+                pos, state = pos + 1, 'value'
+                continue
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                end = None
+            # Элемент в конце порции мог быть обрезан (например, число).
+            if end is not None and (end < len(buffer) or eof):
+                yield item
+                pos, state = end, 'sep'
+                continue
+        if eof:
+            raise CommandError('Ошибка в JSON-массиве')
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+
+def read_json(file):
+    """
+    Ингредиенты из JSON: массив объектов с полями name
+    и measurement_unit или по одному объекту в строке (JSON Lines).
+    Оба варианта читаются по частям. Для элементов без нужных полей
+    отдается None: такие строки пропускаются.
+    """
+    start = file.read(1)
+    while start.isspace():
+        start = file.read(1)
+    if start == '[':
+        items = read_json_array(file)
+    else:
+        items = (
+            json.loads(line)
+            for line in chain([start + file.readline()], file)
+            if line.strip()
+        )
+    for item in items:
+        if isinstance(item, dict):
+            yield item.get('name'), item.get('measurement_unit')
+        else:
+            yield None, None
+
+
+READERS = {'csv': read_csv, 'json': read_json}
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
 
 
 class Command(BaseCommand):
+    help = (
+        'Загрузить ингредиенты из CSV или JSON. Повторная загрузка '
+        'не создает дубликатов: ингредиент определяется названием '
+        'и единицей измерения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files', nargs='*', default=[str(DEFAULT_FILE)],
+            help='Файлы с ингредиентами, по умолчанию data/ingredients.csv.'
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат файлов, по умолчанию - по расширению.'
+        )
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY даже на PostgreSQL.'
+        )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_name = Ingredient._meta.get_field('name').max_length
+        self.max_unit = Measurement._meta.get_field('name').max_length
+
+    def read(self, path, file_format):
+        """Нормализованные пары (название, единица) из файла."""
+        file_format = file_format or Path(path).suffix.lstrip('.').lower()
+        if file_format == 'jsonl':
+            file_format = 'json'
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла {path}')
+        try:
+            with open(path, newline='', encoding='utf-8') as file:
+                for name, unit in READERS[file_format](file):
+                    if not isinstance(name, str) or not isinstance(unit, str):
+                        self.skipped += 1
+                        continue
+                    name, unit = name.strip().capitalize(), unit.strip()
+                    if (
+                        not name or not unit
+                        or len(name) > self.max_name
+                        or len(unit) > self.max_unit
+                    ):
+                        self.skipped += 1
+                        continue
+                    yield name, unit
+        except OSError as error:
+            raise CommandError(error)
+
+    def get_units(self, names):
+        """
+        Id единиц измерения по названиям: недостающие единицы
+        создаются одним запросом, известные берутся из памяти.
+        """
+        missing = set(names) - self.units.keys()
+        if missing:
+            Measurement.objects.bulk_create(
+                (Measurement(name=name) for name in missing),
+                ignore_conflicts=True
+            )
+            created = dict(
+                Measurement.objects.filter(
+                    name__in=missing
+                ).values_list('name', 'id')
+            )
+            self.units_created += len(created)
+            self.units.update(created)
+        return self.units
+
+    def load_batches(self, rows, chunk_size):
+        """Загрузка порциями через bulk_create."""
+        self.units = dict(Measurement.objects.values_list('name', 'id'))
+        for chunk in chunked(rows, chunk_size):
+            self.rows += len(chunk)
+            units = self.get_units(unit for _, unit in chunk)
+            keys = {(name, units[unit]) for name, unit in chunk}
+            existing = set(
+                Ingredient.objects.filter(
+                    name__in={name for name, _ in keys}
+                ).values_list('name', 'measurement_unit_id')
+            )
+            new = keys - existing
+            Ingredient.objects.bulk_create(
+                Ingredient(name=name, measurement_unit_id=unit_id)
+                for name, unit_id in new
+            )
+            self.created += len(new)
+
+    def load_copy(self, rows, chunk_size):
+        """
+        Загрузка через COPY во временную таблицу PostgreSQL
+        и два INSERT ... SELECT из нее.
+        """
+        quote = connection.ops.quote_name
+        staging = quote(STAGING_TABLE)
+        units_table = quote(Measurement._meta.db_table)
+        ingredients_table = quote(Ingredient._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {staging} '
+                '(name text NOT NULL, unit text NOT NULL) ON COMMIT DROP'
+            )
+            for chunk in chunked(rows, chunk_size):
+                self.rows += len(chunk)
+                buffer = StringIO()
+                csv.writer(buffer).writerows(chunk)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY {staging} (name, unit) FROM STDIN WITH CSV',
+                    buffer
+                )
+            cursor.execute(
+                f'INSERT INTO {units_table} (name) '
+                f'SELECT DISTINCT unit FROM {staging} '
+                'ON CONFLICT (name) DO NOTHING'
+            )
+            self.units_created += cursor.rowcount
+            cursor.execute(
+                f'INSERT INTO {ingredients_table} (name, measurement_unit_id) '
+                f'SELECT DISTINCT s.name, m.id FROM {staging} s '
+                f'JOIN {units_table} m ON m.name = s.unit '
+                f'WHERE NOT EXISTS (SELECT 1 FROM {ingredients_table} i '
+                'WHERE i.name = s.name AND i.measurement_unit_id = m.id)'
+            )
+            self.created += cursor.rowcount
 
-    def handle(self, *args, **kwargs):
-        for model, csv_f in TABLES.items():
-            with open(
-                # f'{settings.BASE_DIR}\\data\\{csv_f}',
-                f'{settings.BASE_DIR}/data/{csv_f}',
-                newline='',
-                encoding='utf-8'
-            ) as csv_file:
-                reader = csv.reader(csv_file)
-                data = []
-                for row in reader:
-                    m_unit, _ = Measurement.objects.get_or_create(name=row[1])
-                    data.append(model(name=row[0].capitalize(),
-                                      measurement_unit=m_unit))
-            model.objects.bulk_create(data)
+    def handle(self, *args, **options):
+        self.rows = self.skipped = self.created = self.units_created = 0
+        use_copy = (
+            connection.vendor == 'postgresql' and not options['no_copy']
+        )
+        load = self.load_copy if use_copy else self.load_batches
+        start = time.perf_counter()
+        with transaction.atomic():
+            load(
+                chain.from_iterable(
+                    self.read(path, options['format'])
+                    for path in options['files']
+                ),
+                options['chunk_size']
+            )
+            if self.created or self.units_created:
+                DataVersion.bump(DataVersion.CATALOGUE)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'Строк прочитано: {self.rows}, пропущено: {self.skipped}\n'
+            f'Новых единиц измерения: {self.units_created}\n'
+            f'Новых ингредиентов: {self.created}\n'
+            f'Время: {elapsed:.2f} с, '
+            f'{self.rows / elapsed if elapsed else 0:.0f} строк/с'
+        )
         self.stdout.write(self.style.SUCCESS('Данные успешно загружены!'))
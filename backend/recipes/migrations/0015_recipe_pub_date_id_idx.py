@@ -0,0 +1,26 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+import recipes.operations
+
+
+class Migration(migrations.Migration):
+    # Индекс таблицы рецептов строится без блокировки записи
+    # (CREATE INDEX CONCURRENTLY), это невозможно в транзакции.
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0014_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'ordering': ('-pub_date', '-id'), 'verbose_name': 'Рецепт', 'verbose_name_plural': 'Рецепты'},
+        ),
+        recipes.operations.AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipe_pub_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.RenameModel(
+            old_name='CatalogueVersion',
+            new_name='DataVersion',
+        ),
+        migrations.AlterModelOptions(
+            name='dataversion',
+            options={'verbose_name': 'Версия данных', 'verbose_name_plural': 'Версии данных'},
+        ),
+        migrations.AddField(
+            model_name='dataversion',
+            name='name',
+            field=models.CharField(default='catalogue', max_length=50, unique=True, verbose_name='Набор данных'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+import recipes.operations
+
+
+class Migration(migrations.Migration):
+    # Индексы user_id избранного и корзины заменяются уникальными
+    # индексами (user, recipe). Удаляются только индексы, ограничения
+    # FOREIGN KEY не пересоздаются; DROP INDEX CONCURRENTLY на
+    # PostgreSQL невозможен в транзакции.
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0016_dataversion'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='favorite',
+                    name='user',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='in_favorites', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+                ),
+            ],
+            database_operations=[
+                recipes.operations.RemoveForeignKeyIndex(
+                    model_name='favorite',
+                    name='user',
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='shoppingcart',
+                    name='user',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='in_shopping_cart', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+                ),
+            ],
+            database_operations=[
+                recipes.operations.RemoveForeignKeyIndex(
+                    model_name='shoppingcart',
+                    name='user',
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,75 @@
+from django.db import migrations
+
+# Поисковые структуры зависят от базы и в моделях не описаны:
+# в PostgreSQL - столбец tsvector с GIN-индексом и триграммный индекс
+# по названию, в SQLite - виртуальная таблица FTS5.
+POSTGRES_FORWARD = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector',
+    'CREATE INDEX recipe_search_vector_idx ON recipes_recipe '
+    'USING gin (search_vector)',
+    'CREATE INDEX recipe_name_trgm_idx ON recipes_recipe '
+    'USING gin (name gin_trgm_ops)',
+    'UPDATE recipes_recipe r SET search_vector = '
+    "setweight(to_tsvector('russian', r.name), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(("
+    "SELECT string_agg(i.name, ' ') FROM recipes_recipeingredient ri "
+    'JOIN recipes_ingredient i ON i.id = ri.ingredient_id '
+    "WHERE ri.recipe_id = r.id), ''))"
+    ", 'B') || "
+    "setweight(to_tsvector('russian', r.text), 'C')",
+)
+POSTGRES_BACKWARD = (
+    'DROP INDEX IF EXISTS recipe_name_trgm_idx',
+    'DROP INDEX IF EXISTS recipe_search_vector_idx',
+    'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector',
+)
+SQLITE_FORWARD = (
+    'CREATE VIRTUAL TABLE recipes_recipe_search USING fts5('
+    "name, text, ingredients, tokenize='unicode61 remove_diacritics 2')",
+    'INSERT INTO recipes_recipe_search (rowid, name, text, ingredients) '
+    'SELECT r.id, r.name, r.text, ('
+    "SELECT group_concat(i.name, ' ') FROM recipes_recipeingredient ri "
+    'JOIN recipes_ingredient i ON i.id = ri.ingredient_id '
+    'WHERE ri.recipe_id = r.id) FROM recipes_recipe r',
+)
+SQLITE_BACKWARD = (
+    'DROP TABLE IF EXISTS recipes_recipe_search',
+)
+
+
+def has_fts5(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return ('ENABLE_FTS5',) in cursor.fetchall()
+
+
+def run(schema_editor, postgres, sqlite):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = postgres
+    elif vendor == 'sqlite' and has_fts5(schema_editor):
+        statements = sqlite
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search(apps, schema_editor):
+    run(schema_editor, POSTGRES_FORWARD, SQLITE_FORWARD)
+
+
+def drop_search(apps, schema_editor):
+    run(schema_editor, POSTGRES_BACKWARD, SQLITE_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0019_ingredient_name_unit_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search, drop_search),
+    ]
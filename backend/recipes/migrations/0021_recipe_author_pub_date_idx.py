@@ -0,0 +1,42 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+import recipes.operations
+
+
+class Migration(migrations.Migration):
+    # Индекс таблицы рецептов строится без блокировки записи
+    # (CREATE INDEX CONCURRENTLY), это невозможно в транзакции.
+    # Индекс внешнего ключа автора удаляется после создания нового,
+    # само ограничение FOREIGN KEY не пересоздается.
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0020_recipe_search'),
+    ]
+
+    operations = [
+        recipes.operations.AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='author',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recipes', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+                ),
+            ],
+            database_operations=[
+                recipes.operations.RemoveForeignKeyIndex(
+                    model_name='recipe',
+                    name='author',
+                ),
+            ],
+        ),
+    ]
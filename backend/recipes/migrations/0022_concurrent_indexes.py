@@ -0,0 +1,59 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+import recipes.operations
+
+
+class Migration(migrations.Migration):
+    # Индексы больших таблиц строятся без блокировки записи
+    # (CREATE INDEX CONCURRENTLY), это невозможно в транзакции.
+    # Лишние индексы внешних ключей удаляются после создания новых,
+    # сами ограничения FOREIGN KEY не пересоздаются.
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0021_recipe_author_pub_date_idx'),
+    ]
+
+    operations = [
+        recipes.operations.AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count'], name='recipe_favorites_count_idx'),
+        ),
+        recipes.operations.AddIndexConcurrently(
+            model_name='recipetag',
+            index=models.Index(fields=['tag', 'recipe'], name='recipetag_tag_recipe_idx'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='recipetag',
+                    name='recipe',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='recipes.recipe'),
+                ),
+            ],
+            database_operations=[
+                recipes.operations.RemoveForeignKeyIndex(
+                    model_name='recipetag',
+                    name='recipe',
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='recipetag',
+                    name='tag',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='recipes.tag'),
+                ),
+            ],
+            database_operations=[
+                recipes.operations.RemoveForeignKeyIndex(
+                    model_name='recipetag',
+                    name='tag',
+                ),
+            ],
+        ),
+    ]
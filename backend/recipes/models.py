@@ -1,8 +1,12 @@
 from django.conf import settings
 from django.core.validators import MinValueValidator, RegexValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
 from colorfield.fields import ColorField
 
+from users.models import CounterFieldsMixin
+
 
 class Tag(models.Model):
     """Тег."""
@@ -71,17 +75,24 @@ class Ingredient(models.Model):
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('name',)
+        indexes = (
+            models.Index(
+                fields=('name', 'measurement_unit'),
+                name='ingredient_name_unit_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(CounterFieldsMixin, models.Model):
     """Рецепт."""
 
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='recipes',
         verbose_name='Автор'
     )
@@ -92,6 +103,12 @@ class Recipe(models.Model):
     )
     text = models.TextField('Описание')
     image = models.ImageField('Ссылка на картинку')
+    image_derivatives = models.JSONField(
+        'Уменьшенные копии картинки',
+        default=dict,
+        blank=True,
+        editable=False
+    )
     cooking_time = models.PositiveSmallIntegerField(
         'Время приготовления (мин.)',
         default=1,
@@ -125,11 +142,37 @@ class Recipe(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    favorites_count = models.PositiveIntegerField(
+        'Число добавлений в избранное',
+        default=0
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        'Число добавлений в список покупок',
+        default=0
+    )
+
+    counter_fields = ('favorites_count', 'shopping_cart_count')
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        # Индекс (author, pub_date, id) обслуживает и выборки по автору,
+        # и ленту подписок в порядке публикации.
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('-favorites_count',),
+                name='recipe_favorites_count_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -167,16 +210,27 @@ class RecipeIngredient(models.Model):
 class RecipeTag(models.Model):
     """Теги в рецепте."""
 
-    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
-    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, db_index=False
+    )
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, db_index=False)
 
     class Meta:
+        # Индекс ограничения (recipe, tag) обслуживает выборки
+        # по рецепту, индекс (tag, recipe) - полусоединение фильтра
+        # по тегам и удаление тега.
         constraints = (
             models.UniqueConstraint(
                 fields=('recipe', 'tag'),
                 name='unique_recipe_tags',
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('tag', 'recipe'),
+                name='recipetag_tag_recipe_idx'
+            ),
+        )
 
     def __str__(self):
         return f'{self.recipe} {self.tag}'
@@ -188,6 +242,7 @@ class Favorite(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='in_favorites',
         verbose_name='Пользователь'
     )
@@ -201,6 +256,8 @@ class Favorite(models.Model):
     class Meta:
         verbose_name = 'Избранный рецепт'
         verbose_name_plural = 'Избранные рецепты'
+        # Индекс ограничения (user, recipe) обслуживает и выборки
+        # по пользователю, и проверку рецепта в подзапросах EXISTS.
         constraints = (
             models.UniqueConstraint(
                 fields=('user', 'recipe'),
@@ -218,6 +275,7 @@ class ShoppingCart(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='in_shopping_cart',
         verbose_name='Пользователь'
     )
@@ -231,6 +289,8 @@ class ShoppingCart(models.Model):
     class Meta:
         verbose_name = 'Покупка'
         verbose_name_plural = 'Список покупок'
+        # Индекс ограничения (user, recipe) обслуживает и выборки
+        # по пользователю, и проверку рецепта в подзапросах EXISTS.
         constraints = (
             models.UniqueConstraint(
                 fields=('user', 'recipe'),
@@ -240,3 +300,96 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} {self.recipe}'
+
+
+class DataVersion(models.Model):
+    """
+    Версия набора данных, например каталога тегов и ингредиентов.
+    Увеличивается при каждом изменении данных, по ней сбрасываются
+    кеши и индексы в памяти всех процессов.
+    """
+
+    CATALOGUE = 'catalogue'
+    RECIPE_TAGS = 'recipe_tags'
+    RECIPE_INGREDIENTS = 'recipe_ingredients'
+    RECIPES = 'recipes'
+
+    name = models.CharField(
+        'Набор данных',
+        max_length=settings.MAX_LENGTH_SLUG,
+        unique=True
+    )
+    version = models.PositiveIntegerField('Версия', default=0)
+    updated_at = models.DateTimeField('Дата изменения', default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Версия данных'
+        verbose_name_plural = 'Версии данных'
+
+    @classmethod
+    def bump(cls, name):
+        """Увеличить версию набора данных после его изменения."""
+        updated = cls.objects.filter(name=name).update(
+            version=F('version') + 1,
+            updated_at=timezone.now()
+        )
+        if not updated:
+            cls.objects.get_or_create(name=name, defaults={'version': 1})
+
+    @classmethod
+    def bump_on_commit(cls, name):
+        """
+        Увеличить версию после коммита транзакции, один раз
+        на транзакцию, сколько бы строк в ней ни изменилось.
+        """
+        connection = transaction.get_connection()
+        # Отложенное увеличение уже есть в транзакции. При откате
+        # точки сохранения оно уходит из run_on_commit вместе с ней,
+        # выполненное (captureOnCommitCallbacks в тестах) не считается.
+        if any(
+            getattr(func, 'data_version', None) == name
+            and not func.done
+            for _, func in connection.run_on_commit
+        ):
+            return
+
+        def bump():
+            bump.done = True
+            cls.bump(name)
+
+        bump.data_version = name
+        bump.done = False
+        transaction.on_commit(bump)
+
+    def __str__(self):
+        return f'{self.name} {self.version} ({self.updated_at})'
+
+
+class ShoppingListItem(models.Model):
+    """Суммарное количество ингредиента в списке покупок пользователя."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField('Количество')
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списка покупок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_items'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user} {self.ingredient} {self.amount}'
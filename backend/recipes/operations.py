@@ -0,0 +1,122 @@
+from django.db import NotSupportedError
+from django.db.migrations import AddIndex
+from django.db.migrations.operations.base import Operation
+from django.db.models import Index
+
+
+def ensure_not_in_transaction(operation, schema_editor):
+    if schema_editor.connection.in_atomic_block:
+        raise NotSupportedError(
+            f'{operation.__class__.__name__} нельзя выполнять в транзакции '
+            '(укажите atomic = False в миграции).'
+        )
+
+
+class AddIndexConcurrently(AddIndex):
+    """
+    Индекс через CREATE INDEX CONCURRENTLY на PostgreSQL: таблица
+    не блокируется на запись, пока строится индекс. На других базах -
+    обычный AddIndex. Миграция с этой операцией должна быть
+    atomic = False.
+
+    Своя операция вместо django.contrib.postgres.operations, которая
+    требует psycopg2 даже для миграций на SQLite.
+    """
+
+    atomic = False
+
+    def describe(self):
+        return (
+            f'Concurrently create index {self.index.name} on field(s) '
+            f'{", ".join(self.index.fields)} of model {self.model_name}'
+        )
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        ensure_not_in_transaction(self, schema_editor)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, concurrently=True)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        ensure_not_in_transaction(self, schema_editor)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, concurrently=True)
+
+
+class RemoveForeignKeyIndex(Operation):
+    """
+    Удалить индекс внешнего ключа, не трогая само ограничение.
+    AlterField(db_index=False) в Django 3.2 удаляет и заново создает
+    FOREIGN KEY, а новое ограничение проверяет всю таблицу под
+    блокировкой. Операция меняет только базу: ставится в
+    database_operations SeparateDatabaseAndState вместе с AlterField
+    в state_operations. На PostgreSQL индекс удаляется через
+    DROP INDEX CONCURRENTLY, миграция должна быть atomic = False.
+    """
+
+    def __init__(self, model_name, name):
+        self.model_name = model_name
+        self.name = name
+
+    def deconstruct(self):
+        return (
+            self.__class__.__name__, [],
+            {'model_name': self.model_name, 'name': self.name}
+        )
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def describe(self):
+        return (
+            f'Remove index of foreign key {self.name} '
+            f'on model {self.model_name}'
+        )
+
+    @property
+    def migration_name_fragment(self):
+        return f'remove_{self.model_name.lower()}_{self.name.lower()}_index'
+
+    def get_options(self, schema_editor):
+        """Аргументы CONCURRENTLY для схемы PostgreSQL."""
+        if schema_editor.connection.vendor != 'postgresql':
+            return {}
+        ensure_not_in_transaction(self, schema_editor)
+        return {'concurrently': True}
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        column = model._meta.get_field(self.name).column
+        options = self.get_options(schema_editor)
+        # Индекс ищется по базе: имя зависит от истории таблицы.
+        for name in schema_editor._constraint_names(
+            model, [column], unique=False, primary_key=False, index=True,
+            type_=Index.suffix
+        ):
+            schema_editor.execute(
+                schema_editor._delete_index_sql(model, name, **options)
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        field = model._meta.get_field(self.name)
+        schema_editor.execute(schema_editor._create_index_sql(
+            model, fields=[field], **self.get_options(schema_editor)
+        ))
@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+
+from recipes.management.commands.load_data import read_json_array
+from recipes.models import Ingredient
+
+ITEMS = [
+    {'name': 'Соль', 'measurement_unit': 'г'},
+    {'name': 'Молоко', 'measurement_unit': 'мл', 'extra': [1, {'a': '],'}]},
+    {'name': 'Без единицы'},
+    {'measurement_unit': 'шт'},
+    {'name': 12345, 'measurement_unit': 'г'},
+    'строка',
+    1234567,
+    {'name': 'Яйцо', 'measurement_unit': 'шт'},
+]
+
+
+class ReadJsonArrayTest(SimpleTestCase):
+    """Массив разбирается по частям на любых границах порций."""
+
+    def read(self, text, chunk_size):
+        file = StringIO(text)
+        self.assertEqual(file.read(1), '[')
+        return list(read_json_array(file, chunk_size))
+
+    def test_chunk_boundaries(self):
+        text = json.dumps(ITEMS, ensure_ascii=False, indent=2)
+        for chunk_size in (1, 2, 3, 7, 64, len(text)):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.read(text, chunk_size), ITEMS)
+
+    def test_empty(self):
+        self.assertEqual(self.read('[ ]', 1), [])
+
+    def test_errors(self):
+        for text in ('[1, 2', '[1 2]', '[1,]', '[{"name": "Соль"'):
+            with self.subTest(text=text), self.assertRaises(CommandError):
+                self.read(text, 3)
+
+
+class LoadDataTest(TestCase):
+
+    def load(self, content, suffix):
+        with tempfile.NamedTemporaryFile(
+            'w', suffix=suffix, encoding='utf-8', delete=False
+        ) as file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+        stdout = StringIO()
+        call_command('load_data', file.name, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_json_array_skips_invalid_items(self):
+        output = self.load(json.dumps(ITEMS, ensure_ascii=False), '.json')
+        self.assertIn('Строк прочитано: 3, пропущено: 5', output)
+        self.assertEqual(
+            set(Ingredient.objects.values_list(
+                'name', 'measurement_unit__name'
+            )),
+            {('Соль', 'г'), ('Молоко', 'мл'), ('Яйцо', 'шт')}
+        )
+
+    def test_json_lines(self):
+        content = '\n'.join(
+            json.dumps(item, ensure_ascii=False) for item in ITEMS
+        )
+        self.assertIn(
+            'пропущено: 5', self.load(content, '.jsonl')
+        )
+        self.assertEqual(Ingredient.objects.count(), 3)
@@ -0,0 +1,145 @@
+from django.db import connection, models
+from django.db.migrations import (AddIndex, AlterField,
+                                  SeparateDatabaseAndState)
+from django.db.migrations.executor import MigrationExecutor
+from django.db.migrations.loader import MigrationLoader
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from recipes.operations import AddIndexConcurrently, RemoveForeignKeyIndex
+
+# Таблицы, которые растут с числом пользователей и рецептов: индексы
+# на них строятся без блокировки записи. Справочники (теги,
+# ингредиенты) малы и индексируются обычным AddIndex.
+LARGE_MODELS = {
+    ('recipes', 'recipe'), ('recipes', 'recipetag'),
+    ('recipes', 'recipeingredient'), ('recipes', 'favorite'),
+    ('recipes', 'shoppingcart'), ('users', 'subscrption'),
+}
+# Внешние ключи, индексы которых заменены составными индексами.
+UNINDEXED_FOREIGN_KEYS = (
+    ('recipes_favorite', 'user_id'),
+    ('recipes_shoppingcart', 'user_id'),
+    ('recipes_recipe', 'author_id'),
+    ('recipes_recipetag', 'recipe_id'),
+    ('recipes_recipetag', 'tag_id'),
+    ('users_subscrption', 'user_id'),
+    ('users_subscrption', 'following_id'),
+)
+
+
+def get_constraints(table):
+    with connection.cursor() as cursor:
+        return connection.introspection.get_constraints(cursor, table)
+
+
+def get_column_indexes(table, column):
+    """Индексы из одного столбца, кроме уникальных."""
+    return [
+        name for name, info in get_constraints(table).items()
+        if info['index'] and not info['unique'] and info['columns'] == [column]
+    ]
+
+
+def has_foreign_key(table, column):
+    return any(
+        info['foreign_key'] and info['columns'] == [column]
+        for info in get_constraints(table).values()
+    )
+
+
+def get_migrations():
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    for (app_label, name), migration in loader.disk_migrations.items():
+        if app_label in ('recipes', 'users'):
+            yield app_label, name, migration
+
+
+class ConcurrentIndexMigrationsTest(SimpleTestCase):
+
+    def test_large_tables_use_concurrent_indexes(self):
+        for app_label, name, migration in get_migrations():
+            for operation in migration.operations:
+                if not isinstance(operation, AddIndex):
+                    continue
+                with self.subTest(migration=name, index=operation.index.name):
+                    concurrent = isinstance(operation, AddIndexConcurrently)
+                    if (app_label, operation.model_name_lower) in LARGE_MODELS:
+                        self.assertTrue(concurrent)
+                    if concurrent:
+                        self.assertFalse(migration.atomic)
+
+    def test_foreign_key_indexes_removed_from_state_only(self):
+        """
+        AlterField(db_index=False) пересоздает FOREIGN KEY: индекс
+        внешнего ключа удаляется RemoveForeignKeyIndex, а AlterField
+        меняет только состояние в SeparateDatabaseAndState.
+        """
+        for app_label, name, migration in get_migrations():
+            for operation in migration.operations:
+                if isinstance(operation, SeparateDatabaseAndState):
+                    if any(
+                        isinstance(database_operation, RemoveForeignKeyIndex)
+                        for database_operation in operation.database_operations
+                    ):
+                        self.assertFalse(migration.atomic, name)
+                    continue
+                if not isinstance(operation, AlterField):
+                    continue
+                with self.subTest(migration=name, field=operation.name):
+                    field = operation.field
+                    self.assertFalse(
+                        isinstance(field, models.ForeignKey)
+                        and not field.db_index
+                    )
+
+
+class ForeignKeyIndexesTest(TestCase):
+    """
+    Индексы внешних ключей удалены из базы, а сами ограничения
+    FOREIGN KEY остались.
+    """
+
+    def test_foreign_keys_without_indexes(self):
+        for table, column in UNINDEXED_FOREIGN_KEYS:
+            with self.subTest(table=table, column=column):
+                self.assertEqual(get_column_indexes(table, column), [])
+                self.assertTrue(has_foreign_key(table, column))
+
+
+class RemoveForeignKeyIndexTest(TransactionTestCase):
+    """
+    Миграция удаляет только индексы: таблица не пересоздается
+    (на PostgreSQL - не пересоздается FOREIGN KEY). Откат возвращает
+    индексы внешних ключей.
+    """
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+
+    def test_backwards(self):
+        self.migrate([('users', '0002_user_counters')])
+        try:
+            for column in ('user_id', 'following_id'):
+                self.assertEqual(
+                    len(get_column_indexes('users_subscrption', column)), 1
+                )
+        finally:
+            with CaptureQueriesContext(connection) as context:
+                self.migrate([('users', '0003_subscription_following_idx')])
+        statements = [
+            query['sql'].split()[:2] for query in context.captured_queries
+            if 'users_subscrption' in query['sql']
+        ]
+        self.assertEqual(
+            [words for words in statements
+             if words[0] not in ('SELECT', 'PRAGMA')],
+            [['CREATE', 'INDEX'], ['DROP', 'INDEX'], ['DROP', 'INDEX']]
+        )
+        for column in ('user_id', 'following_id'):
+            self.assertEqual(
+                get_column_indexes('users_subscrption', column), []
+            )
+            self.assertTrue(has_foreign_key('users_subscrption', column))
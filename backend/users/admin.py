@@ -7,7 +7,8 @@ from users.models import User, Subscrption
 
 class CustomUserAdmin(UserAdmin):
     list_display = ('username', 'email', 'is_superuser', 'is_staff',
-                    'is_active', 'last_login')
+                    'is_active', 'last_login', 'recipes_count',
+                    'followers_count')
     search_fields = ('username', 'email', 'first_name', 'last_name',)
     list_filter = ('username', 'email',)
     empty_value_display = '-пусто-'
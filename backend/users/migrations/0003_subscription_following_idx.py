@@ -0,0 +1,56 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+import recipes.operations
+
+
+class Migration(migrations.Migration):
+    # Индекс строится без блокировки записи (CREATE INDEX
+    # CONCURRENTLY), это невозможно в транзакции. Лишние индексы
+    # внешних ключей удаляются после создания нового, сами
+    # ограничения FOREIGN KEY не пересоздаются.
+    atomic = False
+
+    dependencies = [
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        recipes.operations.AddIndexConcurrently(
+            model_name='subscrption',
+            index=models.Index(fields=['following', 'user'], name='subscription_following_idx'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='subscrption',
+                    name='following',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='following', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+            database_operations=[
+                recipes.operations.RemoveForeignKeyIndex(
+                    model_name='subscrption',
+                    name='following',
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='subscrption',
+                    name='user',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='follower', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+            database_operations=[
+                recipes.operations.RemoveForeignKeyIndex(
+                    model_name='subscrption',
+                    name='user',
+                ),
+            ],
+        ),
+    ]
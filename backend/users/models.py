@@ -6,7 +6,27 @@ from django.db import models
 from users.validators import username_validator
 
 
-class User(AbstractUser):
+class CounterFieldsMixin:
+    """
+    Поля-счетчики (counter_fields) меняются только атомарными
+    UPDATE ... SET поле = поле + 1. Полное сохранение существующей
+    записи (сериализатор, админка) их не пишет, иначе затерлись бы
+    увеличения, сделанные после чтения записи.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(CounterFieldsMixin, AbstractUser):
     username = models.CharField(
         verbose_name='Пользователь',
         max_length=settings.MAX_LENGTH_USERNAME,
@@ -18,6 +38,16 @@ class User(AbstractUser):
         unique=True,
         blank=False
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Число рецептов',
+        default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Число подписчиков',
+        default=0
+    )
+
+    counter_fields = ('recipes_count', 'followers_count')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name',)
@@ -37,23 +67,33 @@ class Subscrption(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='follower'
     )
     following = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='following'
     )
 
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        # Индекс ограничения (user, following) обслуживает подписки
+        # пользователя, индекс (following, user) - подписчиков автора.
         constraints = (
             models.UniqueConstraint(
                 fields=('user', 'following'),
                 name='unique_following'
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('following', 'user'),
+                name='subscription_following_idx'
+            ),
+        )
 
     def __str__(self):
         return f'{self.user} подписан на {self.following}'